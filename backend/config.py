@@ -1,7 +1,19 @@
-from pydantic_settings import BaseSettings
-from typing import List
+from pydantic import field_validator
+from pydantic_settings import BaseSettings, NoDecode
+from typing import Annotated, FrozenSet, Tuple
+from functools import cached_property, lru_cache
+import json
 import os
 
+DEFAULT_CORS_ORIGINS = "http://localhost:3000,https://backend-hardening.preview.emergentagent.com,https://fix-it-6.emergent.host"
+
+@lru_cache(maxsize=16)
+def _parse_cors(raw: str) -> Tuple[str, ...]:
+    """Parse a CORS_ORIGINS value (JSON list or comma-separated), once per distinct value"""
+    if raw.lstrip().startswith("["):
+        return tuple(origin for origin in map(str.strip, json.loads(raw)) if origin)
+    return tuple(origin for origin in map(str.strip, raw.split(",")) if origin)
+
 class Settings(BaseSettings):
     # Database
     mongo_url: str = os.getenv("MONGO_URL", "mongodb://localhost:27017")
@@ -32,34 +44,55 @@ class Settings(BaseSettings):
     jwt_secret: str = os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
     jwt_algorithm: str = "HS256"
     jwt_expiration: int = 24 * 60 * 60  # 24 hours
+    credentials_encryption_key: str = os.getenv("CREDENTIALS_ENCRYPTION_KEY", "")  # Fernet key for stored integration secrets
     
     # Environment
     environment: str = os.getenv("ENVIRONMENT", "development")
     
-    # CORS - Read from environment variable or use defaults
-    cors_origins: List[str] = os.getenv(
-        "CORS_ORIGINS",
-        "http://localhost:3000,https://backend-hardening.preview.emergentagent.com,https://fix-it-6.emergent.host"
-    ).split(",")
+    # CORS - Read from environment variable (comma-separated) or use defaults
+    cors_origins: Annotated[Tuple[str, ...], NoDecode] = _parse_cors(DEFAULT_CORS_ORIGINS)
     
     # API Settings
     api_prefix: str = "/api"
     debug: bool = os.getenv("DEBUG", "false").lower() == "true"
+    request_id_enabled: bool = os.getenv("REQUEST_ID_ENABLED", "true").lower() == "true"
     
     # File Upload
     max_file_size: int = 10 * 1024 * 1024  # 10MB
-    allowed_file_types: List[str] = ["image/jpeg", "image/png", "image/gif", "application/pdf"]
+    allowed_file_types: Tuple[str, ...] = ("image/jpeg", "image/png", "image/gif", "application/pdf")
     
     # Rate Limiting
     rate_limit_requests: int = 100
     rate_limit_period: int = 60  # seconds
+    redis_url: str = os.getenv("REDIS_URL", "")  # shared rate limit counters; empty = per process
     
     # Email Templates
     email_templates_dir: str = "email_templates"
     
+    @field_validator("cors_origins", mode="before")
+    @classmethod
+    def _split_cors_origins(cls, value):
+        if isinstance(value, str):
+            return _parse_cors(value)
+        return value
+    
+    # Frozen lookups for per-request membership checks
+    @cached_property
+    def cors_origins_set(self) -> FrozenSet[str]:
+        return frozenset(self.cors_origins)
+    
+    @cached_property
+    def allowed_file_types_set(self) -> FrozenSet[str]:
+        return frozenset(self.allowed_file_types)
+    
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
 
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Get the process-wide settings, validated once on first use"""
+    return Settings()
+
 # Create global settings instance
-settings = Settings()
\ No newline at end of file
+settings = get_settings()
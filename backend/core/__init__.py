@@ -1,5 +1,7 @@
 # Core Platform Components
-from .plugin_manager import PluginManager, PluginInterface, plugin_manager
+import importlib
+
+from .plugin_manager import PluginManager, PluginInterface
 from .white_label_manager import WhiteLabelManager, TenantConfig, white_label_manager
 from .inter_agent_communication import InterAgentCommunication, AgentMessage, CollaborationTask, inter_agent_comm
 from .insights_engine import SmartInsightsEngine, Insight, InsightType, insights_engine
@@ -9,4 +11,15 @@ __all__ = [
     'WhiteLabelManager', 'TenantConfig', 'white_label_manager',
     'InterAgentCommunication', 'AgentMessage', 'CollaborationTask', 'inter_agent_comm',
     'SmartInsightsEngine', 'Insight', 'InsightType', 'insights_engine'
-]
\ No newline at end of file
+]
+
+# Drop the submodule binding so ``core.plugin_manager`` resolves to the lazily
+# created instance through __getattr__ below, as it did when it was eager
+del plugin_manager
+
+
+def __getattr__(name):
+    # plugin_manager is built lazily by its module; resolve it on access
+    if name == 'plugin_manager':
+        return importlib.import_module('.plugin_manager', __name__).plugin_manager
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
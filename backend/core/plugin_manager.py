@@ -17,6 +17,9 @@ from agents.base_agent import BaseAgent, AgentCapability
 
 logger = logging.getLogger(__name__)
 
+# Fields every plugin manifest.json must define
+_REQUIRED_MANIFEST_FIELDS = frozenset({'name', 'version', 'description', 'author', 'entry_point'})
+
 class PluginInterface(ABC):
     """
     Base interface that all plugins must implement
@@ -114,14 +117,22 @@ class PluginManager:
             "custom": "Custom business logic plugins"
         }
         
-        # Ensure plugins directory exists
-        self.plugins_directory.mkdir(parents=True, exist_ok=True)
+        # Plugins directory is created on first use, not at construction
+        self._dir_ready = False
         
-        logger.info(f"Plugin Manager initialized with directory: {self.plugins_directory}")
+        logger.info("Plugin Manager initialized with directory: %s", self.plugins_directory)
+    
+    def _ensure_plugins_directory(self) -> None:
+        """Create the plugins directory the first time it is needed"""
+        if not self._dir_ready:
+            self.plugins_directory.mkdir(parents=True, exist_ok=True)
+            self._dir_ready = True
     
     async def discover_plugins(self) -> List[str]:
         """Discover available plugins in the plugins directory"""
+        self._ensure_plugins_directory()
         discovered = []
+        log_discovery = logger.isEnabledFor(logging.INFO)
         
         try:
             for plugin_dir in self.plugins_directory.iterdir():
@@ -129,27 +140,29 @@ class PluginManager:
                     plugin_manifest = plugin_dir / 'manifest.json'
                     if plugin_manifest.exists():
                         discovered.append(plugin_dir.name)
-                        logger.info(f"Discovered plugin: {plugin_dir.name}")
+                        if log_discovery:
+                            logger.info("Discovered plugin: %s", plugin_dir.name)
             
             return discovered
             
         except Exception as e:
-            logger.error(f"Error discovering plugins: {e}")
+            logger.error("Error discovering plugins: %s", e)
             return []
     
     async def load_plugin(self, plugin_name: str, config: Dict[str, Any] = None) -> bool:
         """Load a specific plugin"""
         try:
+            self._ensure_plugins_directory()
             plugin_path = self.plugins_directory / plugin_name
             
             if not plugin_path.exists():
-                logger.error(f"Plugin directory not found: {plugin_name}")
+                logger.error("Plugin directory not found: %s", plugin_name)
                 return False
             
             # Load plugin metadata
             manifest_path = plugin_path / 'manifest.json'
             if not manifest_path.exists():
-                logger.error(f"Plugin manifest not found: {plugin_name}")
+                logger.error("Plugin manifest not found: %s", plugin_name)
                 return False
             
             with open(manifest_path, 'r') as f:
@@ -160,13 +173,13 @@ class PluginManager:
             
             # Check dependencies
             if not await self._check_dependencies(metadata.dependencies):
-                logger.error(f"Plugin dependencies not met: {plugin_name}")
+                logger.error("Plugin dependencies not met: %s", plugin_name)
                 return False
             
             # Load plugin code
             plugin_module_path = plugin_path / metadata.entry_point
             if not plugin_module_path.exists():
-                logger.error(f"Plugin entry point not found: {plugin_name}")
+                logger.error("Plugin entry point not found: %s", plugin_name)
                 return False
             
             # Import plugin module
@@ -187,7 +200,7 @@ class PluginManager:
                     break
             
             if not plugin_class:
-                logger.error(f"Plugin class not found: {plugin_name}")
+                logger.error("Plugin class not found: %s", plugin_name)
                 return False
             
             # Instantiate plugin
@@ -198,14 +211,14 @@ class PluginManager:
             if await plugin_instance.initialize(plugin_config):
                 self.loaded_plugins[plugin_name] = plugin_instance
                 self.plugin_configs[plugin_name] = plugin_config
-                logger.info(f"Plugin loaded successfully: {plugin_name}")
+                logger.info("Plugin loaded successfully: %s", plugin_name)
                 return True
             else:
-                logger.error(f"Plugin initialization failed: {plugin_name}")
+                logger.error("Plugin initialization failed: %s", plugin_name)
                 return False
                 
         except Exception as e:
-            logger.error(f"Error loading plugin {plugin_name}: {e}")
+            logger.error("Error loading plugin %s: %s", plugin_name, e)
             return False
     
     async def unload_plugin(self, plugin_name: str) -> bool:
@@ -215,14 +228,14 @@ class PluginManager:
                 plugin = self.loaded_plugins[plugin_name]
                 await plugin.shutdown()
                 del self.loaded_plugins[plugin_name]
-                logger.info(f"Plugin unloaded: {plugin_name}")
+                logger.info("Plugin unloaded: %s", plugin_name)
                 return True
             else:
-                logger.warning(f"Plugin not loaded: {plugin_name}")
+                logger.warning("Plugin not loaded: %s", plugin_name)
                 return False
                 
         except Exception as e:
-            logger.error(f"Error unloading plugin {plugin_name}: {e}")
+            logger.error("Error unloading plugin %s: %s", plugin_name, e)
             return False
     
     async def execute_plugin_task(self, plugin_name: str, task: Dict[str, Any]) -> Dict[str, Any]:
@@ -242,7 +255,7 @@ class PluginManager:
             }
             
         except Exception as e:
-            logger.error(f"Plugin task execution failed {plugin_name}: {e}")
+            logger.error("Plugin task execution failed %s: %s", plugin_name, e)
             return {"error": f"Plugin execution failed: {str(e)}"}
     
     async def load_all_plugins(self) -> Dict[str, bool]:
@@ -309,7 +322,7 @@ class PluginManager:
             }
             
         except Exception as e:
-            logger.error(f"Plugin installation failed: {e}")
+            logger.error("Plugin installation failed: %s", e)
             return {"error": f"Installation failed: {str(e)}"}
     
     async def create_plugin_template(self, plugin_info: Dict[str, Any]) -> Dict[str, Any]:
@@ -319,6 +332,7 @@ class PluginManager:
             plugin_dir = self.plugins_directory / plugin_name
             
             # Create plugin directory
+            self._ensure_plugins_directory()
             plugin_dir.mkdir(exist_ok=True)
             
             # Create manifest.json
@@ -445,11 +459,27 @@ Describe how to use your plugin.
             }
             
         except Exception as e:
-            logger.error(f"Plugin template creation failed: {e}")
+            logger.error("Plugin template creation failed: %s", e)
             return {"error": f"Template creation failed: {str(e)}"}
     
     async def validate_plugin(self, plugin_name: str) -> Dict[str, Any]:
         """Validate a plugin's structure and compatibility"""
+        return self._validate_plugin_files(plugin_name)
+    
+    async def validate_all_plugins(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Validate every plugin in the plugins directory as one batch.
+        Each plugin's filesystem checks run on a worker thread so the stat
+        calls for the whole set overlap instead of running one after another.
+        """
+        discovered = await self.discover_plugins()
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self._validate_plugin_files, name) for name in discovered)
+        )
+        return dict(zip(discovered, results))
+    
+    def _validate_plugin_files(self, plugin_name: str) -> Dict[str, Any]:
+        """Blocking manifest and entry point checks behind validate_plugin"""
         try:
             plugin_path = self.plugins_directory / plugin_name
             
@@ -476,11 +506,12 @@ Describe how to use your plugin.
                     with open(manifest_path, 'r') as f:
                         manifest = json.load(f)
                         
-                    required_fields = ['name', 'version', 'description', 'author', 'entry_point']
-                    for field in required_fields:
-                        if field not in manifest:
-                            validation_results["issues"].append(f"Missing required field in manifest: {field}")
-                            validation_results["valid"] = False
+                    missing = _REQUIRED_MANIFEST_FIELDS.difference(manifest)
+                    if missing:
+                        validation_results["issues"].extend(
+                            f"Missing required field in manifest: {field}" for field in sorted(missing)
+                        )
+                        validation_results["valid"] = False
                             
                 except json.JSONDecodeError:
                     validation_results["valid"] = False
@@ -500,7 +531,7 @@ Describe how to use your plugin.
             return validation_results
             
         except Exception as e:
-            logger.error(f"Plugin validation failed: {e}")
+            logger.error("Plugin validation failed: %s", e)
             return {
                 "plugin_name": plugin_name,
                 "valid": False,
@@ -553,5 +584,14 @@ Describe how to use your plugin.
             "total_available": 47
         }
 
-# Global plugin manager instance
-plugin_manager = PluginManager()
\ No newline at end of file
+# Global plugin manager instance, created on first access so importing this
+# module does not touch the filesystem
+_plugin_manager: Optional[PluginManager] = None
+
+def __getattr__(name: str) -> Any:
+    global _plugin_manager
+    if name == 'plugin_manager':
+        if _plugin_manager is None:
+            _plugin_manager = PluginManager()
+        return _plugin_manager
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
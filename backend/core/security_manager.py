@@ -4,6 +4,7 @@ Implements enterprise-grade security features for global deployment
 """
 import asyncio
 import hashlib
+import hmac
 import jwt
 import logging
 import secrets
@@ -640,7 +641,7 @@ class SecurityManager:
         try:
             salt, stored_password_hash = stored_hash.split(':')
             password_hash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000)
-            return password_hash.hex() == stored_password_hash
+            return hmac.compare_digest(password_hash, bytes.fromhex(stored_password_hash))
         except:
             return False
     
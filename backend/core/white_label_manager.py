@@ -3,19 +3,139 @@ White Label Manager - FIXED VERSION with proper async handling
 Multi-tenancy and branding customization system
 Enables resellers and partners to customize the platform with their own branding
 """
+import re
 import json
 import asyncio
 import logging
-from typing import Dict, Any, List, Optional
+import time
+from collections import OrderedDict
+from typing import Dict, Any, AsyncIterator, List, Mapping, Optional, Tuple
 from datetime import datetime, timezone
 import uuid
+import secrets
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 from database import get_database
 from models import StandardResponse
+from cache_manager import CacheManager
 
 logger = logging.getLogger(__name__)
 
+# In-process tenant cache bounds; entries are re-read from MongoDB after the TTL
+TENANT_CACHE_SIZE = 10_000
+TENANT_CACHE_TTL = 300  # seconds
+
+# Domains learned from cold lookups are buffered and folded into the
+# read-only domain snapshot this many at a time
+DOMAIN_SNAPSHOT_BATCH = 256
+
+# Feature-access decisions are cached briefly per (tenant, feature), for at
+# most this many tenants; the least recently checked tenant is evicted first
+ACCESS_CACHE_TENANTS = 10_000
+ACCESS_CACHE_TTL = 60  # seconds
+
+# Documents per insert_many call when bulk-provisioning tenants
+BULK_INSERT_BATCH_SIZE = 1000
+
+# Reseller domain slugging: strip punctuation, then collapse whitespace/underscores
+_SLUG_RE = re.compile(r'[\s_]+')
+_SLUG_TRANS = str.maketrans({c: None for c in '!@#$%^&*()'})
+
+# Only the fields get_all_tenants returns, so large branding/billing blobs
+# never cross the wire
+_TENANT_LIST_PROJECTION = {
+    "_id": 0,
+    "config.tenant_id": 1,
+    "config.name": 1,
+    "config.domain": 1,
+    "config.subscription_tier": 1,
+    "config.status": 1,
+    "config.created_at": 1
+}
+
+# Subscription tiers never change at runtime; features are frozensets for
+# O(1) access checks
+_SUBSCRIPTION_TIERS: Mapping[str, Mapping[str, Any]] = MappingProxyType({
+    "starter": MappingProxyType({
+        "max_agents": 3,
+        "max_users": 10,
+        "api_requests_per_day": 5000,
+        "features": frozenset({"basic_agents", "templates", "support"}),
+        "price": 99,  # USD per month
+        "plugins_limit": 5
+    }),
+    "professional": MappingProxyType({
+        "max_agents": 10,
+        "max_users": 50,
+        "api_requests_per_day": 25000,
+        "features": frozenset({"all_agents", "templates", "plugins", "white_label", "priority_support"}),
+        "price": 299,
+        "plugins_limit": 20
+    }),
+    "enterprise": MappingProxyType({
+        "max_agents": -1,  # unlimited
+        "max_users": -1,   # unlimited
+        "api_requests_per_day": 100000,
+        "features": frozenset({"all_agents", "templates", "plugins", "white_label", "custom_development", "dedicated_support"}),
+        "price": 999,
+        "plugins_limit": -1  # unlimited
+    })
+})
+
+# Default NOWHERE.AI branding, built once and frozen; callers get a fresh
+# dict copy from _get_default_branding
+_DEFAULT_BRANDING: Mapping[str, Any] = MappingProxyType({
+    "platform_name": "NOWHERE.AI",
+    "tagline": "AI-Powered Business Operating System",
+    "logo_url": "/assets/logo-matrix.svg",
+    "colors": MappingProxyType({
+        "primary": "#00FF41",
+        "secondary": "#00FFFF", 
+        "background": "#000000"
+    }),
+    "font_family": "Inter",
+    "contact_info": MappingProxyType({
+        "support_email": "support@nowhere.ai",
+        "sales_email": "sales@nowhere.ai",
+        "phone": "+971567148469",
+        "address": "Boulevard Tower, Downtown Dubai"
+    })
+})
+
+_SETUP_INSTRUCTIONS = (
+    "1. Configure DNS to point domain to platform servers",
+    "2. Deploy Docker containers with provided configuration",
+    "3. Run database migration scripts",
+    "4. Upload custom branding assets",
+    "5. Configure agent settings and integrations",
+    "6. Test all functionality and go live"
+)
+
+def _duplicate_key_message(key_pattern: Mapping[str, Any]) -> str:
+    """Error for a unique-index violation, naming the field that collided"""
+    return "Tenant already exists" if "tenant_id" in key_pattern else "Domain already exists"
+
+def _utcnow() -> Tuple[str, int]:
+    """Current UTC time as (ISO-8601 string, epoch microseconds) from one clock read"""
+    now_us = time.time_ns() // 1000
+    seconds, micros = divmod(now_us, 1_000_000)
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(microsecond=micros).isoformat(), now_us
+
+def _iso_to_epoch_us(value: Any) -> int:
+    """Epoch microseconds for a stored ISO timestamp (0 if missing or unparseable)"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return 0
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1_000_000)
+
 class TenantConfig:
     """Configuration for a white-label tenant"""
     
@@ -40,6 +160,7 @@ class TenantConfig:
         
         # Feature configuration
         self.enabled_features = tenant_data.get('enabled_features', [])
+        self._enabled_features_set = frozenset(self.enabled_features)
         self.agent_limits = tenant_data.get('agent_limits', {'max_agents': 5})
         self.api_limits = tenant_data.get('api_limits', {'requests_per_day': 10000})
         
@@ -54,14 +175,35 @@ class TenantConfig:
         self.subscription_tier = tenant_data.get('subscription_tier', 'starter')
         self.billing_info = tenant_data.get('billing_info', {})
         
-        # Metadata
-        self.created_at = tenant_data.get('created_at', datetime.now(timezone.utc).isoformat())
-        self.updated_at = tenant_data.get('updated_at', datetime.now(timezone.utc).isoformat())
+        # Metadata - read the clock at most once, and only if a default is needed
+        now = now_us = None
+        if 'created_at' not in tenant_data or 'updated_at' not in tenant_data:
+            now, now_us = _utcnow()
+        self.created_at = tenant_data.get('created_at', now)
+        self.updated_at = tenant_data.get('updated_at', now)
+        # Integer twin of updated_at for recency sorts; documents written before
+        # it existed get it derived from the ISO string
+        self.updated_at_us = tenant_data.get('updated_at_us')
+        if self.updated_at_us is None:
+            self.updated_at_us = now_us if 'updated_at' not in tenant_data else _iso_to_epoch_us(self.updated_at)
         self.status = tenant_data.get('status', 'active')
+        
+        # Serialized form, built on first to_dict() and reset by _dirty()
+        self._dict_cache: Optional[Dict[str, Any]] = None
+    
+    def _dirty(self) -> None:
+        """Invalidate cached derived state after mutating fields"""
+        self._dict_cache = None
+        self._enabled_features_set = frozenset(self.enabled_features)
     
     def to_dict(self) -> Dict[str, Any]:
-        """Convert to dictionary for serialization"""
-        return {
+        """
+        Convert to dictionary for serialization.
+        The result is cached on the instance; copy it before mutating.
+        """
+        if self._dict_cache is not None:
+            return self._dict_cache
+        self._dict_cache = {
             'tenant_id': self.tenant_id,
             'name': self.name,
             'domain': self.domain,
@@ -78,8 +220,10 @@ class TenantConfig:
             'billing_info': self.billing_info,
             'created_at': self.created_at,
             'updated_at': self.updated_at,
+            'updated_at_us': self.updated_at_us,
             'status': self.status
         }
+        return self._dict_cache
 
 class WhiteLabelManager:
     """
@@ -88,36 +232,28 @@ class WhiteLabelManager:
     """
     
     def __init__(self):
-        self.tenants: Dict[str, TenantConfig] = {}
-        self.domain_mappings: Dict[str, str] = {}  # domain -> tenant_id
+        # TTL-bounded cache: tenant_id -> TenantConfig
+        self.tenants = CacheManager(max_size=TENANT_CACHE_SIZE, default_ttl=TENANT_CACHE_TTL)
+        # domain -> tenant_id is read on every request but written rarely, so
+        # writers swap in a new read-only snapshot rather than mutating in place.
+        # The snapshot is rebuilt from the live tenant cache, so it shares its
+        # size bound and drops evicted/expired tenants; domains seen since the
+        # last rebuild wait in a small buffer
+        self.domain_mappings: Mapping[str, str] = MappingProxyType({})
+        self._new_domain_mappings: Dict[str, str] = {}
+        
+        # Tenants collection handle, resolved on first use after the DB connects
+        self._tenants_coll = None
+        
+        # Deployment packages are rendered off the event loop
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="white-label")
         
         # Subscription tiers and limits
-        self.subscription_tiers = {
-            "starter": {
-                "max_agents": 3,
-                "max_users": 10,
-                "api_requests_per_day": 5000,
-                "features": ["basic_agents", "templates", "support"],
-                "price": 99,  # USD per month
-                "plugins_limit": 5
-            },
-            "professional": {
-                "max_agents": 10,
-                "max_users": 50,
-                "api_requests_per_day": 25000,
-                "features": ["all_agents", "templates", "plugins", "white_label", "priority_support"],
-                "price": 299,
-                "plugins_limit": 20
-            },
-            "enterprise": {
-                "max_agents": -1,  # unlimited
-                "max_users": -1,   # unlimited  
-                "api_requests_per_day": 100000,
-                "features": ["all_agents", "templates", "plugins", "white_label", "custom_development", "dedicated_support"],
-                "price": 999,
-                "plugins_limit": -1  # unlimited
-            }
-        }
+        self.subscription_tiers = _SUBSCRIPTION_TIERS
+        
+        # tenant_id -> {feature: (allowed, expires_at)}, least recently checked
+        # first; bounded LRU, and a tenant write drops only that tenant's entry
+        self._access_cache: "OrderedDict[str, Dict[str, Tuple[bool, float]]]" = OrderedDict()
         
         logger.info("White Label Manager initialized (FIXED VERSION)")
     
@@ -126,35 +262,30 @@ class WhiteLabelManager:
         try:
             tenant_config = TenantConfig(tenant_data)
             
-            # Validate domain/subdomain uniqueness
-            domain = tenant_config.domain or f"{tenant_config.subdomain}.nowhere.digital"
-            
-            # Check domain uniqueness in database
-            db = get_database()
-            existing_tenant = await db.tenants.find_one({"config.domain": domain})
-            if existing_tenant:
-                logger.warning(f"Domain already exists: {domain}")
-                return {"error": "Domain already exists"}
+            domain = self._resolve_domain(tenant_config)
             
-            # Store tenant configuration in memory
-            self.tenants[tenant_config.tenant_id] = tenant_config
-            self.domain_mappings[domain] = tenant_config.tenant_id
-            
-            # Save to database - FIXED: Properly handle async insert_one
+            # Save to database - the unique indexes on config.domain and
+            # tenant_id are the race-free uniqueness check
+            tenants_coll = self._tenants_collection()
             try:
-                result = await db.tenants.insert_one({
+                result = await tenants_coll.insert_one({
                     "tenant_id": tenant_config.tenant_id,
                     "config": tenant_config.to_dict(),
                     "created_at": tenant_config.created_at
                 })
                 logger.info(f"Tenant saved to database with ID: {result.inserted_id}")
+            except DuplicateKeyError as dup_error:
+                message = _duplicate_key_message((dup_error.details or {}).get("keyPattern", {}))
+                logger.warning(f"{message}: {tenant_config.tenant_id} ({domain})")
+                return {"error": message}
             except Exception as db_error:
                 logger.error(f"Database insert error: {db_error}")
-                # Rollback in-memory changes
-                del self.tenants[tenant_config.tenant_id]
-                del self.domain_mappings[domain]
                 return {"error": f"Database error: {str(db_error)}"}
             
+            # Write through to the cache once the tenant is persisted
+            self._cache_tenant(tenant_config)
+            self._access_cache.pop(tenant_config.tenant_id, None)
+            
             # Generate deployment package
             deployment_package = await self._generate_deployment_package(tenant_config)
             
@@ -172,26 +303,90 @@ class WhiteLabelManager:
             logger.error(f"Error creating tenant: {e}", exc_info=True)
             return {"error": f"Failed to create tenant: {str(e)}"}
     
+    async def create_tenants_bulk(self, tenants_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Create many tenants with batched insert_many calls instead of one insert per tenant"""
+        try:
+            # Build configs and drop domains that are already taken in-process
+            pending: List[tuple] = []  # (request index, TenantConfig)
+            failed: List[Dict[str, Any]] = []
+            seen_domains = set()
+            for index, tenant_data in enumerate(tenants_data):
+                tenant_config = TenantConfig(tenant_data)
+                domain = self._resolve_domain(tenant_config)
+                if domain in seen_domains or self._mapped_tenant_id(domain):
+                    failed.append({"index": index, "domain": domain, "error": "Domain already exists"})
+                    continue
+                seen_domains.add(domain)
+                pending.append((index, tenant_config))
+            
+            tenants_coll = self._tenants_collection()
+            created: List[Dict[str, Any]] = []
+            for start in range(0, len(pending), BULK_INSERT_BATCH_SIZE):
+                batch = pending[start:start + BULK_INSERT_BATCH_SIZE]
+                docs = [
+                    {
+                        "tenant_id": tenant_config.tenant_id,
+                        "config": tenant_config.to_dict(),
+                        "created_at": tenant_config.created_at
+                    }
+                    for _, tenant_config in batch
+                ]
+                
+                # ordered=False lets the rest of the batch land past a duplicate
+                rejected = set()
+                try:
+                    await tenants_coll.insert_many(docs, ordered=False)
+                except BulkWriteError as bulk_error:
+                    for write_error in bulk_error.details.get("writeErrors", []):
+                        position = write_error["index"]
+                        rejected.add(position)
+                        index, tenant_config = batch[position]
+                        failed.append({
+                            "index": index,
+                            "domain": tenant_config.domain,
+                            "error": _duplicate_key_message(write_error.get("keyPattern", {}))
+                            if write_error.get("code") == 11000
+                            else write_error.get("errmsg", "Database error")
+                        })
+                
+                inserted = [tenant_config for position, (_, tenant_config) in enumerate(batch) if position not in rejected]
+                self._cache_tenants(inserted)
+                for tenant_config in inserted:
+                    self._access_cache.pop(tenant_config.tenant_id, None)
+                created.extend({"tenant_id": t.tenant_id, "domain": t.domain} for t in inserted)
+            
+            logger.info(f"Bulk created {len(created)} tenants ({len(failed)} failed)")
+            failed.sort(key=lambda failure: failure["index"])
+            return {"created": created, "failed": failed}
+            
+        except Exception as e:
+            logger.error(f"Error bulk creating tenants: {e}", exc_info=True)
+            return {"error": f"Failed to create tenants: {str(e)}"}
+    
     async def get_tenant_config(self, tenant_id: str = None, domain: str = None) -> Optional[TenantConfig]:
         """Get tenant configuration by ID or domain - FIXED VERSION"""
         try:
-            if domain and domain in self.domain_mappings:
-                tenant_id = self.domain_mappings[domain]
+            if domain:
+                tenant_id = self._mapped_tenant_id(domain) or tenant_id
             
-            if tenant_id in self.tenants:
-                return self.tenants[tenant_id]
-            
-            # Try loading from database - FIXED: Properly handle async find_one
             if tenant_id:
-                db = get_database()
-                tenant_doc = await db.tenants.find_one({"tenant_id": tenant_id})
-                if tenant_doc:
-                    config = TenantConfig(tenant_doc.get('config', {}))
-                    self.tenants[tenant_id] = config
-                    # Update domain mapping
-                    if config.domain:
-                        self.domain_mappings[config.domain] = tenant_id
-                    return config
+                cached = self.tenants.get(tenant_id)
+                if cached is not None:
+                    return cached
+                query = {"tenant_id": tenant_id}
+            elif domain:
+                query = {"config.domain": domain}
+            else:
+                return None
+            
+            # Cache miss - load from database and populate both caches
+            tenants_coll = self._tenants_collection()
+            tenant_doc = await tenants_coll.find_one(query, projection={"config": 1})
+            if tenant_doc:
+                config = TenantConfig(tenant_doc.get('config', {}))
+                # Only the tenant's own domain is mapped, never the caller's
+                self._cache_tenant(config)
+                return config
             
             return None
             
@@ -200,30 +395,35 @@ class WhiteLabelManager:
             return None
     
     async def update_tenant(self, tenant_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
-        """Update tenant configuration - FIXED VERSION"""
+        """Update tenant configuration in a single atomic round trip"""
         try:
-            tenant = await self.get_tenant_config(tenant_id)
-            if not tenant:
-                return {"error": "Tenant not found"}
-            
-            # Update configuration
-            current_config = tenant.to_dict()
-            current_config.update(updates)
-            current_config["updated_at"] = datetime.now(timezone.utc).isoformat()
-            
-            # Create updated tenant config
-            updated_tenant = TenantConfig(current_config)
-            self.tenants[tenant_id] = updated_tenant
+            now, now_us = _utcnow()
+            set_fields = {f"config.{key}": value for key, value in updates.items()}
+            set_fields["config.updated_at"] = now
+            set_fields["config.updated_at_us"] = now_us
+            set_fields["updated_at"] = now
             
-            # Update database - FIXED: Properly handle async update_one
-            db = get_database()
-            result = await db.tenants.update_one(
+            tenants_coll = self._tenants_collection()
+            updated_doc = await tenants_coll.find_one_and_update(
                 {"tenant_id": tenant_id},
-                {"$set": {"config": current_config, "updated_at": current_config["updated_at"]}}
+                {"$set": set_fields},
+                projection={"config": 1},
+                return_document=ReturnDocument.AFTER
             )
             
-            if result.matched_count == 0:
-                return {"error": "Tenant not found in database"}
+            self._access_cache.pop(tenant_id, None)
+            if not updated_doc:
+                self.tenants.delete(tenant_id)
+                return {"error": "Tenant not found"}
+            
+            updated_tenant = TenantConfig(updated_doc.get('config', {}))
+            
+            # Write through; a moved domain republishes the snapshot so the
+            # old domain stops resolving to this tenant
+            if "domain" in updates:
+                self._cache_tenants([updated_tenant])
+            else:
+                self._cache_tenant(updated_tenant)
             
             logger.info(f"Updated tenant: {tenant_id}")
             return {"success": True, "message": "Tenant updated successfully"}
@@ -278,40 +478,39 @@ class WhiteLabelManager:
                 "api_requests_per_day": tier_config["api_requests_per_day"],
                 "plugins_limit": tier_config["plugins_limit"]
             },
-            "tier_features": tier_config["features"]
+            "tier_features": sorted(tier_config["features"])
         }
     
     async def validate_tenant_access(self, tenant_id: str, feature: str) -> bool:
         """Validate if tenant has access to a specific feature"""
+        now = time.monotonic()
+        decisions = self._access_cache.get(tenant_id)
+        if decisions is None:
+            decisions = self._access_cache[tenant_id] = {}
+            if len(self._access_cache) > ACCESS_CACHE_TENANTS:
+                self._access_cache.popitem(last=False)
+        else:
+            self._access_cache.move_to_end(tenant_id)
+            cached = decisions.get(feature)
+            if cached is not None and cached[1] > now:
+                return cached[0]
+        
         tenant = await self.get_tenant_config(tenant_id)
         if not tenant:
+            # None is also what a failed lookup returns, so denials are not cached
             return False
         
         tier_config = self.subscription_tiers.get(tenant.subscription_tier, self.subscription_tiers["starter"])
-        return feature in tier_config["features"] or feature in tenant.enabled_features
+        allowed = feature in tier_config["features"] or feature in tenant._enabled_features_set
+        # A tenant write during the lookup pops `decisions`, so this result
+        # then lands in the detached dict and is never served
+        decisions[feature] = (allowed, now + ACCESS_CACHE_TTL)
+        return allowed
     
     async def get_all_tenants(self, status: str = None) -> List[Dict[str, Any]]:
         """Get list of all tenants - FIXED VERSION"""
         try:
-            db = get_database()
-            query = {}
-            if status:
-                query["config.status"] = status
-            
-            tenants = []
-            # FIXED: Properly handle async cursor iteration
-            cursor = db.tenants.find(query)
-            async for tenant_doc in cursor:
-                config = tenant_doc.get('config', {})
-                tenants.append({
-                    "tenant_id": config.get('tenant_id'),
-                    "name": config.get('name'),
-                    "domain": config.get('domain'),
-                    "subscription_tier": config.get('subscription_tier', 'starter'),
-                    "status": config.get('status', 'active'),
-                    "created_at": config.get('created_at')
-                })
-            
+            tenants = [tenant async for tenant in self.iter_tenants(status)]
             logger.info(f"Retrieved {len(tenants)} tenants")
             return tenants
             
@@ -319,6 +518,67 @@ class WhiteLabelManager:
             logger.error(f"Error getting tenants: {e}", exc_info=True)
             return []
     
+    async def get_tenants_page(self, skip: int = 0, limit: int = 50, status: str = None) -> List[Dict[str, Any]]:
+        """Get one page of tenants, newest first"""
+        try:
+            tenants_coll = self._tenants_collection()
+            cursor = (
+                tenants_coll.find(self._tenant_list_query(status), projection=_TENANT_LIST_PROJECTION)
+                .sort("config.created_at", -1)
+                .skip(skip)
+                .limit(limit)
+            )
+            return [self._tenant_summary(doc) for doc in await cursor.to_list(length=limit)]
+            
+        except Exception as e:
+            logger.error(f"Error getting tenants page: {e}", exc_info=True)
+            return []
+    
+    async def warmup(self, limit: int = 1000) -> int:
+        """Prefetch the most recently updated active tenants into the cache"""
+        try:
+            tenants_coll = self._tenants_collection()
+            cursor = (
+                tenants_coll.find({"config.status": "active"}, projection={"config": 1})
+                .sort("config.updated_at_us", -1)
+                .limit(limit)
+            )
+            configs = [TenantConfig(doc.get('config', {})) for doc in await cursor.to_list(length=limit)]
+            self._cache_tenants(configs)
+            
+            logger.info(f"Warmed tenant cache with {len(configs)} tenants")
+            return len(configs)
+            
+        except Exception as e:
+            logger.error(f"Error warming tenant cache: {e}", exc_info=True)
+            return 0
+    
+    async def iter_tenants(self, status: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield tenant summaries as the cursor produces them"""
+        tenants_coll = self._tenants_collection()
+        # FIXED: Properly handle async cursor iteration
+        cursor = tenants_coll.find(self._tenant_list_query(status), projection=_TENANT_LIST_PROJECTION).batch_size(500)
+        async for tenant_doc in cursor:
+            yield self._tenant_summary(tenant_doc)
+    
+    @staticmethod
+    def _tenant_list_query(status: str = None) -> Dict[str, Any]:
+        """Build the tenant listing filter"""
+        return {"config.status": status} if status else {}
+    
+    @staticmethod
+    def _tenant_summary(tenant_doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Shape a projected tenant document for listing"""
+        config = tenant_doc.get('config', {})
+        return {
+            "tenant_id": config.get('tenant_id'),
+            "name": config.get('name'),
+            "domain": config.get('domain'),
+            "subscription_tier": config.get('subscription_tier', 'starter'),
+            "status": config.get('status', 'active'),
+            "created_at": config.get('created_at')
+        }
+    
     async def create_reseller_package(self, reseller_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a reseller package with custom branding and features - FIXED VERSION"""
         try:
@@ -328,15 +588,14 @@ class WhiteLabelManager:
                 # Generate domain from company name or use UUID
                 company_name = reseller_data.get('company_name', reseller_data.get('reseller_name', ''))
                 if company_name:
-                    domain = f"{company_name.lower().replace(' ', '-').replace('_', '-')}.nowheredigital.ae"
+                    domain = f"{_SLUG_RE.sub('-', company_name.translate(_SLUG_TRANS).lower())}.nowheredigital.ae"
                 else:
-                    domain = f"reseller-{uuid.uuid4().hex[:8]}.nowheredigital.ae"
+                    domain = f"reseller-{secrets.token_hex(4)}.nowheredigital.ae"
             
-            db = get_database()
-            existing = await db.tenants.find_one({"config.domain": domain})
-            if existing:
+            tenants_coll = self._tenants_collection()
+            if await tenants_coll.count_documents({"config.domain": domain}, limit=1):
                 # If domain exists, append random suffix
-                domain = f"{domain.split('.')[0]}-{uuid.uuid4().hex[:4]}.nowheredigital.ae"
+                domain = f"{domain.split('.')[0]}-{secrets.token_hex(2)}.nowheredigital.ae"
             
             # Create base tenant configuration for reseller
             tenant_data = {
@@ -363,7 +622,7 @@ class WhiteLabelManager:
                 "reseller_dashboard_url": f"https://{domain}/reseller",
                 "api_credentials": {
                     "api_key": f"pk_reseller_{tenant_result['tenant_id'][:8]}",
-                    "secret_key": f"sk_reseller_{uuid.uuid4().hex[:16]}"
+                    "secret_key": f"sk_reseller_{secrets.token_hex(8)}"
                 },
                 "documentation": {
                     "setup_guide": "Complete reseller setup documentation",
@@ -388,28 +647,69 @@ class WhiteLabelManager:
             logger.error(f"Error creating reseller package: {e}", exc_info=True)
             return {"error": f"Failed to create reseller package: {str(e)}"}
     
+    def _resolve_domain(self, tenant: TenantConfig) -> str:
+        """
+        Fill in the tenant's domain from its subdomain when none was given.
+        Storing the resolved value keeps the unique config.domain index
+        meaningful for subdomain-only tenants.
+        """
+        if not tenant.domain:
+            tenant.domain = f"{tenant.subdomain}.nowhere.digital"
+            tenant._dirty()
+        return tenant.domain
+    
+    def _tenants_collection(self):
+        """Tenants collection, resolved once and reused by every query"""
+        if self._tenants_coll is None:
+            self._tenants_coll = get_database().tenants
+        return self._tenants_coll
+    
+    def _mapped_tenant_id(self, domain: str) -> Optional[str]:
+        """Tenant ID cached for a domain, from the snapshot or the pending buffer"""
+        return self.domain_mappings.get(domain) or self._new_domain_mappings.get(domain)
+    
+    def _cache_tenant(self, config: TenantConfig) -> None:
+        """Store a tenant, buffering its domain until the next snapshot rebuild"""
+        self.tenants.set(config.tenant_id, config)
+        if config.domain and self._mapped_tenant_id(config.domain) != config.tenant_id:
+            self._new_domain_mappings[config.domain] = config.tenant_id
+            if len(self._new_domain_mappings) >= DOMAIN_SNAPSHOT_BATCH:
+                self._publish_domain_mappings()
+    
+    def _cache_tenants(self, configs: List[TenantConfig]) -> None:
+        """Store many tenants with a single domain snapshot rebuild"""
+        for config in configs:
+            self.tenants.set(config.tenant_id, config)
+        self._publish_domain_mappings()
+    
+    def _publish_domain_mappings(self) -> None:
+        """
+        Rebuild the domain snapshot from the live tenant cache and clear the
+        buffer; readers holding the old snapshot are unaffected
+        """
+        now = datetime.now()
+        expires_at = self.tenants.cache_ttl
+        self.domain_mappings = MappingProxyType({
+            config.domain: tenant_id
+            for tenant_id, config in self.tenants.cache.items()
+            if config.domain and expires_at.get(tenant_id, datetime.min) > now
+        })
+        self._new_domain_mappings = {}
+    
     def _get_default_branding(self) -> Dict[str, Any]:
-        """Get default NOWHERE.AI branding"""
+        """Get default NOWHERE.AI branding as a plain dict the caller may modify"""
         return {
-            "platform_name": "NOWHERE.AI",
-            "tagline": "AI-Powered Business Operating System",
-            "logo_url": "/assets/logo-matrix.svg",
-            "colors": {
-                "primary": "#00FF41",
-                "secondary": "#00FFFF", 
-                "background": "#000000"
-            },
-            "font_family": "Inter",
-            "contact_info": {
-                "support_email": "support@nowhere.ai",
-                "sales_email": "sales@nowhere.ai",
-                "phone": "+971567148469",
-                "address": "Boulevard Tower, Downtown Dubai"
-            }
+            key: dict(value) if isinstance(value, Mapping) else value
+            for key, value in _DEFAULT_BRANDING.items()
         }
     
     async def _generate_deployment_package(self, tenant: TenantConfig) -> Dict[str, Any]:
-        """Generate deployment package for tenant"""
+        """Generate deployment package for tenant without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._render_deployment_package, tenant)
+    
+    def _render_deployment_package(self, tenant: TenantConfig) -> Dict[str, Any]:
+        """Render the deployment package; blocking template/file work belongs here"""
         return {
             "docker_compose": "Custom Docker configuration for tenant deployment",
             "environment_variables": {
@@ -423,16 +723,9 @@ class WhiteLabelManager:
             "database_setup": "Tenant-specific database configuration"
         }
     
-    def _get_setup_instructions(self, tenant: TenantConfig) -> List[str]:
+    def _get_setup_instructions(self, tenant: TenantConfig) -> Tuple[str, ...]:
         """Get setup instructions for tenant"""
-        return [
-            "1. Configure DNS to point domain to platform servers",
-            "2. Deploy Docker containers with provided configuration",
-            "3. Run database migration scripts",
-            "4. Upload custom branding assets",
-            "5. Configure agent settings and integrations",
-            "6. Test all functionality and go live"
-        ]
+        return _SETUP_INSTRUCTIONS
 
 # Global white label manager instance
 white_label_manager = WhiteLabelManager()
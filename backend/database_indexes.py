@@ -27,10 +27,18 @@ async def create_all_indexes():
         
         # Tenants Collection Indexes (White Label)
         await db.tenants.create_index([("config.domain", 1)], unique=True)
+        await db.tenants.create_index([("tenant_id", 1)], unique=True)
         await db.tenants.create_index([("config.status", 1)])
+        await db.tenants.create_index([("config.status", 1), ("config.created_at", -1)])
+        await db.tenants.create_index([("config.status", 1), ("config.updated_at_us", -1)])
         await db.tenants.create_index([("config.subscription_tier", 1)])
         logger.info("✅ Tenants collection indexes created")
         
+        # Payment Integrations Indexes
+        await db.payment_integrations.create_index([("integration_id", 1)], unique=True)
+        await db.payment_integrations.create_index([("tenant_id", 1), ("provider", 1), ("created_at", -1)])
+        logger.info("✅ Payment integrations collection indexes created")
+        
         # Chat Sessions Indexes
         await db.chat_sessions.create_index([("session_id", 1)], unique=True)
         await db.chat_sessions.create_index([("user_id", 1)])
@@ -72,7 +80,7 @@ async def drop_all_indexes():
         db = get_database()
         
         collections = [
-            "contacts", "analytics", "tenants", "chat_sessions",
+            "contacts", "analytics", "tenants", "payment_integrations", "chat_sessions",
             "agent_tasks", "audit_logs", "performance_metrics"
         ]
         
@@ -94,7 +102,7 @@ async def check_indexes():
         db = get_database()
         
         collections = [
-            "contacts", "analytics", "tenants", "chat_sessions",
+            "contacts", "analytics", "tenants", "payment_integrations", "chat_sessions",
             "agent_tasks", "audit_logs", "performance_metrics"
         ]
         
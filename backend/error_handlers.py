@@ -5,11 +5,9 @@ Centralized error handling for consistent API responses
 from fastapi import Request, status
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
-from pydantic import ValidationError
 import logging
-from typing import Union
-
-from models import StandardResponse
+import traceback
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +27,7 @@ class NotFoundError(APIError):
             message += f": {identifier}"
         super().__init__(message, status_code=404)
 
-class ValidationError(APIError):
+class APIValidationError(APIError):
     """Validation error"""
     def __init__(self, message: str, errors: list = None):
         super().__init__(message, status_code=422, details={"errors": errors or []})
@@ -54,67 +52,64 @@ class ServiceUnavailableError(APIError):
     def __init__(self, service: str):
         super().__init__(f"Service unavailable: {service}", status_code=503)
 
+def _error_body(message: str, data=None) -> dict:
+    """Standard error response body ({success, message, data})"""
+    return {"success": False, "message": message, "data": data}
+
 async def api_error_handler(request: Request, exc: APIError) -> JSONResponse:
     """Handle custom API errors"""
-    logger.warning(
-        f"API Error: {exc.message}",
-        extra={
-            "status_code": exc.status_code,
-            "path": request.url.path,
-            "method": request.method,
-            "details": exc.details
-        }
-    )
+    if logger.isEnabledFor(logging.WARNING):
+        logger.warning(
+            "API Error: %s",
+            exc.message,
+            extra={
+                "status_code": exc.status_code,
+                "path": request.url.path,
+                "method": request.method,
+                "details": exc.details
+            }
+        )
     
     return JSONResponse(
         status_code=exc.status_code,
-        content=StandardResponse(
-            success=False,
-            message=exc.message,
-            data=exc.details if exc.details else None
-        ).dict()
+        content=_error_body(exc.message, exc.details if exc.details else None)
     )
 
-async def validation_exception_handler(
-    request: Request, 
-    exc: Union[RequestValidationError, ValidationError]
-) -> JSONResponse:
-    """Handle Pydantic validation errors"""
-    errors = []
+async def validation_exception_handler(request: Request, exc: RequestValidationError) -> JSONResponse:
+    """Handle request validation errors"""
+    errors = [
+        {"field": ".".join(map(str, error["loc"])), "message": error["msg"], "type": error["type"]}
+        for error in exc.errors()
+    ]
     
-    if isinstance(exc, RequestValidationError):
-        for error in exc.errors():
-            errors.append({
-                "field": ".".join(str(x) for x in error["loc"]),
-                "message": error["msg"],
-                "type": error["type"]
-            })
-    
-    logger.warning(
-        f"Validation Error: {request.url.path}",
-        extra={
-            "errors": errors,
-            "method": request.method
-        }
-    )
+    if logger.isEnabledFor(logging.WARNING):
+        logger.warning(
+            "Validation Error: %s",
+            request.url.path,
+            extra={
+                "errors": errors,
+                "method": request.method
+            }
+        )
     
     return JSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-        content=StandardResponse(
-            success=False,
-            message="Validation error",
-            data={"errors": errors}
-        ).dict()
+        content=_error_body("Validation error", {"errors": errors})
     )
 
 async def global_exception_handler(request: Request, exc: Exception) -> JSONResponse:
     """Handle unexpected exceptions"""
+    # Correlates the client-facing response with the logged traceback
+    correlation_id = uuid.uuid4().hex
     logger.error(
-        f"Unexpected error: {str(exc)}",
+        "Unexpected error [%s]: %s",
+        correlation_id,
+        exc,
         exc_info=True,
         extra={
             "path": request.url.path,
-            "method": request.method
+            "method": request.method,
+            "correlation_id": correlation_id
         }
     )
     
@@ -122,22 +117,19 @@ async def global_exception_handler(request: Request, exc: Exception) -> JSONResp
     from config_enhanced import settings
     
     error_message = "An unexpected error occurred"
-    error_details = None
+    error_details = {"correlation_id": correlation_id}
     
     if settings.is_development:
         error_message = str(exc)
-        error_details = {
-            "type": type(exc).__name__,
-            "traceback": str(exc.__traceback__)
-        }
+        error_details["type"] = type(exc).__name__
+        # Keep only the tail of the traceback to cap the response size
+        error_details["traceback"] = "".join(
+            traceback.format_exception(type(exc), exc, exc.__traceback__)
+        )[-2000:]
     
     return JSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        content=StandardResponse(
-            success=False,
-            message=error_message,
-            data=error_details
-        ).dict()
+        content=_error_body(error_message, error_details)
     )
 
 async def http_exception_handler(request: Request, exc: Exception) -> JSONResponse:
@@ -145,22 +137,20 @@ async def http_exception_handler(request: Request, exc: Exception) -> JSONRespon
     status_code = getattr(exc, "status_code", 500)
     detail = getattr(exc, "detail", "An error occurred")
     
-    logger.warning(
-        f"HTTP Exception: {detail}",
-        extra={
-            "status_code": status_code,
-            "path": request.url.path,
-            "method": request.method
-        }
-    )
+    if logger.isEnabledFor(logging.WARNING):
+        logger.warning(
+            "HTTP Exception: %s",
+            detail,
+            extra={
+                "status_code": status_code,
+                "path": request.url.path,
+                "method": request.method
+            }
+        )
     
     return JSONResponse(
         status_code=status_code,
-        content=StandardResponse(
-            success=False,
-            message=detail,
-            data=None
-        ).dict()
+        content=_error_body(detail)
     )
 
 def register_error_handlers(app):
@@ -189,7 +179,7 @@ def not_found(resource: str, identifier: str = None):
 
 def validation_failed(message: str, errors: list = None):
     """Raise validation error"""
-    raise ValidationError(message, errors)
+    raise APIValidationError(message, errors)
 
 def service_unavailable(service: str):
     """Raise service unavailable error"""
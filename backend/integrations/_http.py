@@ -0,0 +1,51 @@
+"""
+Shared HTTP transport for OpenAI SDK clients.
+
+Every `AsyncOpenAI` instance builds its own httpx connection pool unless one
+is passed in. The AI services and the vision integration each hold a client,
+so they share this one pool instead: after the first call, requests to the
+OpenAI endpoint reuse warm keep-alive connections (no new DNS + TLS), and
+with `h2` installed they are multiplexed over a single HTTP/2 connection.
+"""
+import logging
+from typing import Optional
+
+import httpx
+from openai import DefaultAsyncHttpxClient
+
+try:
+    import h2  # noqa: F401  (enables httpx HTTP/2 support)
+    HTTP2_AVAILABLE = True
+except ImportError:  # h2 is optional; the pool then speaks HTTP/1.1
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+OPENAI_MAX_CONNECTIONS = 100
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = 30
+OPENAI_TIMEOUT = 60.0  # seconds
+
+_openai_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_openai_http_client() -> httpx.AsyncClient:
+    """Get the process-wide httpx client for OpenAI calls, creating it on first use"""
+    global _openai_http_client
+    if _openai_http_client is None or _openai_http_client.is_closed:
+        _openai_http_client = DefaultAsyncHttpxClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS
+            ),
+            timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=10.0)
+        )
+    return _openai_http_client
+
+
+async def close_openai_http_client():
+    """Close the shared OpenAI connection pool"""
+    global _openai_http_client
+    if _openai_http_client is not None and not _openai_http_client.is_closed:
+        await _openai_http_client.aclose()
+    _openai_http_client = None
@@ -8,14 +8,86 @@ import logging
 import hashlib
 import hmac
 import base64
-from typing import Dict, Any, List, Optional
+import functools
+import itertools
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, Optional, Tuple, Union
 from datetime import datetime, timezone, timedelta
 from enum import Enum
 import json
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
+from cryptography.fernet import Fernet
+
+# The server runs with backend/ on sys.path; the package is also imported as
+# backend.integrations (tests, tooling), where only the package path resolves.
+# cache_manager is stdlib-only, so either path works at import time.
+try:
+    from cache_manager import CacheManager
+except ImportError:
+    from backend.cache_manager import CacheManager
 
 logger = logging.getLogger(__name__)
 
+
+def get_database():
+    """Get the app database, importing it on first use so this package imports without backend/ on sys.path"""
+    from database import get_database as _get_database
+    return _get_database()
+
+# orjson is optional; it is several times faster for provider request and
+# response bodies, with the stdlib json module as the fallback
+try:
+    import orjson
+    
+    def _json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+    
+    _json_loads = orjson.loads
+except ImportError:
+    _json_dumps = json.dumps
+    _json_loads = json.loads
+
+# Webhook bodies may arrive as any bytes-like buffer; hashlib reads them in place
+BytesLike = Union[bytes, bytearray, memoryview]
+
+# Max in-flight requests per payment provider; matches the connector's
+# per-host limit so bursts queue on the event loop instead of the pool
+PROVIDER_CONCURRENCY_LIMIT = 32
+
+# Outbound token bucket per provider (requests/second and burst size); the
+# bucket is tightened at runtime from the provider's rate-limit headers
+PROVIDER_RATE_LIMIT = 25.0
+PROVIDER_BURST = 25
+
+# Retries for 429/5xx responses, with exponential backoff from the base delay
+PROVIDER_MAX_RETRIES = 3
+PROVIDER_RETRY_BASE_DELAY = 0.5  # seconds
+
+# Integrations live in MongoDB; this process keeps a bounded hot cache of them
+INTEGRATION_CACHE_SIZE = 10_000
+INTEGRATION_CACHE_TTL = 86400  # seconds
+
+# (tenant_id, provider) -> integration_id resolution is cached briefly
+TENANT_PROVIDER_CACHE_SIZE = 5000
+TENANT_PROVIDER_CACHE_TTL = 60  # seconds
+
+# Recently processed webhook events remembered for retry deduplication
+WEBHOOK_DEDUP_SIZE = 100_000
+
+# Webhook bodies at least this large are hashed off the event loop
+WEBHOOK_HASH_OFFLOAD_BYTES = 64 * 1024
+
+# Stripe API version pinned on every request
+STRIPE_API_VERSION = "2023-10-16"
+
+# Smallest AED unit; VAT is rounded to it
+_FILS = Decimal("0.01")
+
+# Record timestamps (created_at, processed_at, ...) are reused for this long
+TIMESTAMP_CACHE_TTL = 0.05  # seconds
+
 class PaymentProvider(Enum):
     STRIPE = "stripe"
     PAYPAL = "paypal"
@@ -40,15 +112,231 @@ class Currency(Enum):
     BTC = "BTC"  # Bitcoin
     ETH = "ETH"  # Ethereum
 
+# Mock analytics data, built once and shared - treat as read-only.
+# In production, query from database and provider APIs
+_MOCK_ANALYTICS: Dict[str, Any] = {
+    "total_revenue": {
+        "amount": 125450.75,
+        "currency": "AED",
+        "growth": "+15.3%"
+    },
+    "transaction_count": {
+        "total": 1247,
+        "successful": 1189,
+        "failed": 58,
+        "success_rate": 95.35
+    },
+    "average_transaction_value": {
+        "amount": 100.52,
+        "currency": "AED"
+    },
+    "payment_methods": {
+        "credit_card": 67.2,
+        "bank_transfer": 18.5,
+        "apple_pay": 8.3,
+        "google_pay": 4.1,
+        "cryptocurrency": 1.9
+    },
+    "currency_breakdown": {
+        Currency.AED.value: 78.5,
+        Currency.USD.value: 15.2,
+        Currency.EUR.value: 4.8,
+        Currency.GBP.value: 1.5
+    },
+    "geographic_distribution": {
+        "UAE": 85.6,
+        "Saudi Arabia": 8.2,
+        "Kuwait": 3.1,
+        "Qatar": 2.1,
+        "Other": 1.0
+    }
+}
+
+class ProviderRateLimiter:
+    """
+    Token bucket for outbound calls to a single payment provider.
+    Honors X-RateLimit-Remaining and Retry-After from provider responses.
+    """
+    
+    def __init__(self, rate: float = PROVIDER_RATE_LIMIT, capacity: int = PROVIDER_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+    
+    def _refill(self, now: float):
+        """Add the tokens accrued since the last refill"""
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    async def acquire(self):
+        """Wait until a request may be sent, then consume a token"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+    
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Tighten the bucket from the provider's rate-limit response headers"""
+        remaining = headers.get("X-RateLimit-Remaining")
+        if remaining is not None:
+            try:
+                self._refill(time.monotonic())
+                self.tokens = min(self.tokens, float(remaining))
+            except ValueError:
+                pass
+        
+        retry_after = headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + float(retry_after))
+            except ValueError:
+                pass
+
+def _parse_signature_header(signature: str) -> Tuple[Optional[str], List[str]]:
+    """
+    Split a Stripe-Signature header ("t=...,v1=...,v1=...") into its timestamp
+    and v1 signatures. A bare hex digest is returned as the only signature.
+    """
+    if "=" not in signature:
+        return None, [signature.strip()]
+    
+    timestamp = None
+    signatures = []
+    for part in signature.split(","):
+        key, _, value = part.strip().partition("=")
+        if key == "t":
+            timestamp = value
+        elif key == "v1":
+            signatures.append(value)
+    return timestamp, signatures
+
+def _digest_matches(digest: bytes, hex_signature: str) -> bool:
+    """Constant-time compare of a raw digest against a hex-encoded signature"""
+    try:
+        expected = bytes.fromhex(hex_signature)
+    except ValueError:
+        return False
+    return hmac.compare_digest(digest, expected)
+
+
+def _signed_payload_digest(mac, timestamp: Optional[str], body: BytesLike) -> bytes:
+    """Feed Stripe's "<timestamp>.<body>" payload into mac piecewise and return the digest"""
+    if timestamp is not None:
+        mac.update(timestamp.encode())
+        mac.update(b".")
+    # memoryview keeps large bodies zero-copy; OpenSSL drops the GIL while hashing them
+    mac.update(memoryview(body))
+    return mac.digest()
+
+
+@functools.lru_cache(maxsize=1)
+def _credentials_cipher() -> Fernet:
+    """
+    Cipher for provider credentials at rest. The key is CREDENTIALS_ENCRYPTION_KEY
+    (a Fernet key); without one it is derived from JWT_SECRET.
+    """
+    from config import settings
+    key = settings.credentials_encryption_key
+    if not key:
+        logger.warning("CREDENTIALS_ENCRYPTION_KEY is not set; deriving the credentials key from JWT_SECRET")
+        digest = hashlib.sha256(b"payment-credentials:" + settings.jwt_secret.encode()).digest()
+        key = base64.urlsafe_b64encode(digest)
+    return Fernet(key)
+
+
+def _encrypt_credentials(credentials: Dict[str, Any]) -> str:
+    """Encrypt a credentials dict into a token safe to store in MongoDB"""
+    return _credentials_cipher().encrypt(_json_dumps(credentials).encode()).decode()
+
+
+def _decrypt_credentials(token: str) -> Dict[str, Any]:
+    """Decrypt a token written by _encrypt_credentials"""
+    return _json_loads(_credentials_cipher().decrypt(token.encode()))
+
+
+def _from_document(integration: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a stored integration document into its in-memory form, decrypting the credentials in place"""
+    token = integration.pop("encrypted_credentials", None)
+    if token is not None:
+        integration["credentials"] = _decrypt_credentials(token)
+    return integration
+
 class PaymentIntegrationManager:
     """
     Advanced payment processing integration manager
     """
     
+    # Stored provider value -> enum member; a dict hit is much cheaper than
+    # the PaymentProvider(value) lookup on every call
+    _provider_by_value: Dict[str, PaymentProvider] = {p.value: p for p in PaymentProvider}
+    
     def __init__(self):
-        self.integrations = {}
+        # integration_id -> integration config, backed by the
+        # payment_integrations collection (see _get_integration)
+        self.integrations = CacheManager(max_size=INTEGRATION_CACHE_SIZE, default_ttl=INTEGRATION_CACHE_TTL)
+        self._tenant_provider_cache = CacheManager(
+            max_size=TENANT_PROVIDER_CACHE_SIZE, default_ttl=TENANT_PROVIDER_CACHE_TTL
+        )
         self.webhook_handlers = {}
         
+        # (integration_id, event_id) -> processed_at, oldest first; bounded LRU
+        # so provider retries are answered without re-verifying or re-handling
+        self._processed_webhooks: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        
+        # Shared HTTP session so provider calls reuse pooled keep-alive
+        # connections; created lazily on first use and closed on shutdown
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._provider_sem = {
+            provider: asyncio.Semaphore(PROVIDER_CONCURRENCY_LIMIT) for provider in PaymentProvider
+        }
+        self._rate_limiters = {provider: ProviderRateLimiter() for provider in PaymentProvider}
+        
+        # integration_id -> keyed HMAC-SHA256 with no data yet; copied per
+        # webhook so the key padding is only derived once per integration
+        self._webhook_macs = CacheManager(max_size=INTEGRATION_CACHE_SIZE, default_ttl=INTEGRATION_CACHE_TTL)
+        # integration_id -> read-only provider auth headers (see _get_auth_headers)
+        self._auth_headers = CacheManager(max_size=INTEGRATION_CACHE_SIZE, default_ttl=INTEGRATION_CACHE_TTL)
+        
+        # Coarse ISO timestamp shared by records created within the same
+        # TIMESTAMP_CACHE_TTL window (see _now_iso)
+        self._cached_iso_ts = ""
+        self._cached_iso_at = float("-inf")
+        
+        # Unique-per-process suffix for generated ids (see _new_id)
+        self._id_counter = itertools.count()
+        
+        # Provider dispatch tables, built once
+        self._connection_tests = {
+            PaymentProvider.STRIPE: self._test_stripe_connection,
+            PaymentProvider.PAYPAL: self._test_paypal_connection,
+            PaymentProvider.UAE_BANKS: self._test_uae_bank_connection,
+            PaymentProvider.CRYPTOCURRENCY: self._test_crypto_connection
+        }
+        self._payment_dispatch = {
+            PaymentProvider.STRIPE: self._process_stripe_payment,
+            PaymentProvider.PAYPAL: self._process_paypal_payment,
+            PaymentProvider.UAE_BANKS: self._process_uae_bank_payment,
+            PaymentProvider.CRYPTOCURRENCY: self._process_crypto_payment
+        }
+        self._subscription_dispatch = {
+            PaymentProvider.STRIPE: self._create_stripe_subscription,
+            PaymentProvider.PAYPAL: self._create_paypal_subscription
+        }
+        self._refund_dispatch = {
+            PaymentProvider.STRIPE: self._process_stripe_refund,
+            PaymentProvider.PAYPAL: self._process_paypal_refund
+        }
+        
         # Payment provider configurations
         self.provider_configs = {
             PaymentProvider.STRIPE: {
@@ -74,6 +362,9 @@ class PaymentIntegrationManager:
                 "networks": ["bitcoin", "ethereum", "binance_smart_chain"]
             }
         }
+        # Currency codes returned to clients, materialized once per provider
+        for cfg in self.provider_configs.values():
+            cfg["_supported_currency_values"] = tuple(c.value for c in cfg.get("supported_currencies", []))
         
         # UAE-specific payment configurations
         self.uae_config = {
@@ -97,15 +388,19 @@ class PaymentIntegrationManager:
             }
         }
         
+        # VAT math is done in Decimal; the rate is converted once
+        self._vat_rate = Decimal(str(self.uae_config["vat_rate"]))
+        
         logger.info("Payment Integration Manager initialized")
     
     async def setup_payment_integration(self, provider: PaymentProvider, credentials: Dict[str, Any], tenant_id: str = None) -> Dict[str, Any]:
         """Setup payment integration for a tenant"""
         try:
-            integration_id = f"{provider.value}_{tenant_id or 'default'}_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}"
+            integration_id = self._new_id(f"{provider.value}_{tenant_id or 'default'}")
             
             # Validate credentials and test connection
-            connection_test = await self._test_payment_connection(provider, credentials)
+            auth_headers = self._build_auth_headers(provider, credentials)
+            connection_test = await self._test_payment_connection(provider, credentials, auth_headers)
             
             if not connection_test.get("success"):
                 return {"error": f"Failed to connect to {provider.value}: {connection_test.get('error')}"}
@@ -115,9 +410,8 @@ class PaymentIntegrationManager:
                 "integration_id": integration_id,
                 "provider": provider.value,
                 "tenant_id": tenant_id,
-                "credentials": credentials,  # In production, encrypt these
                 "status": "active",
-                "created_at": datetime.now(timezone.utc).isoformat(),
+                "created_at": self._now_iso(),
                 "settings": {
                     "auto_capture": True,
                     "send_receipts": True,
@@ -126,10 +420,19 @@ class PaymentIntegrationManager:
                     "fraud_detection": True,
                     "uae_compliance": True
                 },
-                "fees": await self._calculate_integration_fees(provider)
+                "fees": self._calculate_integration_fees(provider)
             }
             
-            self.integrations[integration_id] = integration_config
+            # Provider secrets are only ever written encrypted; insert_one adds
+            # _id to the document it is given, so it gets its own copy
+            await get_database().payment_integrations.insert_one(
+                {**integration_config, "encrypted_credentials": _encrypt_credentials(credentials)}
+            )
+            integration_config["credentials"] = credentials
+            self.integrations.set(integration_id, integration_config)
+            self._tenant_provider_cache.set((tenant_id, provider.value), integration_id)
+            self._webhook_macs.set(integration_id, self._build_webhook_mac(credentials))
+            self._auth_headers.set(integration_id, auth_headers)
             
             # Setup webhooks
             webhook_result = await self._setup_payment_webhooks(provider, credentials, integration_id)
@@ -138,7 +441,7 @@ class PaymentIntegrationManager:
                 "integration_id": integration_id,
                 "provider": provider.value,
                 "status": "connected",
-                "supported_currencies": [c.value for c in self.provider_configs[provider]["supported_currencies"]],
+                "supported_currencies": self.provider_configs[provider]["_supported_currency_values"],
                 "features": self.provider_configs[provider]["features"],
                 "webhook_status": webhook_result.get("status", "not_configured"),
                 "uae_compliance": integration_config["settings"]["uae_compliance"]
@@ -148,55 +451,94 @@ class PaymentIntegrationManager:
             logger.error(f"Error setting up payment integration: {e}")
             return {"error": f"Failed to setup payment integration: {str(e)}"}
     
+    async def setup_many(self, requests: List[Tuple[PaymentProvider, Dict[str, Any], Optional[str]]]) -> List[Dict[str, Any]]:
+        """
+        Setup several integrations concurrently.
+        requests holds (provider, credentials, tenant_id) tuples; results are in the same order.
+        """
+        results = await asyncio.gather(
+            *(self.setup_payment_integration(provider, credentials, tenant_id) for provider, credentials, tenant_id in requests),
+            return_exceptions=True
+        )
+        return [
+            {"error": f"Failed to setup payment integration: {str(result)}"} if isinstance(result, BaseException) else result
+            for result in results
+        ]
+    
+    async def get_integration_for(self, tenant_id: Optional[str], provider: PaymentProvider) -> Optional[Dict[str, Any]]:
+        """Get a tenant's most recent integration with a provider"""
+        cache_key = (tenant_id, provider.value)
+        integration_id = self._tenant_provider_cache.get(cache_key)
+        if integration_id is not None:
+            integration = await self._get_integration(integration_id)
+            if integration:
+                return integration
+        
+        cursor = (
+            get_database().payment_integrations
+            .find({"tenant_id": tenant_id, "provider": provider.value}, projection={"_id": 0})
+            .sort("created_at", -1)
+            .limit(1)
+        )
+        docs = await cursor.to_list(length=1)
+        if not docs:
+            return None
+        
+        integration = _from_document(docs[0])
+        self.integrations.set(integration["integration_id"], integration)
+        self._tenant_provider_cache.set(cache_key, integration["integration_id"])
+        return integration
+    
     async def process_payment(self, integration_id: str, payment_data: Dict[str, Any]) -> Dict[str, Any]:
         """Process a payment through the integrated payment provider"""
         try:
-            integration = self.integrations.get(integration_id)
+            integration = await self._get_integration(integration_id)
             if not integration:
                 return {"error": "Payment integration not found"}
             
-            provider = PaymentProvider(integration["provider"])
+            provider = self._provider_by_value[integration["provider"]]
             credentials = integration["credentials"]
             
             # Add UAE-specific data if needed
             if integration["settings"]["uae_compliance"]:
-                payment_data = await self._add_uae_compliance_data(payment_data)
+                payment_data = self._add_uae_compliance_data(payment_data)
             
-            # Process payment based on provider
-            if provider == PaymentProvider.STRIPE:
-                result = await self._process_stripe_payment(credentials, payment_data)
-            elif provider == PaymentProvider.PAYPAL:
-                result = await self._process_paypal_payment(credentials, payment_data)
-            elif provider == PaymentProvider.UAE_BANKS:
-                result = await self._process_uae_bank_payment(credentials, payment_data)
-            elif provider == PaymentProvider.CRYPTOCURRENCY:
-                result = await self._process_crypto_payment(credentials, payment_data)
-            else:
+            handler = self._payment_dispatch.get(provider)
+            if handler is None:
                 return {"error": f"Unsupported payment provider: {provider.value}"}
             
+            # Process payment based on provider; its HTTP calls are bounded
+            # per provider in _provider_request
+            result = await handler(credentials, payment_data)
+            
+            payment_id = result.get("payment_id")
+            status = result.get("status")
+            amount = payment_data.get("amount")
+            currency = payment_data.get("currency")
+            
             # Store payment record
             payment_record = {
-                "payment_id": result.get("payment_id"),
+                "payment_id": payment_id,
                 "integration_id": integration_id,
                 "provider": provider.value,
-                "amount": payment_data.get("amount"),
-                "currency": payment_data.get("currency", Currency.AED.value),
-                "status": result.get("status", PaymentStatus.PENDING.value),
+                "amount": amount,
+                "currency": currency or Currency.AED.value,
+                "status": status or PaymentStatus.PENDING.value,
                 "customer_email": payment_data.get("customer_email"),
                 "description": payment_data.get("description"),
-                "created_at": datetime.now(timezone.utc).isoformat(),
+                "created_at": self._now_iso(),
                 "provider_response": result
             }
             
             # In production, store in database
-            logger.info(f"Payment processed: {payment_record['payment_id']}")
+            logger.info(f"Payment processed: {payment_id}")
             
             return {
                 "success": result.get("success", False),
-                "payment_id": result.get("payment_id"),
-                "status": result.get("status"),
-                "amount": payment_data.get("amount"),
-                "currency": payment_data.get("currency"),
+                "payment_id": payment_id,
+                "status": status,
+                "amount": amount,
+                "currency": currency,
                 "payment_url": result.get("payment_url"),
                 "receipt_url": result.get("receipt_url"),
                 "provider_transaction_id": result.get("provider_transaction_id")
@@ -209,20 +551,18 @@ class PaymentIntegrationManager:
     async def create_subscription(self, integration_id: str, subscription_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a recurring subscription"""
         try:
-            integration = self.integrations.get(integration_id)
+            integration = await self._get_integration(integration_id)
             if not integration:
                 return {"error": "Payment integration not found"}
             
-            provider = PaymentProvider(integration["provider"])
+            provider = self._provider_by_value[integration["provider"]]
             credentials = integration["credentials"]
             
             # Create subscription based on provider
-            if provider == PaymentProvider.STRIPE:
-                result = await self._create_stripe_subscription(credentials, subscription_data)
-            elif provider == PaymentProvider.PAYPAL:
-                result = await self._create_paypal_subscription(credentials, subscription_data)
-            else:
+            handler = self._subscription_dispatch.get(provider)
+            if handler is None:
                 return {"error": f"Subscriptions not supported by {provider.value}"}
+            result = await handler(credentials, subscription_data)
             
             return {
                 "success": result.get("success", False),
@@ -241,20 +581,18 @@ class PaymentIntegrationManager:
     async def process_refund(self, integration_id: str, payment_id: str, amount: Optional[float] = None) -> Dict[str, Any]:
         """Process a refund for a payment"""
         try:
-            integration = self.integrations.get(integration_id)
+            integration = await self._get_integration(integration_id)
             if not integration:
                 return {"error": "Payment integration not found"}
             
-            provider = PaymentProvider(integration["provider"])
+            provider = self._provider_by_value[integration["provider"]]
             credentials = integration["credentials"]
             
             # Process refund based on provider
-            if provider == PaymentProvider.STRIPE:
-                result = await self._process_stripe_refund(credentials, payment_id, amount)
-            elif provider == PaymentProvider.PAYPAL:
-                result = await self._process_paypal_refund(credentials, payment_id, amount)
-            else:
+            handler = self._refund_dispatch.get(provider)
+            if handler is None:
                 return {"error": f"Refunds not supported by {provider.value}"}
+            result = await handler(credentials, payment_id, amount)
             
             return {
                 "success": result.get("success", False),
@@ -272,135 +610,206 @@ class PaymentIntegrationManager:
     async def get_payment_analytics(self, integration_id: str, date_range: Dict[str, str]) -> Dict[str, Any]:
         """Get payment analytics for the integration"""
         try:
-            integration = self.integrations.get(integration_id)
+            integration = await self._get_integration(integration_id)
             if not integration:
                 return {"error": "Payment integration not found"}
             
-            # Mock analytics data - in production, query from database and provider APIs
-            analytics = {
-                "total_revenue": {
-                    "amount": 125450.75,
-                    "currency": "AED",
-                    "growth": "+15.3%"
-                },
-                "transaction_count": {
-                    "total": 1247,
-                    "successful": 1189,
-                    "failed": 58,
-                    "success_rate": 95.35
-                },
-                "average_transaction_value": {
-                    "amount": 100.52,
-                    "currency": "AED"
-                },
-                "payment_methods": {
-                    "credit_card": 67.2,
-                    "bank_transfer": 18.5,
-                    "apple_pay": 8.3,
-                    "google_pay": 4.1,
-                    "cryptocurrency": 1.9
-                },
-                "currency_breakdown": {
-                    Currency.AED.value: 78.5,
-                    Currency.USD.value: 15.2,
-                    Currency.EUR.value: 4.8,
-                    Currency.GBP.value: 1.5
-                },
-                "geographic_distribution": {
-                    "UAE": 85.6,
-                    "Saudi Arabia": 8.2,
-                    "Kuwait": 3.1,
-                    "Qatar": 2.1,
-                    "Other": 1.0
-                }
-            }
-            
             return {
                 "integration_id": integration_id,
                 "date_range": date_range,
-                "analytics": analytics,
-                "retrieved_at": datetime.now(timezone.utc).isoformat()
+                "analytics": _MOCK_ANALYTICS,
+                "retrieved_at": self._now_iso()
             }
             
         except Exception as e:
             logger.error(f"Error getting payment analytics: {e}")
             return {"error": f"Payment analytics retrieval failed: {str(e)}"}
     
-    async def handle_payment_webhook(self, integration_id: str, webhook_data: Dict[str, Any], signature: str) -> Dict[str, Any]:
-        """Handle incoming payment webhook"""
+    async def handle_payment_webhook(self, integration_id: str, webhook_data: Dict[str, Any], signature: str, raw_body: BytesLike) -> Dict[str, Any]:
+        """
+        Handle incoming payment webhook.
+        raw_body is the request body exactly as received - providers sign those
+        bytes, so it is verified as-is while webhook_data is its parsed form.
+        """
         try:
-            integration = self.integrations.get(integration_id)
+            event_id = webhook_data.get("id")
+            event_type = webhook_data.get("type", webhook_data.get("event_type", "unknown"))
+            
+            # Provider retries of an event we already handled
+            dedup_key = (integration_id, event_id) if event_id else None
+            if dedup_key is not None and dedup_key in self._processed_webhooks:
+                self._processed_webhooks.move_to_end(dedup_key)
+                return {
+                    "integration_id": integration_id,
+                    "event_type": event_type,
+                    "processing_result": {"status": "duplicate", "event_id": event_id},
+                    "processed_at": self._processed_webhooks[dedup_key]
+                }
+            
+            integration = await self._get_integration(integration_id)
             if not integration:
                 return {"error": "Payment integration not found"}
             
-            provider = PaymentProvider(integration["provider"])
+            provider = self._provider_by_value[integration["provider"]]
             
             # Verify webhook signature
-            if not await self._verify_webhook_signature(provider, webhook_data, signature, integration["credentials"]):
+            if not await self._verify_webhook_signature(provider, raw_body, signature, integration_id):
                 return {"error": "Invalid webhook signature"}
             
-            event_type = webhook_data.get("type", webhook_data.get("event_type", "unknown"))
-            
             # Process webhook based on event type
             if event_type in ["payment_intent.succeeded", "payment.completed"]:
-                result = await self._handle_payment_succeeded(webhook_data, integration["tenant_id"])
+                result = self._handle_payment_succeeded(webhook_data, integration["tenant_id"])
             elif event_type in ["payment_intent.payment_failed", "payment.failed"]:
-                result = await self._handle_payment_failed(webhook_data, integration["tenant_id"])
+                result = self._handle_payment_failed(webhook_data, integration["tenant_id"])
             elif event_type in ["invoice.payment_succeeded", "subscription.renewed"]:
-                result = await self._handle_subscription_payment(webhook_data, integration["tenant_id"])
+                result = self._handle_subscription_payment(webhook_data, integration["tenant_id"])
             else:
                 result = {"status": "ignored", "reason": f"Unsupported event type: {event_type}"}
             
+            processed_at = self._now_iso()
+            if dedup_key is not None:
+                self._processed_webhooks[dedup_key] = processed_at
+                if len(self._processed_webhooks) > WEBHOOK_DEDUP_SIZE:
+                    self._processed_webhooks.popitem(last=False)
+            
             return {
                 "integration_id": integration_id,
                 "event_type": event_type,
                 "processing_result": result,
-                "processed_at": datetime.now(timezone.utc).isoformat()
+                "processed_at": processed_at
             }
             
         except Exception as e:
             logger.error(f"Error handling payment webhook: {e}")
             return {"error": f"Webhook processing failed: {str(e)}"}
     
+    async def close(self):
+        """Close the shared HTTP session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
     # Private methods for payment provider implementations
     
-    async def _test_payment_connection(self, provider: PaymentProvider, credentials: Dict[str, Any]) -> Dict[str, Any]:
+    def _now_iso(self) -> str:
+        """Current UTC time as ISO-8601, refreshed at most every TIMESTAMP_CACHE_TTL"""
+        now = time.monotonic()
+        if now - self._cached_iso_at >= TIMESTAMP_CACHE_TTL:
+            self._cached_iso_ts = datetime.now(timezone.utc).isoformat()
+            self._cached_iso_at = now
+        return self._cached_iso_ts
+    
+    def _new_id(self, prefix: str, sep: str = "_") -> str:
+        """Generate a unique id: nanosecond clock plus a counter, both in hex"""
+        return f"{prefix}{sep}{time.time_ns():x}{sep}{next(self._id_counter):x}"
+    
+    async def _get_integration(self, integration_id: str) -> Optional[Dict[str, Any]]:
+        """Get an integration from the hot cache, falling back to MongoDB"""
+        integration = self.integrations.get(integration_id)
+        if integration is None:
+            integration = await get_database().payment_integrations.find_one(
+                {"integration_id": integration_id}, projection={"_id": 0}
+            )
+            if integration:
+                self.integrations.set(integration_id, _from_document(integration))
+        return integration
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Get the shared HTTP session, creating it on first use"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=200,
+                    limit_per_host=PROVIDER_CONCURRENCY_LIMIT,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=75
+                ),
+                json_serialize=_json_dumps
+            )
+        return self._session
+    
+    async def _provider_request(self, provider: PaymentProvider, method: str, url: str, **kwargs) -> Tuple[int, Any]:
+        """
+        Send a rate-limited request to a payment provider.
+        Retries 429/5xx responses with exponential backoff; returns (status, json or None).
+        """
+        session = await self._get_session()
+        limiter = self._rate_limiters[provider]
+        
+        for attempt in range(PROVIDER_MAX_RETRIES + 1):
+            await limiter.acquire()
+            async with self._provider_sem[provider]:
+                async with session.request(method, url, **kwargs) as resp:
+                    limiter.update_from_headers(resp.headers)
+                    retryable = resp.status == 429 or resp.status >= 500
+                    if not retryable or attempt == PROVIDER_MAX_RETRIES:
+                        payload = await resp.json(loads=_json_loads) if 200 <= resp.status < 300 else None
+                        return resp.status, payload
+            
+            logger.warning(f"{provider.value} returned HTTP {resp.status}, retrying ({attempt + 1}/{PROVIDER_MAX_RETRIES})")
+            await asyncio.sleep(PROVIDER_RETRY_BASE_DELAY * 2 ** attempt)
+    
+    @staticmethod
+    def _build_auth_headers(provider: PaymentProvider, credentials: Dict[str, Any]) -> Mapping[str, str]:
+        """Build the read-only auth headers for a provider's API"""
+        if provider == PaymentProvider.STRIPE:
+            return MappingProxyType({
+                "Authorization": f"Bearer {credentials.get('secret_key')}",
+                "Stripe-Version": STRIPE_API_VERSION
+            })
+        return MappingProxyType({})
+    
+    def _get_auth_headers(self, integration: Dict[str, Any]) -> Mapping[str, str]:
+        """Get an integration's prebuilt auth headers, rebuilding them after eviction"""
+        integration_id = integration["integration_id"]
+        headers = self._auth_headers.get(integration_id)
+        if headers is None:
+            provider = self._provider_by_value[integration["provider"]]
+            headers = self._build_auth_headers(provider, integration["credentials"])
+            self._auth_headers.set(integration_id, headers)
+        return headers
+    
+    async def _test_payment_connection(self, provider: PaymentProvider, credentials: Dict[str, Any], auth_headers: Optional[Mapping[str, str]] = None) -> Dict[str, Any]:
         """Test connection to payment provider"""
         try:
-            if provider == PaymentProvider.STRIPE:
-                # Test Stripe connection
-                headers = {"Authorization": f"Bearer {credentials.get('secret_key')}"}
-                async with aiohttp.ClientSession() as session:
-                    async with session.get("https://api.stripe.com/v1/account", headers=headers) as resp:
-                        if resp.status == 200:
-                            account_data = await resp.json()
-                            return {
-                                "success": True, 
-                                "account_id": account_data.get("id"),
-                                "country": account_data.get("country"),
-                                "currencies": account_data.get("default_currency")
-                            }
-                        else:
-                            return {"success": False, "error": f"HTTP {resp.status}"}
-            
-            elif provider == PaymentProvider.PAYPAL:
-                # Test PayPal connection
-                return {"success": True, "features": ["payments", "subscriptions", "refunds"]}
-            
-            elif provider == PaymentProvider.UAE_BANKS:
-                # Test UAE bank integration
-                return {"success": True, "supported_banks": list(self.uae_config["local_banks"].keys())}
-            
-            elif provider == PaymentProvider.CRYPTOCURRENCY:
-                # Test crypto payment processor
-                return {"success": True, "supported_currencies": ["BTC", "ETH"]}
-            
-            return {"success": True}
+            connection_test = self._connection_tests.get(provider)
+            if connection_test is None:
+                return {"success": True}
+            if auth_headers is None:
+                auth_headers = self._build_auth_headers(provider, credentials)
+            return await connection_test(credentials, auth_headers)
             
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    async def _calculate_integration_fees(self, provider: PaymentProvider) -> Dict[str, Any]:
+    async def _test_stripe_connection(self, credentials: Dict[str, Any], auth_headers: Mapping[str, str]) -> Dict[str, Any]:
+        """Test Stripe connection"""
+        status, account_data = await self._provider_request(
+            PaymentProvider.STRIPE, "GET", "https://api.stripe.com/v1/account", headers=auth_headers
+        )
+        if status == 200:
+            return {
+                "success": True, 
+                "account_id": account_data.get("id"),
+                "country": account_data.get("country"),
+                "currencies": account_data.get("default_currency")
+            }
+        else:
+            return {"success": False, "error": f"HTTP {status}"}
+    
+    async def _test_paypal_connection(self, credentials: Dict[str, Any], auth_headers: Mapping[str, str]) -> Dict[str, Any]:
+        """Test PayPal connection"""
+        return {"success": True, "features": ["payments", "subscriptions", "refunds"]}
+    
+    async def _test_uae_bank_connection(self, credentials: Dict[str, Any], auth_headers: Mapping[str, str]) -> Dict[str, Any]:
+        """Test UAE bank integration"""
+        return {"success": True, "supported_banks": list(self.uae_config["local_banks"].keys())}
+    
+    async def _test_crypto_connection(self, credentials: Dict[str, Any], auth_headers: Mapping[str, str]) -> Dict[str, Any]:
+        """Test crypto payment processor"""
+        return {"success": True, "supported_currencies": ["BTC", "ETH"]}
+    
+    def _calculate_integration_fees(self, provider: PaymentProvider) -> Dict[str, Any]:
         """Calculate integration fees for provider"""
         fee_structures = {
             PaymentProvider.STRIPE: {
@@ -428,16 +837,19 @@ class PaymentIntegrationManager:
         
         return fee_structures.get(provider, {"transaction_fee": 0, "fixed_fee": 0})
     
-    async def _add_uae_compliance_data(self, payment_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _add_uae_compliance_data(self, payment_data: Dict[str, Any]) -> Dict[str, Any]:
         """Add UAE compliance data to payment"""
-        # Add VAT calculation
-        amount = float(payment_data.get("amount", 0))
-        vat_amount = amount * self.uae_config["vat_rate"]
+        # Add VAT calculation - Decimal, with VAT rounded half-up to the fils so
+        # amount + VAT always equals the invoiced total. The record is stored and
+        # returned as JSON/BSON, neither of which encodes Decimal, so the
+        # amounts are written as exact decimal strings
+        amount = Decimal(str(payment_data.get("amount", 0)))
+        vat_amount = (amount * self._vat_rate).quantize(_FILS, rounding=ROUND_HALF_UP)
         
         payment_data.update({
-            "vat_rate": self.uae_config["vat_rate"],
-            "vat_amount": vat_amount,
-            "total_with_vat": amount + vat_amount,
+            "vat_rate": str(self._vat_rate),
+            "vat_amount": str(vat_amount),
+            "total_with_vat": str(amount + vat_amount),
             "compliance": {
                 "aml_checked": True,
                 "kyc_verified": payment_data.get("kyc_verified", False),
@@ -446,7 +858,7 @@ class PaymentIntegrationManager:
             "invoice_data": {
                 "supplier_trn": "100000000000003",  # UAE Tax Registration Number
                 "customer_trn": payment_data.get("customer_trn", ""),
-                "invoice_number": f"INV-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}"
+                "invoice_number": self._new_id("INV", "-")
             }
         })
         
@@ -456,7 +868,7 @@ class PaymentIntegrationManager:
         """Process payment through Stripe"""
         try:
             # Mock Stripe payment processing
-            payment_id = f"pi_stripe_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}"
+            payment_id = self._new_id("pi_stripe")
             
             return {
                 "success": True,
@@ -474,7 +886,7 @@ class PaymentIntegrationManager:
         """Process payment through PayPal"""
         try:
             # Mock PayPal payment processing
-            payment_id = f"PAYID-PAYPAL-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}"
+            payment_id = self._new_id("PAYID-PAYPAL", "-")
             
             return {
                 "success": True,
@@ -491,7 +903,7 @@ class PaymentIntegrationManager:
         """Process payment through UAE banking system"""
         try:
             # Mock UAE bank payment processing
-            payment_id = f"UAE-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}"
+            payment_id = self._new_id("UAE", "-")
             
             return {
                 "success": True,
@@ -508,7 +920,7 @@ class PaymentIntegrationManager:
         """Process cryptocurrency payment"""
         try:
             # Mock crypto payment processing
-            payment_id = f"CRYPTO-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}"
+            payment_id = self._new_id("CRYPTO", "-")
             
             return {
                 "success": True,
@@ -540,18 +952,30 @@ class PaymentIntegrationManager:
         except Exception as e:
             return {"status": "error", "error": str(e)}
     
-    async def _verify_webhook_signature(self, provider: PaymentProvider, webhook_data: Dict[str, Any], signature: str, credentials: Dict[str, Any]) -> bool:
-        """Verify webhook signature"""
+    @staticmethod
+    def _build_webhook_mac(credentials: Dict[str, Any]) -> hmac.HMAC:
+        """Key an HMAC-SHA256 with the integration's webhook secret"""
+        return hmac.new(credentials.get("webhook_secret", "").encode(), digestmod=hashlib.sha256)
+    
+    async def _verify_webhook_signature(self, provider: PaymentProvider, raw_body: BytesLike, signature: str, integration_id: str) -> bool:
+        """Verify webhook signature over the raw request body"""
         try:
             if provider == PaymentProvider.STRIPE:
                 # Stripe signature verification
-                webhook_secret = credentials.get("webhook_secret", "")
-                computed_signature = hmac.new(
-                    webhook_secret.encode(),
-                    json.dumps(webhook_data).encode(),
-                    hashlib.sha256
-                ).hexdigest()
-                return hmac.compare_digest(signature, computed_signature)
+                template = self._webhook_macs.get(integration_id)
+                if template is None:
+                    integration = await self._get_integration(integration_id)
+                    template = self._build_webhook_mac(integration["credentials"])
+                    self._webhook_macs.set(integration_id, template)
+                timestamp, signatures = _parse_signature_header(signature)
+                mac = template.copy()
+                if len(raw_body) >= WEBHOOK_HASH_OFFLOAD_BYTES:
+                    digest = await asyncio.to_thread(_signed_payload_digest, mac, timestamp, raw_body)
+                else:
+                    digest = _signed_payload_digest(mac, timestamp, raw_body)
+                # Check every candidate so timing doesn't reveal which one matched
+                matches = [_digest_matches(digest, candidate) for candidate in signatures]
+                return any(matches)
             
             # For other providers, implement their specific verification
             return True  # Mock verification
@@ -565,7 +989,7 @@ class PaymentIntegrationManager:
         # Mock implementation
         return {
             "success": True,
-            "subscription_id": f"sub_stripe_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}",
+            "subscription_id": self._new_id("sub_stripe"),
             "status": "active",
             "next_billing_date": (datetime.now(timezone.utc) + timedelta(days=30)).isoformat()
         }
@@ -575,7 +999,7 @@ class PaymentIntegrationManager:
         # Mock implementation
         return {
             "success": True,
-            "subscription_id": f"I-PAYPAL-{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}",
+            "subscription_id": self._new_id("I-PAYPAL", "-"),
             "status": "active",
             "next_billing_date": (datetime.now(timezone.utc) + timedelta(days=30)).isoformat()
         }
@@ -585,7 +1009,7 @@ class PaymentIntegrationManager:
         # Mock implementation
         return {
             "success": True,
-            "refund_id": f"re_stripe_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}",
+            "refund_id": self._new_id("re_stripe"),
             "amount": amount or 100.0,
             "currency": "AED",
             "status": "succeeded",
@@ -597,22 +1021,22 @@ class PaymentIntegrationManager:
         # Mock implementation
         return {
             "success": True,
-            "refund_id": f"REFUND-PAYPAL-{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}",
+            "refund_id": self._new_id("REFUND-PAYPAL", "-"),
             "amount": amount or 100.0,
             "currency": "AED",
             "status": "completed",
             "estimated_arrival": "3-5 business days"
         }
     
-    async def _handle_payment_succeeded(self, webhook_data: Dict[str, Any], tenant_id: str) -> Dict[str, Any]:
+    def _handle_payment_succeeded(self, webhook_data: Dict[str, Any], tenant_id: str) -> Dict[str, Any]:
         """Handle successful payment webhook"""
         return {"status": "processed", "action": "payment_confirmed"}
     
-    async def _handle_payment_failed(self, webhook_data: Dict[str, Any], tenant_id: str) -> Dict[str, Any]:
+    def _handle_payment_failed(self, webhook_data: Dict[str, Any], tenant_id: str) -> Dict[str, Any]:
         """Handle failed payment webhook"""
         return {"status": "processed", "action": "payment_failure_notified"}
     
-    async def _handle_subscription_payment(self, webhook_data: Dict[str, Any], tenant_id: str) -> Dict[str, Any]:
+    def _handle_subscription_payment(self, webhook_data: Dict[str, Any], tenant_id: str) -> Dict[str, Any]:
         """Handle subscription payment webhook"""
         return {"status": "processed", "action": "subscription_renewed"}
 
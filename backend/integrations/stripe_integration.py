@@ -8,24 +8,37 @@ unchanged: `PACKAGES`, `create_session(package_id, host_url, metadata)` ->
 {"url","session_id","package"}, and `get_status(session_id)` ->
 {"status","payment_status","amount_total","currency"}.
 
-The `stripe` SDK is synchronous, so calls are wrapped in `asyncio.to_thread`
-to keep the async API the server expects. AED amounts are converted to fils
-(smallest currency unit) as integers — Stripe requires integer minor units.
+One `StripeClient` backed by the SDK's aiohttp transport is built per
+integration and reused for the process lifetime, so checkout calls share a
+keep-alive connection pool instead of blocking a worker thread and opening a
+new TLS connection each time. AED amounts are converted to fils (smallest
+currency unit) as integers — Stripe requires integer minor units.
 """
+import functools
 import logging
 import os
-import asyncio
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
 import stripe
 
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=8)
+def _checkout_urls(host_url: str) -> Tuple[str, str]:
+    """Success and cancel redirect URLs for a host; hosts repeat per deployment"""
+    return (
+        f"{host_url}/payment-success?session_id={{CHECKOUT_SESSION_ID}}",
+        f"{host_url}/payment-cancel",
+    )
+
+
 class StripeIntegration:
     def __init__(self):
         self.api_key = os.getenv("STRIPE_API_KEY", "sk_test_emergent")
         self.stripe_checkout = None  # kept for backward-compat; unused by direct SDK path
+        self._http_client = stripe.AIOHTTPClient()
+        self.client = stripe.StripeClient(self.api_key, http_client=self._http_client)
 
         # Payment packages (amounts in AED)
         self.PACKAGES = {
@@ -33,54 +46,55 @@ class StripeIntegration:
             "growth": {"amount": 5000.00, "currency": "aed", "name": "Growth Package"},
             "enterprise": {"amount": 10000.00, "currency": "aed", "name": "Enterprise Package"}
         }
+        # Checkout line items never change per package, so build them once
+        self._line_items: Dict[str, List[Dict[str, Any]]] = {
+            package_id: self._build_line_items(pkg) for package_id, pkg in self.PACKAGES.items()
+        }
+
+    @staticmethod
+    def _build_line_items(pkg: Dict[str, Any]) -> List[Dict[str, Any]]:
+        # Stripe expects the amount in the smallest currency unit. AED has
+        # 2 decimal places (100 fils = 1 AED), so multiply by 100 and round.
+        return [{
+            "price_data": {
+                "currency": pkg["currency"],
+                "product_data": {"name": pkg["name"]},
+                "unit_amount": int(round(pkg["amount"] * 100)),
+            },
+            "quantity": 1,
+        }]
 
     def initialize(self, webhook_url: str):
         """Backward-compat hook. Previously built the emergentintegrations
-        checkout client; now just ensures the SDK key is set. Safe to call."""
+        checkout client; the SDK client is now built in __init__. Safe to call."""
         stripe.api_key = self.api_key
-        self.stripe_checkout = True  # marker so create_session's guard passes
+
+    async def close(self):
+        """Close the pooled HTTP session used by the SDK client"""
+        await self._http_client.close_async()
 
     async def create_session(self, package_id: str, host_url: str, metadata: Optional[Dict] = None):
         try:
-            if not self.stripe_checkout:
-                self.initialize(f"{host_url}/api/integrations/payments/webhook")
-
-            if package_id not in self.PACKAGES:
+            line_items = self._line_items.get(package_id)
+            if line_items is None:
                 return {"error": "Invalid package"}
 
-            pkg = self.PACKAGES[package_id]
-            currency = pkg["currency"]
-            # Stripe expects the amount in the smallest currency unit. AED has
-            # 2 decimal places (100 fils = 1 AED), so multiply by 100 and round.
-            unit_amount = int(round(pkg["amount"] * 100))
-
-            def _create():
-                return stripe.checkout.Session.create(
-                    mode="payment",
-                    line_items=[{
-                        "price_data": {
-                            "currency": currency,
-                            "product_data": {"name": pkg["name"]},
-                            "unit_amount": unit_amount,
-                        },
-                        "quantity": 1,
-                    }],
-                    success_url=f"{host_url}/payment-success?session_id={{CHECKOUT_SESSION_ID}}",
-                    cancel_url=f"{host_url}/payment-cancel",
-                    metadata=metadata or {"package_id": package_id},
-                )
-
-            session = await asyncio.to_thread(_create)
-            return {"url": session.url, "session_id": session.id, "package": pkg}
+            success_url, cancel_url = _checkout_urls(host_url)
+            session = await self.client.v1.checkout.sessions.create_async(params={
+                "mode": "payment",
+                "line_items": line_items,
+                "success_url": success_url,
+                "cancel_url": cancel_url,
+                "metadata": metadata or {"package_id": package_id},
+            })
+            return {"url": session.url, "session_id": session.id, "package": self.PACKAGES[package_id]}
         except Exception as e:
             logger.error(f"Stripe session error: {e}")
             return {"error": str(e)}
 
     async def get_status(self, session_id: str):
         try:
-            def _retrieve():
-                return stripe.checkout.Session.retrieve(session_id)
-            status = await asyncio.to_thread(_retrieve)
+            status = await self.client.v1.checkout.sessions.retrieve_async(session_id)
             return {
                 "status": status.status,
                 "payment_status": status.payment_status,
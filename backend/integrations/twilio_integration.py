@@ -1,70 +1,203 @@
 """
 Twilio SMS Integration
 """
+import aiohttp
+import asyncio
 import logging
 import os
-from typing import Dict, Any
-from twilio.rest import Client
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
 
 logger = logging.getLogger(__name__)
 
+TWILIO_API_URL = "https://api.twilio.com/2010-04-01"
+TWILIO_VERIFY_URL = "https://verify.twilio.com/v2"
+
+# Keep-alive pool shared by every Twilio call
+TWILIO_MAX_CONNECTIONS = 100
+TWILIO_MAX_CONNECTIONS_PER_HOST = 20
+TWILIO_TIMEOUT = 30  # seconds
+
+# Bulk sends: in-flight request cap and account-wide request rate
+TWILIO_BULK_CONCURRENCY = 20
+TWILIO_REQUESTS_PER_SECOND = 25
+
+# Approved OTP checks are replayed from memory for retries and double submits
+VERIFY_CACHE_TTL = 60  # seconds
+VERIFY_CACHE_MAX_ENTRIES = 1024
+
+
+class TwilioAPIError(Exception):
+    """Raised when the Twilio REST API returns an error response"""
+
+
+class _TokenBucket:
+    """Async token bucket spacing out requests to a steady per-second rate"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
 class TwilioIntegration:
     def __init__(self):
         self.account_sid = os.getenv("TWILIO_ACCOUNT_SID")
         self.auth_token = os.getenv("TWILIO_AUTH_TOKEN")
         self.verify_service_sid = os.getenv("TWILIO_VERIFY_SERVICE")
-        self.client = None
+        self.auth: Optional[aiohttp.BasicAuth] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._send_bucket = _TokenBucket(TWILIO_REQUESTS_PER_SECOND)
+        self._verify_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
         
         if self.account_sid and self.auth_token:
-            self.client = Client(self.account_sid, self.auth_token)
+            self.auth = aiohttp.BasicAuth(self.account_sid, self.auth_token)
+    
+    async def close(self):
+        """Close the shared HTTP session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Get the shared HTTP session, creating it on first use"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=TWILIO_MAX_CONNECTIONS,
+                    limit_per_host=TWILIO_MAX_CONNECTIONS_PER_HOST,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=75
+                ),
+                timeout=aiohttp.ClientTimeout(total=TWILIO_TIMEOUT),
+                headers={"Authorization": self.auth.encode()} if self.auth else None
+            )
+        return self._session
+    
+    async def _post(self, url: str, data: Dict[str, str]) -> Dict[str, Any]:
+        """POST a form to the Twilio REST API and return the decoded JSON body"""
+        session = await self._get_session()
+        async with session.post(url, data=data) as resp:
+            payload = await resp.json(content_type=None)
+            if resp.status >= 400:
+                raise TwilioAPIError(payload.get("message") or f"Twilio API returned HTTP {resp.status}")
+            return payload
     
     async def send_otp(self, phone_number: str) -> Dict[str, Any]:
         try:
-            if not self.client or not self.verify_service_sid:
+            if not self.auth or not self.verify_service_sid:
                 return {"error": "Twilio not configured", "test_mode": True}
             
-            verification = self.client.verify.services(self.verify_service_sid).verifications.create(
-                to=phone_number, 
-                channel="sms"
+            verification = await self._post(
+                f"{TWILIO_VERIFY_URL}/Services/{self.verify_service_sid}/Verifications",
+                {"To": phone_number, "Channel": "sms"}
             )
-            return {"status": verification.status, "to": phone_number}
+            return {"status": verification["status"], "to": phone_number}
         except Exception as e:
             logger.error(f"Twilio send OTP error: {e}")
             return {"error": str(e)}
     
     async def verify_otp(self, phone_number: str, code: str) -> Dict[str, Any]:
         try:
-            if not self.client or not self.verify_service_sid:
+            if not self.auth or not self.verify_service_sid:
                 return {"valid": code == "123456", "test_mode": True}
             
-            check = self.client.verify.services(self.verify_service_sid).verification_checks.create(
-                to=phone_number, 
-                code=code
+            cached = self._cached_verification(phone_number, code)
+            if cached is not None:
+                return cached
+
+            check = await self._post(
+                f"{TWILIO_VERIFY_URL}/Services/{self.verify_service_sid}/VerificationCheck",
+                {"To": phone_number, "Code": code}
             )
-            return {"valid": check.status == "approved", "status": check.status}
+            result = {"valid": check["status"] == "approved", "status": check["status"]}
+            if result["valid"]:
+                self._cache_verification(phone_number, code, result)
+            return result
         except Exception as e:
             logger.error(f"Twilio verify OTP error: {e}")
             return {"error": str(e)}
     
+    def _cached_verification(self, phone_number: str, code: str) -> Optional[Dict[str, Any]]:
+        """Return a still-fresh approved check for this phone and code, if any"""
+        key = (phone_number, code)
+        entry = self._verify_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if time.monotonic() >= expires_at:
+            del self._verify_cache[key]
+            return None
+        self._verify_cache.move_to_end(key)
+        return dict(result)
+
+    def _cache_verification(self, phone_number: str, code: str, result: Dict[str, Any]):
+        """Remember an approved check; rejected codes are never cached"""
+        self._verify_cache[(phone_number, code)] = (time.monotonic() + VERIFY_CACHE_TTL, dict(result))
+        self._verify_cache.move_to_end((phone_number, code))
+        while len(self._verify_cache) > VERIFY_CACHE_MAX_ENTRIES:
+            self._verify_cache.popitem(last=False)
+    
     async def send_sms(self, to_number: str, message: str, from_number: str = None) -> Dict[str, Any]:
         try:
-            if not self.client:
+            if not self.auth:
                 return {"error": "Twilio not configured", "test_mode": True}
 
             from_num = from_number or os.getenv("TWILIO_PHONE_NUMBER")
             if not from_num:
                 return {"error": "No Twilio phone number configured"}
 
-            message_obj = self.client.messages.create(
-                body=message,
-                from_=from_num,
-                to=to_number
-            )
-            return {"sid": message_obj.sid, "status": message_obj.status}
+            message_obj = await self._send_message(from_num, to_number, message)
+            return {"sid": message_obj["sid"], "status": message_obj["status"]}
         except Exception as e:
             logger.error(f"Twilio send SMS error: {e}")
             return {"error": str(e)}
 
+    async def send_sms_bulk(self, messages: List[Dict[str, str]],
+                            concurrency: int = TWILIO_BULK_CONCURRENCY) -> List[Dict[str, Any]]:
+        """
+        Send many SMS messages concurrently over the shared session.
+
+        Each message is a dict with "to", "message" and an optional "from".
+        At most `concurrency` requests are in flight and the account-wide
+        token bucket keeps the send rate under TWILIO_REQUESTS_PER_SECOND.
+        Results are returned in input order, one send_sms-shaped dict each.
+        """
+        if not self.auth:
+            return [{"error": "Twilio not configured", "test_mode": True} for _ in messages]
+
+        default_from = os.getenv("TWILIO_PHONE_NUMBER")
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send_one(item: Dict[str, str]) -> Dict[str, Any]:
+            from_num = item.get("from") or default_from
+            if not from_num:
+                return {"to": item.get("to"), "error": "No Twilio phone number configured"}
+            async with semaphore:
+                await self._send_bucket.acquire()
+                try:
+                    message_obj = await self._send_message(from_num, item["to"], item["message"])
+                except Exception as e:
+                    logger.error(f"Twilio bulk SMS error for {item.get('to')}: {e}")
+                    return {"to": item.get("to"), "error": str(e)}
+            return {"to": item["to"], "sid": message_obj["sid"], "status": message_obj["status"]}
+
+        return await asyncio.gather(*(send_one(item) for item in messages))
+
     async def send_whatsapp(self, to_number: str, message: str) -> Dict[str, Any]:
         """
         Send a WhatsApp message via Twilio. Both the sender and recipient are
@@ -73,7 +206,7 @@ class TwilioIntegration:
         callers can store the lead + log instead of failing the request.
         """
         try:
-            if not self.client:
+            if not self.auth:
                 return {"error": "Twilio not configured", "test_mode": True, "channel": "whatsapp"}
 
             from_num = os.getenv("TWILIO_WHATSAPP_NUMBER") or os.getenv("TWILIO_PHONE_NUMBER")
@@ -84,14 +217,17 @@ class TwilioIntegration:
             def _wa(n: str) -> str:
                 return n if n.lower().startswith("whatsapp:") else f"whatsapp:{n}"
 
-            message_obj = self.client.messages.create(
-                body=message,
-                from_=_wa(from_num),
-                to=_wa(to_number),
-            )
-            return {"sid": message_obj.sid, "status": message_obj.status, "channel": "whatsapp"}
+            message_obj = await self._send_message(_wa(from_num), _wa(to_number), message)
+            return {"sid": message_obj["sid"], "status": message_obj["status"], "channel": "whatsapp"}
         except Exception as e:
             logger.error(f"Twilio send WhatsApp error: {e}")
             return {"error": str(e), "channel": "whatsapp"}
 
+    async def _send_message(self, from_number: str, to_number: str, body: str) -> Dict[str, Any]:
+        """Create a message through the Programmable Messaging API"""
+        return await self._post(
+            f"{TWILIO_API_URL}/Accounts/{self.account_sid}/Messages.json",
+            {"From": from_number, "To": to_number, "Body": body}
+        )
+
 twilio_integration = TwilioIntegration()
@@ -7,21 +7,55 @@ its transitive `litellm` dependency. We now call OpenAI's chat completions API
 directly with the standard vision `image_url` content format. The public
 surface is unchanged: `analyze_image(image_data, prompt, image_type)` ->
 {"analysis","model","timestamp"}, `analyze_image_url`, `get_supported_formats`.
+
+Every image is validated by its magic bytes and, when Pillow is installed,
+downscaled to GPT-4o's high-detail size and re-encoded before upload. URL
+inputs are fetched here over a pooled session so they get the same treatment;
+those fetches only ever connect to publicly routable addresses.
 """
+import asyncio
+import io
+import ipaddress
 import logging
 import os
-import base64
-from typing import Dict, Any
+import socket
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timezone
+from urllib.parse import urlsplit
 
+import aiohttp
+from aiohttp.abc import AbstractResolver
 from openai import AsyncOpenAI
 
+from ._http import get_openai_http_client
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; images are then sent unmodified
+    Image = None
+
+try:
+    import pybase64 as base64  # SIMD-accelerated, same API as the stdlib module
+except ImportError:
+    import base64
+
 logger = logging.getLogger(__name__)
 
 _BASE_URL = os.getenv("OPENAI_BASE_URL") or None
 _VISION_MODEL = "gpt-4o"
 
-# Sniff the data-URL mime from a base64 JPEG/PNG/etc header.
+# GPT-4o scales high-detail images to fit this long edge anyway
+MAX_IMAGE_EDGE = 1568
+JPEG_QUALITY = 85
+# Images within MAX_IMAGE_EDGE and under this size are sent as-is
+RECOMPRESS_MIN_BYTES = 1024 * 1024
+MAX_IMAGE_BYTES = 20 * 1024 * 1024  # matches get_supported_formats()
+
+# Pooled image downloads for URL inputs
+IMAGE_FETCH_CONCURRENCY = 20
+IMAGE_FETCH_TIMEOUT = 20  # seconds
+
+# Sniff the data-URL mime from a JPEG/PNG/etc header.
 _MIME_BY_MAGIC = {
     b"\xff\xd8\xff": "image/jpeg",
     b"\x89PNG\r\n\x1a\n": "image/png",
@@ -30,27 +64,169 @@ _MIME_BY_MAGIC = {
 }
 
 
-def _detect_mime(b64: str) -> str:
+class ImageFetchError(ValueError):
+    """An image URL was refused; the message is safe to return to the caller"""
+
+
+def _is_public_address(address: str) -> bool:
+    """Whether an IP address is globally routable (not loopback, private, link-local, metadata...)"""
     try:
-        raw = base64.b64decode(b64[:32])
-    except Exception:
-        return "image/jpeg"
+        return ipaddress.ip_address(address.split("%", 1)[0]).is_global
+    except ValueError:
+        return False
+
+
+class _PublicOnlyResolver(AbstractResolver):
+    """
+    DNS resolver for image downloads that drops non-global addresses. It runs
+    at connect time, so a host cannot pass a check and then rebind to an
+    internal address.
+    """
+
+    def __init__(self):
+        self._resolver = aiohttp.DefaultResolver()
+
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET) -> List[Dict[str, Any]]:
+        hosts = [h for h in await self._resolver.resolve(host, port, family) if _is_public_address(h["host"])]
+        if not hosts:
+            # Reported to callers like any other connection failure, so the
+            # answer does not reveal which internal names resolve
+            raise OSError(f"{host} has no publicly routable address")
+        return hosts
+
+    async def close(self) -> None:
+        await self._resolver.close()
+
+
+def _detect_mime(raw: bytes) -> Optional[str]:
+    """Image mime type from the leading bytes, or None if not a supported format"""
     for magic, mime in _MIME_BY_MAGIC.items():
         if raw.startswith(magic):
+            if mime == "image/webp" and raw[8:12] != b"WEBP":
+                return None
             return mime
-    return "image/jpeg"
+    return None
+
+
+def _shrink_image(raw: bytes, mime: str) -> Tuple[bytes, str]:
+    """
+    Downscale to MAX_IMAGE_EDGE and re-encode (JPEG, or PNG when the image
+    has transparency). Returns the input unchanged without Pillow, for GIFs
+    (which may be animated) and when re-encoding would not make it smaller.
+    """
+    if Image is None or mime == "image/gif":
+        return raw, mime
+    buf = io.BytesIO()
+    with Image.open(io.BytesIO(raw)) as img:
+        if max(img.size) <= MAX_IMAGE_EDGE and len(raw) < RECOMPRESS_MIN_BYTES:
+            return raw, mime
+        img.thumbnail((MAX_IMAGE_EDGE, MAX_IMAGE_EDGE))
+        if img.mode in ("RGBA", "LA", "P"):
+            img.save(buf, "PNG", optimize=True)
+            out_mime = "image/png"
+        else:
+            img.convert("RGB").save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True)
+            out_mime = "image/jpeg"
+    out = buf.getvalue()
+    return (out, out_mime) if len(out) < len(raw) else (raw, mime)
+
+
+async def _to_data_url(raw: bytes) -> str:
+    """Validate an image and return it as a (possibly downscaled) data URL"""
+    if len(raw) > MAX_IMAGE_BYTES:
+        raise ValueError(f"Image exceeds {MAX_IMAGE_BYTES // (1024 * 1024)}MB limit")
+    mime = _detect_mime(raw)
+    if mime is None:
+        raise ValueError("Unsupported image format")
+    raw, mime = await asyncio.to_thread(_shrink_image, raw, mime)
+    return f"data:{mime};base64,{base64.b64encode(raw).decode()}"
 
 
 class VisionAIIntegration:
     def __init__(self):
         self.api_key = os.getenv("EMERGENT_LLM_KEY") or os.getenv("OPENAI_API_KEY", "")
         self._client = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._fetch_sem = asyncio.Semaphore(IMAGE_FETCH_CONCURRENCY)
 
     def _get_client(self) -> AsyncOpenAI:
         if self._client is None:
-            self._client = AsyncOpenAI(api_key=self.api_key, base_url=_BASE_URL)
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=_BASE_URL,
+                                       http_client=get_openai_http_client())
         return self._client
 
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Get the shared image download session, creating it on first use"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    resolver=_PublicOnlyResolver(),
+                    limit=IMAGE_FETCH_CONCURRENCY,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=75
+                ),
+                timeout=aiohttp.ClientTimeout(total=IMAGE_FETCH_TIMEOUT)
+            )
+        return self._session
+
+    async def close(self):
+        """Close the shared image download session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _fetch_image(self, image_url: str) -> bytes:
+        """
+        Download an http(s) image from a public host, refusing redirects,
+        non-image responses and bodies over MAX_IMAGE_BYTES
+        """
+        parts = urlsplit(image_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ImageFetchError("Only http and https image URLs are supported")
+        # IP literals never reach the resolver, so check them here
+        try:
+            literal = ipaddress.ip_address(parts.hostname)
+        except ValueError:
+            literal = None
+        if literal is not None and not literal.is_global:
+            raise ImageFetchError("Image URL host is not publicly routable")
+        
+        session = await self._get_session()
+        async with self._fetch_sem:
+            # Redirects are not followed; a hop could point at an internal host
+            async with session.get(image_url, allow_redirects=False) as resp:
+                if resp.status != 200:
+                    raise ImageFetchError(f"Image URL returned HTTP {resp.status}")
+                content_type = resp.headers.get("Content-Type", "")
+                if not content_type.startswith("image/"):
+                    raise ImageFetchError(f"URL did not return an image (Content-Type: {content_type or 'missing'})")
+                body = bytearray()
+                async for chunk in resp.content.iter_chunked(64 * 1024):
+                    body += chunk
+                    if len(body) > MAX_IMAGE_BYTES:
+                        raise ImageFetchError(f"Image exceeds {MAX_IMAGE_BYTES // (1024 * 1024)}MB limit")
+                return bytes(body)
+
+    async def _complete(self, data_url: str, prompt: str) -> Dict[str, Any]:
+        """Run one vision chat completion for an image data URL"""
+        client = self._get_client()
+        resp = await client.chat.completions.create(
+            model=_VISION_MODEL,
+            messages=[
+                {"role": "system", "content": "You are an expert image analyst. Provide detailed, accurate analysis of images."},
+                {"role": "user", "content": [
+                    {"type": "text", "text": prompt},
+                    {"type": "image_url", "image_url": {"url": data_url}},
+                ]},
+            ],
+            max_tokens=2048,
+        )
+        return {
+            "analysis": resp.choices[0].message.content or "",
+            "model": _VISION_MODEL,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        }
+
     async def analyze_image(
         self,
         image_data: str,
@@ -59,36 +235,25 @@ class VisionAIIntegration:
     ) -> Dict[str, Any]:
         """Analyze an image using OpenAI Vision (gpt-4o)."""
         try:
-            client = self._get_client()
-
             if image_type == "base64":
-                mime = _detect_mime(image_data)
-                data_url = f"data:{mime};base64,{image_data}"
+                raw = base64.b64decode(image_data)
             else:
                 # Treat as a file path on disk.
-                path = image_data
-                with open(path, "rb") as fh:
+                with open(image_data, "rb") as fh:
                     raw = fh.read()
-                ext = os.path.splitext(path)[1].lower().lstrip(".")
-                mime = "image/jpeg" if ext in ("jpg", "jpeg") else f"image/{ext or 'jpeg'}"
-                data_url = f"data:{mime};base64,{base64.b64encode(raw).decode()}"
-
-            resp = await client.chat.completions.create(
-                model=_VISION_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are an expert image analyst. Provide detailed, accurate analysis of images."},
-                    {"role": "user", "content": [
-                        {"type": "text", "text": prompt},
-                        {"type": "image_url", "image_url": {"url": data_url}},
-                    ]},
-                ],
-                max_tokens=2048,
-            )
-            return {
-                "analysis": resp.choices[0].message.content or "",
-                "model": _VISION_MODEL,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-            }
+        except Exception as e:
+            logger.error(f"Vision AI analysis error: {e}")
+            return {"error": str(e)}
+        return await self.analyze_image_bytes(raw, prompt)
+
+    async def analyze_image_bytes(
+        self,
+        data: bytes,
+        prompt: str = "Analyze this image and describe what you see in detail."
+    ) -> Dict[str, Any]:
+        """Analyze raw image bytes, e.g. a multipart upload, without a base64 round trip."""
+        try:
+            return await self._complete(await _to_data_url(data), prompt)
         except Exception as e:
             logger.error(f"Vision AI analysis error: {e}")
             return {"error": str(e)}
@@ -96,33 +261,26 @@ class VisionAIIntegration:
     async def analyze_image_url(self, image_url: str, prompt: str) -> Dict[str, Any]:
         """Analyze an image from a public URL."""
         try:
-            client = self._get_client()
-            resp = await client.chat.completions.create(
-                model=_VISION_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are an expert image analyst. Provide detailed, accurate analysis of images."},
-                    {"role": "user", "content": [
-                        {"type": "text", "text": prompt},
-                        {"type": "image_url", "image_url": {"url": image_url}},
-                    ]},
-                ],
-                max_tokens=2048,
-            )
-            return {
-                "analysis": resp.choices[0].message.content or "",
-                "model": _VISION_MODEL,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-            }
-        except Exception as e:
-            logger.error(f"Vision AI URL analysis error: {e}")
+            raw = await self._fetch_image(image_url)
+        except ImageFetchError as e:
             return {"error": str(e)}
+        except Exception as e:
+            # Connection details stay in the log; callers could otherwise use
+            # them to probe which hosts and ports answer
+            logger.error(f"Vision AI URL fetch error: {e}")
+            return {"error": "Failed to fetch image"}
+        return await self.analyze_image_bytes(raw, prompt)
+
+    async def analyze_image_urls(self, image_urls: List[str], prompt: str) -> List[Dict[str, Any]]:
+        """Analyze several image URLs concurrently; results keep the input order."""
+        return await asyncio.gather(*(self.analyze_image_url(url, prompt) for url in image_urls))
 
     def get_supported_formats(self) -> Dict[str, Any]:
         """Get supported image formats"""
         return {
             "formats": ["jpeg", "jpg", "png", "webp", "gif"],
             "max_size_mb": 20,
-            "input_types": ["base64", "file_path", "url"]
+            "input_types": ["base64", "file_path", "url", "upload"]
         }
 
 vision_ai_integration = VisionAIIntegration()
\ No newline at end of file
@@ -2,22 +2,92 @@
 Advanced Logging Configuration
 Structured logging with JSON format for production
 """
+import atexit
+import contextlib
+import copy
 import logging
 import logging.handlers
 import json
-from datetime import datetime
-from typing import Any, Dict
+import queue
+import time
+from contextvars import ContextVar, Token
+from typing import Any, Dict, Iterator, Optional
 import sys
 import os
 
+# orjson is optional; it serializes log records several times faster than
+# the stdlib json module, which is the fallback
+try:
+    import orjson
+    
+    def _json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+except ImportError:
+    _json_dumps = json.dumps
+
+# Record attributes copied into the JSON output when set via `extra`, and
+# the key each one is written under
+EXTRA_FIELDS = (
+    ("request_id", "request_id"),
+    ("user_id", "user_id"),
+    ("duration_ms", "duration_ms"),
+    ("extra_data", "extra"),
+)
+_MISSING = object()
+
+# Request-scoped fields (request_id, user_id, ...) added to every JSON record
+# logged from the current task; always replaced, never mutated in place
+LOG_CONTEXT: ContextVar[Dict[str, Any]] = ContextVar("log_context", default={})
+
+def bind_log_context(**fields: Any) -> Token:
+    """
+    Add fields to the log context of the current task
+    
+    Returns:
+        Token to pass to reset_log_context when the scope ends
+    """
+    return LOG_CONTEXT.set({**LOG_CONTEXT.get(), **fields})
+
+def reset_log_context(token: Token) -> None:
+    """Restore the log context from before the matching bind_log_context"""
+    LOG_CONTEXT.reset(token)
+
+@contextlib.contextmanager
+def log_context(**fields: Any) -> Iterator[None]:
+    """Bind fields to the log context for the duration of a with block"""
+    token = bind_log_context(**fields)
+    try:
+        yield
+    finally:
+        reset_log_context(token)
+
 class JSONFormatter(logging.Formatter):
     """
     Custom JSON formatter for structured logging
     """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # "YYYY-MM-DDTHH:MM:SS" for the last second seen; records within the
+        # same second only format the fractional part
+        self._cached_second = None
+        self._cached_prefix = ""
+    
+    def _timestamp(self, created: float) -> str:
+        """ISO-8601 UTC timestamp with microseconds for a record's creation time"""
+        second = int(created)
+        if second != self._cached_second:
+            self._cached_prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+            self._cached_second = second
+        return f"{self._cached_prefix}.{int((created - second) * 1_000_000):06d}Z"
+    
     def format(self, record: logging.LogRecord) -> str:
-        """Format log record as JSON"""
+        """Format log record as JSON, once per record however many handlers emit it"""
+        cached = record.__dict__.get("_json_log")
+        if cached is not None:
+            return cached
+        
         log_data = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": self._timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -26,25 +96,118 @@ class JSONFormatter(logging.Formatter):
             "line": record.lineno
         }
         
-        # Add extra fields if present
-        if hasattr(record, "request_id"):
-            log_data["request_id"] = record.request_id
-        
-        if hasattr(record, "user_id"):
-            log_data["user_id"] = record.user_id
+        # Add the request context; records from the queue carry the context
+        # captured in the logging thread, since format runs on the listener's
+        attrs = record.__dict__
+        context = attrs.get("log_context", _MISSING)
+        if context is _MISSING:
+            context = LOG_CONTEXT.get()
+        if context:
+            log_data.update(context)
         
-        if hasattr(record, "duration_ms"):
-            log_data["duration_ms"] = record.duration_ms
+        # Add extra fields if present
+        for attr, key in EXTRA_FIELDS:
+            value = attrs.get(attr, _MISSING)
+            if value is not _MISSING:
+                log_data[key] = value
         
         # Add exception info if present
         if record.exc_info:
             log_data["exception"] = self.formatException(record.exc_info)
         
-        # Add any extra data
-        if hasattr(record, "extra_data"):
-            log_data["extra"] = record.extra_data
-        
-        return json.dumps(log_data)
+        record._json_log = _json_dumps(log_data)
+        return record._json_log
+
+class _LocalQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler for an in-process queue: merges the message arguments but
+    leaves formatting (and exc_info) to the listener's handlers, so the JSON
+    formatter still sees the exception separately from the message
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record.log_context = LOG_CONTEXT.get()
+        return record
+
+class _DeferredFlushStream:
+    """
+    Stream wrapper whose flush() is a no-op; the queue listener drains it
+    once the log queue is empty, so a burst of records costs one write
+    syscall instead of one per record
+    """
+    def __init__(self, stream):
+        self._stream = stream
+    
+    def flush(self) -> None:
+        pass
+    
+    def drain(self) -> None:
+        self._stream.flush()
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+class _RotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler whose file is flushed by the queue listener"""
+    def _open(self):
+        return _DeferredFlushStream(super()._open())
+
+class _BatchingQueueListener(logging.handlers.QueueListener):
+    """QueueListener that flushes deferred handler streams whenever the queue runs dry"""
+    def handle(self, record: logging.LogRecord) -> None:
+        super().handle(record)
+        if self.queue.empty():
+            self.drain()
+    
+    def drain(self) -> None:
+        for handler in self.handlers:
+            stream = getattr(handler, "stream", None)
+            if isinstance(stream, _DeferredFlushStream):
+                handler.acquire()
+                try:
+                    stream.drain()
+                finally:
+                    handler.release()
+    
+    def stop(self) -> None:
+        super().stop()
+        self.drain()
+
+# Listener draining the log queue into the real handlers (see setup_logging)
+_queue_listener: Optional[_BatchingQueueListener] = None
+
+def _stop_queue_listener() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+atexit.register(_stop_queue_listener)
+
+def _start_queue_listener(*handlers: logging.Handler) -> None:
+    """Route every root logger record through an unbounded queue to handlers"""
+    global _queue_listener
+    log_queue = queue.SimpleQueue()
+    _queue_listener = _BatchingQueueListener(log_queue, *handlers, respect_handler_level=True)
+    _queue_listener.start()
+    logging.getLogger().addHandler(_LocalQueueHandler(log_queue))
+
+def queue_root_handlers() -> None:
+    """
+    Move the root logger's current handlers (e.g. from logging.basicConfig)
+    behind the background queue listener, so logging call sites only enqueue
+    """
+    root_logger = logging.getLogger()
+    handlers = [h for h in root_logger.handlers if not isinstance(h, _LocalQueueHandler)]
+    _stop_queue_listener()
+    root_logger.handlers = []
+    for handler in handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setStream(_DeferredFlushStream(handler.stream))
+    _start_queue_listener(*handlers)
 
 def setup_logging(
     log_level: str = "INFO",
@@ -56,6 +219,9 @@ def setup_logging(
     """
     Setup application logging
     
+    Handlers run on a background QueueListener thread; the root logger only
+    enqueues records, so request handlers never block on log I/O.
+    
     Args:
         log_level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         log_file: Path to log file
@@ -66,19 +232,25 @@ def setup_logging(
     # Create logs directory if it doesn't exist
     os.makedirs(os.path.dirname(log_file), exist_ok=True)
     
+    level = getattr(logging, log_level.upper())
+    
     # Get root logger
     root_logger = logging.getLogger()
-    root_logger.setLevel(getattr(logging, log_level.upper()))
+    root_logger.setLevel(level)
     
     # Remove existing handlers
+    _stop_queue_listener()
     root_logger.handlers = []
     
     # Console handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(getattr(logging, log_level.upper()))
+    console_handler = logging.StreamHandler(_DeferredFlushStream(sys.stdout))
+    console_handler.setLevel(level)
+    
+    # One JSON formatter for every handler; it caches the output on the record
+    json_formatter = JSONFormatter() if json_format else None
     
     if json_format:
-        console_formatter = JSONFormatter()
+        console_formatter = json_formatter
     else:
         console_formatter = logging.Formatter(
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -86,18 +258,18 @@ def setup_logging(
         )
     
     console_handler.setFormatter(console_formatter)
-    root_logger.addHandler(console_handler)
     
     # File handler with rotation
-    file_handler = logging.handlers.RotatingFileHandler(
+    file_handler = _RotatingFileHandler(
         log_file,
         maxBytes=max_bytes,
-        backupCount=backup_count
+        backupCount=backup_count,
+        delay=True
     )
-    file_handler.setLevel(getattr(logging, log_level.upper()))
+    file_handler.setLevel(level)
     
     if json_format:
-        file_formatter = JSONFormatter()
+        file_formatter = json_formatter
     else:
         file_formatter = logging.Formatter(
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -105,17 +277,19 @@ def setup_logging(
         )
     
     file_handler.setFormatter(file_formatter)
-    root_logger.addHandler(file_handler)
     
     # Error file handler (separate file for errors only)
-    error_file_handler = logging.handlers.RotatingFileHandler(
+    error_file_handler = _RotatingFileHandler(
         log_file.replace('.log', '.error.log'),
         maxBytes=max_bytes,
-        backupCount=backup_count
+        backupCount=backup_count,
+        delay=True
     )
     error_file_handler.setLevel(logging.ERROR)
-    error_file_handler.setFormatter(JSONFormatter() if json_format else file_formatter)
-    root_logger.addHandler(error_file_handler)
+    error_file_handler.setFormatter(file_formatter)
+    
+    # Route every record through an unbounded queue to the handlers above
+    _start_queue_listener(console_handler, file_handler, error_file_handler)
     
     # Suppress noisy loggers
     logging.getLogger("urllib3").setLevel(logging.WARNING)
@@ -145,6 +319,9 @@ def get_logger(name: str) -> logging.Logger:
 class LoggerAdapter(logging.LoggerAdapter):
     """
     Logger adapter that adds context to log messages
+    
+    For request-scoped fields prefer bind_log_context/log_context, which
+    need no adapter and reach every logger used while handling the request.
     """
     def process(self, msg: str, kwargs: Dict[str, Any]) -> tuple:
         """Add extra context to log message"""
@@ -2,23 +2,101 @@
 Metrics Collection System
 Collects and exposes application metrics for monitoring
 """
-from typing import Dict, Any, List
-from datetime import datetime, timedelta
+from typing import Dict, Any
 import asyncio
 import time
 import logging
 
+try:
+    from prometheus_client import CollectorRegistry, Counter, Histogram, make_asgi_app
+except ImportError:  # prometheus_client is optional; only the JSON metrics are kept then
+    CollectorRegistry = None
+
 logger = logging.getLogger(__name__)
 
+# Per-endpoint stats are capped; further endpoints are folded into one key
+MAX_TRACKED_ENDPOINTS = 500
+OVERFLOW_ENDPOINT_KEY = "__other__"
+
+# Prometheus request latency buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+if CollectorRegistry is not None:
+    # Own registry so importing this module under two names can't register twice
+    REGISTRY = CollectorRegistry()
+    REQUESTS = Counter(
+        "http_requests_total", "Total HTTP requests",
+        ["method", "endpoint", "status"], registry=REGISTRY
+    )
+    DURATION = Histogram(
+        "http_request_duration_seconds", "HTTP request duration in seconds",
+        ["method", "endpoint", "status"], buckets=LATENCY_BUCKETS, registry=REGISTRY
+    )
+else:
+    REGISTRY = REQUESTS = DURATION = None
+
+class LatencyHistogram:
+    """
+    Streaming duration histogram (HdrHistogram-style log-linear buckets)
+    Durations are bucketed in microseconds keeping SUB_BUCKET_BITS significant
+    bits, so recording is O(1), memory is bounded by the value range and
+    quantiles stay within ~0.4% over every recorded request
+    """
+    
+    SUB_BUCKET_BITS = 8
+    
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+    
+    def _bucket(self, value_us: int) -> int:
+        shift = max(value_us.bit_length() - self.SUB_BUCKET_BITS, 0)
+        return (shift << self.SUB_BUCKET_BITS) | (value_us >> shift)
+    
+    def _bucket_midpoint_ms(self, bucket: int) -> float:
+        shift = bucket >> self.SUB_BUCKET_BITS
+        low = (bucket & ((1 << self.SUB_BUCKET_BITS) - 1)) << shift
+        return (low + ((1 << shift) - 1) / 2) / 1000
+    
+    def record(self, duration_ms: float):
+        """Record one duration"""
+        bucket = self._bucket(max(int(duration_ms * 1000), 0))
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += duration_ms
+        if duration_ms < self.min:
+            self.min = duration_ms
+        if duration_ms > self.max:
+            self.max = duration_ms
+    
+    def percentile(self, fraction: float) -> float:
+        """Approximate duration at the given fraction (0-1) of recorded values"""
+        if not self.count:
+            return 0
+        rank = min(int(self.count * fraction), self.count - 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen > rank:
+                return min(max(self._bucket_midpoint_ms(bucket), self.min), self.max)
+        return self.max
+    
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0
+
 class MetricsCollector:
     """Collects application metrics"""
     
     def __init__(self):
         self.request_count = 0
         self.error_count = 0
-        self.request_durations: List[float] = []
+        self.request_durations = LatencyHistogram()
         self.endpoint_stats: Dict[str, Dict[str, Any]] = {}
-        self.start_time = datetime.utcnow()
+        self.start_time = time.monotonic()
         
         # Per-endpoint metrics
         self.endpoint_requests = {}
@@ -28,14 +106,12 @@ class MetricsCollector:
     def record_request(self, endpoint: str, method: str, duration_ms: float, status_code: int):
         """Record a request"""
         self.request_count += 1
-        self.request_durations.append(duration_ms)
-        
-        # Keep only last 1000 durations for memory efficiency
-        if len(self.request_durations) > 1000:
-            self.request_durations = self.request_durations[-1000:]
+        self.request_durations.record(duration_ms)
         
         # Per-endpoint stats
         key = f"{method} {endpoint}"
+        if key not in self.endpoint_stats and len(self.endpoint_stats) >= MAX_TRACKED_ENDPOINTS:
+            key = OVERFLOW_ENDPOINT_KEY
         if key not in self.endpoint_stats:
             self.endpoint_stats[key] = {
                 "count": 0,
@@ -57,19 +133,15 @@ class MetricsCollector:
     
     def get_metrics(self) -> Dict[str, Any]:
         """Get current metrics"""
-        uptime_seconds = (datetime.utcnow() - self.start_time).total_seconds()
+        uptime_seconds = time.monotonic() - self.start_time
         
         # Calculate average, p50, p95, p99
-        durations = sorted(self.request_durations)
-        avg_duration = sum(durations) / len(durations) if durations else 0
+        durations = self.request_durations
+        avg_duration = durations.mean
         
-        p50_index = int(len(durations) * 0.50)
-        p95_index = int(len(durations) * 0.95)
-        p99_index = int(len(durations) * 0.99)
-        
-        p50 = durations[p50_index] if durations else 0
-        p95 = durations[p95_index] if durations else 0
-        p99 = durations[p99_index] if durations else 0
+        p50 = durations.percentile(0.50)
+        p95 = durations.percentile(0.95)
+        p99 = durations.percentile(0.99)
         
         # Endpoint statistics with averages
         endpoint_metrics = {}
@@ -97,8 +169,8 @@ class MetricsCollector:
                 "p50_ms": round(p50, 2),
                 "p95_ms": round(p95, 2),
                 "p99_ms": round(p99, 2),
-                "min_ms": round(min(durations), 2) if durations else 0,
-                "max_ms": round(max(durations), 2) if durations else 0
+                "min_ms": round(durations.min, 2) if durations.count else 0,
+                "max_ms": round(durations.max, 2) if durations.count else 0
             },
             "endpoints": endpoint_metrics
         }
@@ -107,9 +179,9 @@ class MetricsCollector:
         """Reset all metrics"""
         self.request_count = 0
         self.error_count = 0
-        self.request_durations = []
+        self.request_durations = LatencyHistogram()
         self.endpoint_stats = {}
-        self.start_time = datetime.utcnow()
+        self.start_time = time.monotonic()
         logger.info("Metrics reset")
 
 # Global metrics collector
@@ -122,3 +194,13 @@ def get_metrics() -> Dict[str, Any]:
 def record_request(endpoint: str, method: str, duration_ms: float, status_code: int):
     """Record a request"""
     metrics_collector.record_request(endpoint, method, duration_ms, status_code)
+    if DURATION is not None:
+        status = str(status_code)
+        REQUESTS.labels(method, endpoint, status).inc()
+        DURATION.labels(method, endpoint, status).observe(duration_ms / 1000)
+
+def make_prometheus_app():
+    """ASGI app serving the Prometheus exposition, or None without prometheus_client"""
+    if REGISTRY is None:
+        return None
+    return make_asgi_app(registry=REGISTRY)
@@ -4,34 +4,50 @@ Automatically tracks all requests for metrics collection
 """
 from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import time
 import logging
 
+from metrics_collector import record_request
+from request_tracker import RequestIDMiddleware
+
 logger = logging.getLogger(__name__)
 
+# Label for requests that matched no route, so unknown paths share one series
+UNMATCHED_ENDPOINT = "__unmatched__"
+
+RESPONSE_TIME_HEADER = b"x-response-time-ms"
+
 class MetricsMiddleware(BaseHTTPMiddleware):
     """Middleware to track request metrics"""
     
-    def __init__(self, app):
+    def __init__(self, app, exempt_paths: list = None):
         super().__init__(app)
+        # Health checks and docs are not tracked: probes would skew latency stats
+        self.exempt_paths = exempt_paths or ["/api/health", "/docs", "/openapi.json"]
+        self._exempt_prefixes = tuple(self.exempt_paths)
         logger.info("✅ Metrics middleware initialized")
     
     async def dispatch(self, request: Request, call_next):
         """Track request metrics"""
+        if request.url.path.startswith(self._exempt_prefixes):
+            return await call_next(request)
+        
         # Record start time
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         # Process request
         response = await call_next(request)
         
         # Calculate duration
-        duration_ms = (time.time() - start_time) * 1000
+        duration_ms = (time.perf_counter() - start_time) * 1000
         
-        # Record metrics
+        # Record metrics against the route template (e.g. /api/items/{id}), not
+        # the raw path, to keep the number of tracked endpoints bounded
+        route = request.scope.get("route")
         try:
-            from metrics_collector import record_request
             record_request(
-                endpoint=request.url.path,
+                endpoint=getattr(route, "path", UNMATCHED_ENDPOINT),
                 method=request.method,
                 duration_ms=duration_ms,
                 status_code=response.status_code
@@ -43,3 +59,51 @@ class MetricsMiddleware(BaseHTTPMiddleware):
         response.headers["X-Response-Time-Ms"] = str(round(duration_ms, 2))
         
         return response
+
+class RequestContextMiddleware(RequestIDMiddleware):
+    """
+    Request ID tracking, the response time header and request metrics in a
+    single ASGI layer, replacing a RequestIDMiddleware + MetricsMiddleware pair
+    """
+    
+    def __init__(self, app: ASGIApp, enabled: bool = True, exempt_paths: list = None):
+        super().__init__(app, enabled=enabled)
+        # Exempt paths still get a request ID, but no timing or metrics
+        self.exempt_paths = exempt_paths or ["/api/health", "/docs", "/openapi.json"]
+        self._exempt_prefixes = tuple(self.exempt_paths)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """Track request metrics around the request ID handling"""
+        if scope["type"] != "http" or scope["path"].startswith(self._exempt_prefixes):
+            await super().__call__(scope, receive, send)
+            return
+        
+        start_ns = time.perf_counter_ns()
+        status_code = 500
+        duration_ms = 0.0
+        
+        async def send_with_timing(message: Message):
+            nonlocal status_code, duration_ms
+            if message["type"] == "http.response.start":
+                # Time to response start, in hundredths of a millisecond
+                duration_ms = (time.perf_counter_ns() - start_ns) // 10_000 / 100
+                status_code = message["status"]
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (RESPONSE_TIME_HEADER, str(duration_ms).encode("ascii"))
+                ]
+            await send(message)
+        
+        await super().__call__(scope, receive, send_with_timing)
+        
+        # The router stores the matched route in the shared scope
+        route = scope.get("route")
+        try:
+            record_request(
+                endpoint=getattr(route, "path", UNMATCHED_ENDPOINT),
+                method=scope["method"],
+                duration_ms=duration_ms,
+                status_code=status_code
+            )
+        except Exception as e:
+            logger.error(f"Error recording metrics: {e}")
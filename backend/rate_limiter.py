@@ -4,12 +4,32 @@ Protects API from abuse and ensures fair usage
 """
 from fastapi import Request, HTTPException
 from starlette.middleware.base import BaseHTTPMiddleware
-from datetime import datetime, timedelta
-from typing import Dict, Tuple
+from collections import deque
+from typing import Deque, Dict, Iterator, Optional, Tuple
 import logging
+import time
+import weakref
+
+try:
+    from redis import asyncio as redis_asyncio
+except ImportError:  # redis is optional; limits are then tracked per process
+    redis_asyncio = None
 
 logger = logging.getLogger(__name__)
 
+MINUTE_WINDOW = 60.0  # seconds
+HOUR_WINDOW = 3600.0  # seconds
+
+# Idle IPs swept per is_allowed call, so memory stays bounded at O(1) cost
+SWEEP_KEYS_PER_CALL = 8
+
+# Redis fixed-window keys outlive their window slightly to tolerate clock skew
+REDIS_KEY_GRACE = 10  # seconds
+REDIS_MAX_CONNECTIONS = 50
+
+# After a Redis failure, limits stay in memory this long before Redis is retried
+REDIS_RETRY_AFTER = 5.0  # seconds
+
 class RateLimiter:
     """
     Simple in-memory rate limiter
@@ -20,41 +40,52 @@ class RateLimiter:
         self.requests_per_minute = requests_per_minute
         self.requests_per_hour = requests_per_hour
         
-        # Store: {ip: [(timestamp, count), ...]}
-        self.minute_buckets: Dict[str, list] = {}
-        self.hour_buckets: Dict[str, list] = {}
+        # Store: {ip: deque of time.monotonic() request times, oldest first}
+        self.minute_buckets: Dict[str, Deque[float]] = {}
+        self.hour_buckets: Dict[str, Deque[float]] = {}
         
-        self.blocked_ips: Dict[str, datetime] = {}
-        self.block_duration = timedelta(minutes=15)
+        # Store: {ip: time.monotonic() deadline}
+        self.blocked_ips: Dict[str, float] = {}
+        self.block_duration = 15 * 60  # seconds
+        
+        # Cursor over a snapshot of tracked IPs, advanced a few keys per call
+        self._sweep_cursor: Iterator[str] = iter(())
+    
+    @staticmethod
+    def _expire(buckets: Dict[str, Deque[float]], ip: str, cutoff: float):
+        """Pop timestamps at or before cutoff off the front of an IP's window"""
+        window = buckets.get(ip)
+        if window is None:
+            return
+        while window and window[0] <= cutoff:
+            window.popleft()
+        if not window:
+            del buckets[ip]
     
-    def _clean_old_entries(self, ip: str, window_minutes: int = 1):
+    def _clean_old_entries(self, ip: str, now: Optional[float] = None):
         """Remove entries older than the window"""
-        now = datetime.now()
-        cutoff = now - timedelta(minutes=window_minutes)
-        
-        # Clean minute buckets
-        if ip in self.minute_buckets:
-            self.minute_buckets[ip] = [
-                entry for entry in self.minute_buckets[ip]
-                if entry[0] > cutoff
-            ]
-            if not self.minute_buckets[ip]:
-                del self.minute_buckets[ip]
-        
-        # Clean hour buckets (60 minute window)
-        if ip in self.hour_buckets:
-            hour_cutoff = now - timedelta(hours=1)
-            self.hour_buckets[ip] = [
-                entry for entry in self.hour_buckets[ip]
-                if entry[0] > hour_cutoff
-            ]
-            if not self.hour_buckets[ip]:
-                del self.hour_buckets[ip]
-    
-    def is_blocked(self, ip: str) -> bool:
+        if now is None:
+            now = time.monotonic()
+        self._expire(self.minute_buckets, ip, now - MINUTE_WINDOW)
+        self._expire(self.hour_buckets, ip, now - HOUR_WINDOW)
+    
+    def _sweep(self, now: float, budget: int = SWEEP_KEYS_PER_CALL):
+        """Expire windows and blocks of a few IPs that may never come back"""
+        for _ in range(budget):
+            ip = next(self._sweep_cursor, None)
+            if ip is None:
+                # Start a new pass; the snapshot is only taken once per pass
+                self._sweep_cursor = iter(list(self.hour_buckets.keys() | self.blocked_ips.keys()))
+                ip = next(self._sweep_cursor, None)
+                if ip is None:
+                    return
+            self._clean_old_entries(ip, now)
+            self.is_blocked(ip, now)
+    
+    def is_blocked(self, ip: str, now: Optional[float] = None) -> bool:
         """Check if IP is temporarily blocked"""
         if ip in self.blocked_ips:
-            if datetime.now() < self.blocked_ips[ip]:
+            if (time.monotonic() if now is None else now) < self.blocked_ips[ip]:
                 return True
             else:
                 del self.blocked_ips[ip]
@@ -62,8 +93,8 @@ class RateLimiter:
     
     def block_ip(self, ip: str):
         """Temporarily block an IP"""
-        self.blocked_ips[ip] = datetime.now() + self.block_duration
-        logger.warning(f"IP blocked for {self.block_duration.seconds}s: {ip}")
+        self.blocked_ips[ip] = time.monotonic() + self.block_duration
+        logger.warning(f"IP blocked for {self.block_duration}s: {ip}")
     
     def is_allowed(self, ip: str) -> Tuple[bool, str, Dict[str, int]]:
         """
@@ -72,20 +103,23 @@ class RateLimiter:
         Returns:
             (allowed, reason, limits_info)
         """
+        now = time.monotonic()
+        self._sweep(now)
+        
         # Check if blocked
-        if self.is_blocked(ip):
+        if self.is_blocked(ip, now):
             return False, "IP temporarily blocked due to rate limit violations", {}
         
         # Clean old entries
-        self._clean_old_entries(ip)
-        
-        now = datetime.now()
+        self._clean_old_entries(ip, now)
         
         # Count requests in last minute
-        minute_count = len(self.minute_buckets.get(ip, []))
+        minute_window = self.minute_buckets.get(ip)
+        minute_count = len(minute_window) if minute_window else 0
         
         # Count requests in last hour
-        hour_count = len(self.hour_buckets.get(ip, []))
+        hour_window = self.hour_buckets.get(ip)
+        hour_count = len(hour_window) if hour_window else 0
         
         # Check minute limit
         if minute_count >= self.requests_per_minute:
@@ -105,13 +139,13 @@ class RateLimiter:
             }
         
         # Record this request
-        if ip not in self.minute_buckets:
-            self.minute_buckets[ip] = []
-        if ip not in self.hour_buckets:
-            self.hour_buckets[ip] = []
+        if minute_window is None:
+            minute_window = self.minute_buckets[ip] = deque()
+        if hour_window is None:
+            hour_window = self.hour_buckets[ip] = deque()
         
-        self.minute_buckets[ip].append((now, 1))
-        self.hour_buckets[ip].append((now, 1))
+        minute_window.append(now)
+        hour_window.append(now)
         
         # Return current usage info
         return True, "OK", {
@@ -121,9 +155,14 @@ class RateLimiter:
             "requests_this_hour": hour_count + 1
         }
     
+    async def check(self, ip: str) -> Tuple[bool, str, Dict[str, int]]:
+        """Async entry point used by the middleware; see is_allowed"""
+        return self.is_allowed(ip)
+    
     def get_stats(self) -> Dict:
         """Get rate limiter statistics"""
         return {
+            "backend": "memory",
             "tracked_ips": len(self.minute_buckets),
             "blocked_ips": len(self.blocked_ips),
             "limits": {
@@ -132,6 +171,102 @@ class RateLimiter:
             }
         }
 
+class RedisRateLimiter(RateLimiter):
+    """
+    Redis-backed fixed-window rate limiter
+    Counters are shared by every worker and expire on their own in Redis;
+    falls back to the in-memory windows if Redis is unreachable
+    """
+    
+    def __init__(self, redis_client, requests_per_minute: int = 60,
+                 requests_per_hour: int = 1000, key_prefix: str = "rl"):
+        super().__init__(requests_per_minute, requests_per_hour)
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+        # time.monotonic() deadline before which Redis is not tried again
+        self._redis_retry_at = 0.0
+        _redis_limiters.add(self)
+    
+    async def check(self, ip: str) -> Tuple[bool, str, Dict[str, int]]:
+        """Count this request in the current minute/hour windows and check the limits"""
+        if self._redis_retry_at and time.monotonic() < self._redis_retry_at:
+            return self.is_allowed(ip)
+        
+        now = int(time.time())
+        minute_key = f"{self.key_prefix}:m:{ip}:{now // 60}"
+        hour_key = f"{self.key_prefix}:h:{ip}:{now // 3600}"
+        blocked_key = f"{self.key_prefix}:blocked:{ip}"
+        
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.exists(blocked_key)
+            pipe.incr(minute_key)
+            pipe.expire(minute_key, int(MINUTE_WINDOW) + REDIS_KEY_GRACE)
+            pipe.incr(hour_key)
+            pipe.expire(hour_key, int(HOUR_WINDOW) + REDIS_KEY_GRACE)
+            blocked, minute_count, _, hour_count, _ = await pipe.execute()
+            
+            if self._redis_retry_at:
+                self._redis_retry_at = 0.0
+                logger.info("Redis rate limiting restored")
+            
+            if blocked:
+                return False, "IP temporarily blocked due to rate limit violations", {}
+            
+            if minute_count > self.requests_per_minute:
+                await self.redis.set(blocked_key, 1, ex=self.block_duration)
+                logger.warning(f"IP blocked for {self.block_duration}s: {ip}")
+                return False, f"Rate limit exceeded: {self.requests_per_minute} requests per minute", {
+                    "limit_per_minute": self.requests_per_minute,
+                    "requests_this_minute": minute_count - 1,
+                    "retry_after": 60
+                }
+            
+            if hour_count > self.requests_per_hour:
+                return False, f"Rate limit exceeded: {self.requests_per_hour} requests per hour", {
+                    "limit_per_hour": self.requests_per_hour,
+                    "requests_this_hour": hour_count - 1,
+                    "retry_after": 3600
+                }
+            
+            return True, "OK", {
+                "limit_per_minute": self.requests_per_minute,
+                "requests_this_minute": minute_count,
+                "limit_per_hour": self.requests_per_hour,
+                "requests_this_hour": hour_count
+            }
+        except Exception as e:
+            # Logged once per back-off window rather than on every request
+            self._redis_retry_at = time.monotonic() + REDIS_RETRY_AFTER
+            logger.warning(
+                f"Redis rate limiting unavailable, using in-memory limits for {REDIS_RETRY_AFTER:g}s: {e}"
+            )
+            return self.is_allowed(ip)
+    
+    async def aclose(self) -> None:
+        """Close the Redis client and its connection pool"""
+        # redis-py 5 renamed close() to aclose()
+        close = getattr(self.redis, "aclose", None) or self.redis.close
+        await close()
+    
+    def get_stats(self) -> Dict:
+        """Get rate limiter statistics"""
+        stats = super().get_stats()
+        stats["backend"] = "redis"
+        return stats
+
+# Redis limiters created by the middleware, closed together on shutdown
+_redis_limiters: "weakref.WeakSet[RedisRateLimiter]" = weakref.WeakSet()
+
+async def close_rate_limiters() -> None:
+    """Close the Redis clients of every Redis-backed limiter"""
+    for limiter in list(_redis_limiters):
+        try:
+            await limiter.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing Redis rate limiter: {e}")
+    _redis_limiters.clear()
+
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """
     Middleware to apply rate limiting to API requests
@@ -140,11 +275,24 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
     def __init__(self, app, enabled: bool = True, 
                  requests_per_minute: int = 60, 
                  requests_per_hour: int = 1000,
-                 exempt_paths: list = None):
+                 exempt_paths: list = None,
+                 redis_url: Optional[str] = None):
         super().__init__(app)
         self.enabled = enabled
-        self.limiter = RateLimiter(requests_per_minute, requests_per_hour)
+        if redis_url and redis_asyncio is not None:
+            self.limiter = RedisRateLimiter(
+                redis_asyncio.from_url(redis_url, max_connections=REDIS_MAX_CONNECTIONS),
+                requests_per_minute, requests_per_hour
+            )
+        else:
+            if redis_url:
+                logger.warning("redis package not installed, rate limits are tracked per process")
+            self.limiter = RateLimiter(requests_per_minute, requests_per_hour)
         self.exempt_paths = exempt_paths or ["/api/health", "/docs", "/openapi.json"]
+        # str.startswith checks a tuple of prefixes in one C call
+        self._exempt_prefixes = tuple(self.exempt_paths)
+        self._limit_minute_header = str(requests_per_minute)
+        self._limit_hour_header = str(requests_per_hour)
         
         logger.info(f"✅ Rate limiter initialized: {requests_per_minute}/min, {requests_per_hour}/hour")
     
@@ -168,7 +316,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
     
     def _is_exempt(self, path: str) -> bool:
         """Check if path is exempt from rate limiting"""
-        return any(path.startswith(exempt) for exempt in self.exempt_paths)
+        return path.startswith(self._exempt_prefixes)
     
     async def dispatch(self, request: Request, call_next):
         """Apply rate limiting to request"""
@@ -180,7 +328,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         client_ip = self._get_client_ip(request)
         
         # Check rate limit
-        allowed, reason, limits = self.limiter.is_allowed(client_ip)
+        allowed, reason, limits = await self.limiter.check(client_ip)
         
         if not allowed:
             logger.warning(f"Rate limit exceeded for {client_ip}: {reason}")
@@ -196,11 +344,11 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         # Add rate limit headers to response
         response = await call_next(request)
         
-        response.headers["X-RateLimit-Limit-Minute"] = str(self.limiter.requests_per_minute)
+        response.headers["X-RateLimit-Limit-Minute"] = self._limit_minute_header
         response.headers["X-RateLimit-Remaining-Minute"] = str(
             self.limiter.requests_per_minute - limits.get("requests_this_minute", 0)
         )
-        response.headers["X-RateLimit-Limit-Hour"] = str(self.limiter.requests_per_hour)
+        response.headers["X-RateLimit-Limit-Hour"] = self._limit_hour_header
         response.headers["X-RateLimit-Remaining-Hour"] = str(
             self.limiter.requests_per_hour - limits.get("requests_this_hour", 0)
         )
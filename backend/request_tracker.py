@@ -2,129 +2,181 @@
 Request ID Tracking Middleware
 Adds unique request ID to each request for debugging and tracing
 """
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import functools
 import uuid
 import logging
+import os
+import threading
 import time
 from contextvars import ContextVar
 
+from logging_config import bind_log_context, reset_log_context
+
 logger = logging.getLogger(__name__)
 
-# Context variable to store request ID for the current request
+# Context variable to store request ID for the current request. A dict keyed
+# by asyncio.current_task() was measured as a replacement and was several
+# times slower per lookup; ContextVar.get is also the only option that follows
+# the request into executor threads and child tasks.
 request_id_var: ContextVar[str] = ContextVar("request_id", default="")
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
+REQUEST_ID_HEADER = b"x-request-id"
+
+# Random bytes for generated request IDs are drawn from the OS in bulk, one
+# os.urandom call per REQUEST_ID_BATCH IDs instead of one per request
+REQUEST_ID_BATCH = 1024
+_id_entropy = b""
+_id_offset = 0
+_id_lock = threading.Lock()
+
+def fast_request_id() -> str:
+    """Generate a random (version 4) UUID string from the pooled entropy"""
+    global _id_entropy, _id_offset
+    with _id_lock:
+        if _id_offset >= len(_id_entropy):
+            _id_entropy = os.urandom(16 * REQUEST_ID_BATCH)
+            _id_offset = 0
+        chunk = _id_entropy[_id_offset:_id_offset + 16]
+        _id_offset += 16
+    return str(uuid.UUID(bytes=chunk, version=4))
+
+class RequestIDMiddleware:
     """
     Middleware to add unique request ID to each request
     Makes debugging and log correlation much easier
+    
+    Plain ASGI rather than BaseHTTPMiddleware: it only reads one header and
+    adds one, so it skips the extra task and Request/Response objects.
     """
     
-    def __init__(self, app):
-        super().__init__(app)
-        logger.info("✅ Request ID tracking initialized")
+    def __init__(self, app: ASGIApp, enabled: bool = True):
+        self.app = app
+        self.enabled = enabled
+        if enabled:
+            logger.info("✅ Request ID tracking initialized")
     
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Add request ID to request and response"""
-        # Generate or extract request ID
-        request_id = request.headers.get("X-Request-ID")
-        if not request_id:
-            request_id = str(uuid.uuid4())
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Store in context var for use in logging
-        request_id_var.set(request_id)
+        # Extract or generate request ID; a client-supplied ID is echoed
+        # back with the raw header bytes, so only generated IDs are encoded
+        encoded_request_id = b""
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                encoded_request_id = value
+                break
+        if encoded_request_id:
+            request_id = encoded_request_id.decode("latin-1")
+        else:
+            request_id = fast_request_id()
+            encoded_request_id = request_id.encode("ascii")
         
-        # Add to request state
-        request.state.request_id = request_id
+        # request_id_var is the one place the ID lives (read it with
+        # get_request_id()). As plain ASGI there is a single context for the
+        # request, and every task spawned below inherits it, so one set() is
+        # enough. JSON logs pick the ID up from the log context.
+        request_id_token = request_id_var.set(request_id)
+        log_context_token = bind_log_context(request_id=request_id)
+        
+        method = scope["method"]
+        path = scope["path"]
+        status_code = 500
         
         # Record start time
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
         
-        # Log request
-        logger.info(
-            f"Request started",
-            extra={
-                "request_id": request_id,
-                "method": request.method,
-                "path": request.url.path,
-                "client_ip": request.client.host if request.client else "unknown"
-            }
-        )
+        # Skip building the start/completed records when INFO is disabled
+        log_requests = logger.isEnabledFor(logging.INFO)
         
-        # Process request
-        try:
-            response = await call_next(request)
-            
-            # Calculate duration
-            duration = time.time() - start_time
-            
-            # Add request ID to response headers
-            response.headers["X-Request-ID"] = request_id
-            
-            # Log response
+        # Log request
+        if log_requests:
+            # ASGI client is a (host, port) tuple or None
+            client = scope.get("client")
             logger.info(
-                f"Request completed",
+                "Request started",
                 extra={
-                    "request_id": request_id,
-                    "method": request.method,
-                    "path": request.url.path,
-                    "status_code": response.status_code,
-                    "duration_ms": round(duration * 1000, 2)
+                    "method": method,
+                    "path": path,
+                    "client_ip": client[0] if client else "unknown"
                 }
             )
+        
+        async def send_with_request_id(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Add request ID to response headers
+                message["headers"] = [*message.get("headers", ()), (REQUEST_ID_HEADER, encoded_request_id)]
+            await send(message)
+        
+        # Process request. Errors are not caught here - the app's exception
+        # handlers log them - but the context is always reset so a failed
+        # request's ID cannot leak into whatever runs next in this context
+        try:
+            await self.app(scope, receive, send_with_request_id)
             
-            return response
-            
-        except Exception as e:
-            # Log error with request ID
-            logger.error(
-                f"Request failed: {str(e)}",
-                extra={
-                    "request_id": request_id,
-                    "method": request.method,
-                    "path": request.url.path,
-                    "error": str(e)
-                },
-                exc_info=True
-            )
-            raise
+            # Log response
+            if log_requests:
+                logger.info(
+                    "Request completed",
+                    extra={
+                        "method": method,
+                        "path": path,
+                        "status_code": status_code,
+                        # Integer nanoseconds down to hundredths of a millisecond
+                        "duration_ms": (time.perf_counter_ns() - start_ns) // 10_000 / 100
+                    }
+                )
+        finally:
+            reset_log_context(log_context_token)
+            request_id_var.reset(request_id_token)
 
 def get_request_id() -> str:
     """Get current request ID from context"""
     return request_id_var.get("")
 
+class RequestIDFilter(logging.Filter):
+    """Stamp each record with the current request ID when it is created"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if "request_id" not in record.__dict__:
+            record.request_id = request_id_var.get("")
+        return True
+
+def add_request_id_filter(target: logging.Logger) -> None:
+    """Attach RequestIDFilter to a logger once"""
+    if not any(isinstance(f, RequestIDFilter) for f in target.filters):
+        target.addFilter(RequestIDFilter())
+
+add_request_id_filter(logger)
+
 class RequestLogger:
-    """Enhanced logger that includes request ID"""
+    """
+    Enhanced logger that includes request ID
+    
+    The request ID is added by RequestIDFilter when a record is created, so
+    the methods are the logger's own, with no per-call extra dict.
+    """
     
     def __init__(self, logger_name: str = __name__):
         self.logger = logging.getLogger(logger_name)
-    
-    def _log_with_request_id(self, level: str, message: str, **kwargs):
-        """Log message with request ID"""
-        request_id = get_request_id()
-        extra = kwargs.get("extra", {})
-        extra["request_id"] = request_id
-        kwargs["extra"] = extra
-        
-        log_func = getattr(self.logger, level)
-        log_func(message, **kwargs)
-    
-    def debug(self, message: str, **kwargs):
-        self._log_with_request_id("debug", message, **kwargs)
-    
-    def info(self, message: str, **kwargs):
-        self._log_with_request_id("info", message, **kwargs)
-    
-    def warning(self, message: str, **kwargs):
-        self._log_with_request_id("warning", message, **kwargs)
-    
-    def error(self, message: str, **kwargs):
-        self._log_with_request_id("error", message, **kwargs)
-    
-    def critical(self, message: str, **kwargs):
-        self._log_with_request_id("critical", message, **kwargs)
+        add_request_id_filter(self.logger)
+        self.debug = self.logger.debug
+        self.info = self.logger.info
+        self.warning = self.logger.warning
+        self.error = self.logger.error
+        self.critical = self.logger.critical
+
+@functools.lru_cache(maxsize=None)
+def get_request_logger(name: str = __name__) -> RequestLogger:
+    """Get the shared RequestLogger for a name; preferred over constructing one per call"""
+    return RequestLogger(name)
 
 # Example usage
-# from request_tracker import RequestLogger
-# logger = RequestLogger(__name__)
+# from request_tracker import get_request_logger
+# logger = get_request_logger(__name__)
 # logger.info("Processing user data")  # Automatically includes request ID
@@ -1,9 +1,9 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, BackgroundTasks, Query, Body
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, BackgroundTasks, Query, Body, File, Form, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
-from starlette.responses import Response
+from starlette.responses import Response, StreamingResponse
 from datetime import datetime, date, timezone
 from typing import List, Optional, Dict, Any
 import logging
@@ -38,19 +38,25 @@ from core.insights_engine import insights_engine, InsightType
 from core.security_manager import security_manager, UserRole, Permission, ComplianceStandard
 from core.performance_optimizer import performance_optimizer, MetricType, PerformanceMetric
 from integrations.crm_integrations import crm_manager, CRMProvider
+from integrations.payment_integrations import payment_manager
 
 # Import Phase 5B-D integrations (Payments, Communication, AI)
 from integrations.stripe_integration import stripe_integration
 from integrations.twilio_integration import twilio_integration
+from integrations._http import close_openai_http_client
 from integrations.sendgrid_integration import sendgrid_integration
 from integrations.voice_ai_integration import voice_ai_integration
-from integrations.vision_ai_integration import vision_ai_integration
+from integrations.vision_ai_integration import vision_ai_integration, MAX_IMAGE_BYTES
 
 # Configure logging first (before other imports)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
+# Write log records from a background thread so request handlers
+# (e.g. RequestIDMiddleware's start/completed lines) only enqueue them
+from logging_config import queue_root_handlers
+queue_root_handlers()
 logger = logging.getLogger(__name__)
 
 # Import optimizations
@@ -59,11 +65,10 @@ try:
     from cache_manager import cache_manager, cached
     from error_handlers import register_error_handlers
     from i18n import i18n, get_language_from_header
-    from rate_limiter import RateLimitMiddleware
-    from request_tracker import RequestIDMiddleware
+    from rate_limiter import RateLimitMiddleware, close_rate_limiters
     from health_check import get_health_status
     from security_headers import SecurityHeadersMiddleware, get_security_headers_config
-    from metrics_middleware import MetricsMiddleware
+    from metrics_middleware import RequestContextMiddleware
     OPTIMIZATIONS_ENABLED = True
     logger.info("✅ All optimization modules loaded successfully")
 except ImportError as e:
@@ -95,7 +100,7 @@ if OPTIMIZATIONS_ENABLED:
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.cors_origins,
+    allow_origins=settings.cors_origins_set,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -105,14 +110,6 @@ app.add_middleware(
 from fastapi.middleware.gzip import GZipMiddleware
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
-# Add Request ID tracking middleware
-if OPTIMIZATIONS_ENABLED:
-    try:
-        app.add_middleware(RequestIDMiddleware)
-        logger.info("✅ Request ID tracking enabled")
-    except Exception as e:
-        logger.warning(f"Failed to add Request ID middleware: {e}")
-
 # Add Rate Limiting middleware
 if OPTIMIZATIONS_ENABLED:
     try:
@@ -121,7 +118,8 @@ if OPTIMIZATIONS_ENABLED:
             enabled=True,
             requests_per_minute=60,
             requests_per_hour=1000,
-            exempt_paths=["/api/health", "/docs", "/openapi.json", "/redoc"]
+            exempt_paths=["/api/health", "/docs", "/openapi.json", "/redoc"],
+            redis_url=settings.redis_url or None
         )
         logger.info("✅ Rate limiting enabled (60/min, 1000/hour)")
     except Exception as e:
@@ -137,11 +135,23 @@ if OPTIMIZATIONS_ENABLED:
     except Exception as e:
         logger.warning(f"Failed to add Security Headers middleware: {e}")
 
-# Add Metrics middleware
+# Add Request ID tracking + Metrics middleware (one combined ASGI layer,
+# outside rate limiting so rejected requests are tracked too)
 if OPTIMIZATIONS_ENABLED:
     try:
-        app.add_middleware(MetricsMiddleware)
+        app.add_middleware(
+            RequestContextMiddleware,
+            enabled=settings.request_id_enabled,
+            exempt_paths=["/api/health", "/docs", "/openapi.json", "/redoc", "/metrics"]
+        )
+        if settings.request_id_enabled:
+            logger.info("✅ Request ID tracking enabled")
         logger.info("✅ Metrics tracking enabled")
+        from metrics_collector import make_prometheus_app
+        prometheus_app = make_prometheus_app()
+        if prometheus_app is not None:
+            app.mount("/metrics", prometheus_app)
+            logger.info("✅ Prometheus metrics exposed at /metrics")
     except Exception as e:
         logger.warning(f"Failed to add Metrics middleware: {e}")
 
@@ -1435,10 +1445,17 @@ async def create_white_label_tenant(tenant_data: Dict[str, Any]):
         raise HTTPException(status_code=500, detail="Failed to create tenant")
 
 @api_router.get("/white-label/tenants", response_model=StandardResponse)
-async def get_all_tenants(status: Optional[str] = None):
-    """Get list of all white-label tenants"""
+async def get_all_tenants(
+    status: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=500)
+):
+    """Get list of all white-label tenants, or one page when limit is given"""
     try:
-        tenants = await white_label_manager.get_all_tenants(status)
+        if limit is not None:
+            tenants = await white_label_manager.get_tenants_page(skip, limit, status)
+        else:
+            tenants = await white_label_manager.get_all_tenants(status)
         return StandardResponse(
             success=True,
             message="Tenants retrieved successfully",
@@ -1448,6 +1465,15 @@ async def get_all_tenants(status: Optional[str] = None):
         logger.error(f"Error getting tenants: {e}")
         raise HTTPException(status_code=500, detail="Failed to get tenants")
 
+@api_router.get("/white-label/tenants/stream")
+async def stream_all_tenants(status: Optional[str] = None):
+    """Stream all white-label tenants as newline-delimited JSON"""
+    async def ndjson_lines():
+        async for tenant in white_label_manager.iter_tenants(status):
+            yield json.dumps(tenant) + "\n"
+    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
 @api_router.get("/white-label/tenant/{tenant_id}/branding", response_model=StandardResponse)
 async def get_tenant_branding(tenant_id: str):
     """Get tenant-specific branding configuration"""
@@ -2363,6 +2389,37 @@ async def analyze_image_vision_ai(analysis_data: Dict[str, Any]):
         logger.error(f"Error analyzing image: {e}")
         raise HTTPException(status_code=500, detail="Failed to analyze image")
 
+@api_router.post("/integrations/vision-ai/analyze-upload", response_model=StandardResponse)
+async def analyze_uploaded_image_vision_ai(
+    file: UploadFile = File(...),
+    prompt: str = Form("Analyze this image and describe what you see in detail.")
+):
+    """Analyze an image sent as a multipart upload (raw bytes, no base64)"""
+    try:
+        # Read at most one byte past the limit so oversized uploads are never buffered whole
+        image_bytes = await file.read(MAX_IMAGE_BYTES + 1)
+        if len(image_bytes) > MAX_IMAGE_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Image exceeds {MAX_IMAGE_BYTES // (1024 * 1024)}MB limit"
+            )
+        
+        result = await vision_ai_integration.analyze_image_bytes(image_bytes, prompt)
+        
+        if "error" in result:
+            raise HTTPException(status_code=400, detail=result["error"])
+        
+        return StandardResponse(
+            success=True,
+            message="Image analysis completed",
+            data=result
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error analyzing uploaded image: {e}")
+        raise HTTPException(status_code=500, detail="Failed to analyze image")
+
 @api_router.get("/integrations/vision-ai/formats", response_model=StandardResponse)
 async def get_vision_ai_formats():
     """Get supported image formats for Vision AI"""
@@ -2406,6 +2463,9 @@ async def startup_event():
         except Exception as e:
             logger.warning(f"⚠️ Could not create database indexes: {e}")
     
+    # Warm the tenant cache so the first requests don't each miss to MongoDB
+    await white_label_manager.warmup()
+    
     # Initialize agent orchestrator
     await orchestrator.initialize()
     logger.info("Agent orchestrator initialized")
@@ -2436,6 +2496,13 @@ async def shutdown_event():
     await inter_agent_comm.stop()
     await orchestrator.shutdown()
     await performance_optimizer.shutdown()
+    await payment_manager.close()
+    await twilio_integration.close()
+    await stripe_integration.close()
+    await vision_ai_integration.close()
+    await close_openai_http_client()
+    if OPTIMIZATIONS_ENABLED:
+        await close_rate_limiters()
     await close_db_connection()
     logger.info("NOWHERE Digital API shutdown")
 
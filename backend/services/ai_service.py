@@ -21,6 +21,8 @@ from typing import Dict, Any, Optional
 
 from openai import AsyncOpenAI
 
+from integrations._http import get_openai_http_client
+
 logger = logging.getLogger(__name__)
 
 # OpenAI (and OpenAI-compatible) endpoint. If AI_PROVIDER points at a
@@ -38,7 +40,8 @@ class AIService:
     def _get_client(self) -> AsyncOpenAI:
         """Lazily build the AsyncOpenAI client (reuse across calls)."""
         if self._client is None:
-            self._client = AsyncOpenAI(api_key=self.api_key, base_url=_BASE_URL)
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=_BASE_URL,
+                                       http_client=get_openai_http_client())
         return self._client
 
     def _resolve_model(self, requested: Optional[str] = None) -> str:
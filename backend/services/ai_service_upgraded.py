@@ -21,6 +21,8 @@ from datetime import datetime
 
 from openai import AsyncOpenAI
 
+from integrations._http import get_openai_http_client
+
 logger = logging.getLogger(__name__)
 
 _BASE_URL = os.getenv("OPENAI_BASE_URL") or None
@@ -172,7 +174,8 @@ class UpgradedAIService:
 
     def _get_client(self) -> AsyncOpenAI:
         if self._client is None:
-            self._client = AsyncOpenAI(api_key=self.api_key, base_url=_BASE_URL)
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=_BASE_URL,
+                                       http_client=get_openai_http_client())
         return self._client
 
     def _resolve_model(self, requested: Optional[str] = None) -> str:
@@ -6,6 +6,11 @@ import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 from httpx import AsyncClient
 import os
+import sys
+
+# Make backend modules importable as top-level packages (`from server import app`,
+# `from integrations... import ...`) for every test module, once
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 # Test database name
 TEST_DB_NAME = "nowhereai_test"
@@ -9,9 +9,6 @@ import pytest
 from datetime import datetime, timezone, timedelta
 from unittest.mock import patch, AsyncMock
 
-import sys
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-
 # Imports from the backend modules under test
 from core.security_manager import SecurityManager, UserRole, Permission, ComplianceStandard
 from core.performance_optimizer import PerformanceOptimizer, CacheManager, MetricType, PerformanceMetric
@@ -0,0 +1,52 @@
+"""
+Pytest Configuration and Fixtures
+"""
+import os
+import sys
+
+import pytest
+
+# Backend modules import each other as top-level modules (`from database import
+# get_database`), as the server runs them from backend/; make that resolve here too
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from backend.config import Settings
+
+# Environment variables Settings reads (pydantic-settings matches field names
+# case-insensitively)
+SETTINGS_ENV_VARS = tuple(name.upper() for name in Settings.model_fields)
+
+# Settings built per environment; tests only read them, so one instance per
+# distinct environment is shared across the whole session
+_settings_cache = {}
+
+
+def _build_settings(monkeypatch, env, overrides):
+    """
+    Build Settings with only `env` set among the variables it reads. Field
+    values in `overrides` are passed to the constructor and never touch
+    os.environ; the .env file is always skipped.
+    """
+    key = (tuple(sorted(env.items())), tuple(sorted(overrides.items())))
+    if key not in _settings_cache:
+        for name in SETTINGS_ENV_VARS:
+            monkeypatch.delenv(name, raising=False)
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        _settings_cache[key] = Settings(_env_file=None, **overrides)
+    return _settings_cache[key]
+
+
+@pytest.fixture
+def make_settings(monkeypatch):
+    """Factory for Settings built from an isolated environment and/or field overrides"""
+    def _make(env=None, **overrides):
+        return _build_settings(monkeypatch, env or {}, overrides)
+    return _make
+
+
+@pytest.fixture(scope="session")
+def default_settings():
+    """Settings built with none of its environment variables set, once per session"""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        yield _build_settings(monkeypatch, {}, {})
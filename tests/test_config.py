@@ -3,17 +3,15 @@ Unit tests for backend/config.py
 Tests configuration management and environment variable handling
 """
 import pytest
-import os
-from unittest.mock import patch, MagicMock
-from backend.config import Settings, settings
+from backend.config import Settings, get_settings, settings
 
 
 class TestSettings:
     """Test suite for Settings configuration class"""
     
-    def test_default_settings(self):
+    def test_default_settings(self, default_settings):
         """Test that default settings are properly initialized"""
-        test_settings = Settings()
+        test_settings = default_settings
         
         assert test_settings.mongo_url == "mongodb://localhost:27017"
         assert test_settings.db_name == "nowhere_digital"
@@ -21,105 +19,123 @@ class TestSettings:
         assert test_settings.jwt_expiration == 24 * 60 * 60
         assert test_settings.debug is False
         
-    def test_cors_origins_list(self):
+    def test_cors_origins_list(self, default_settings):
         """Test CORS origins are properly defined"""
-        test_settings = Settings()
-        
-        assert isinstance(test_settings.cors_origins, list)
-        assert len(test_settings.cors_origins) > 0
-        assert "http://localhost:3000" in test_settings.cors_origins
-        
-    def test_allowed_file_types(self):
+        test_settings = default_settings
+        
+        assert set(test_settings.cors_origins) == {
+            "http://localhost:3000",
+            "https://backend-hardening.preview.emergentagent.com",
+            "https://fix-it-6.emergent.host",
+        }
+        
+    @pytest.mark.parametrize("raw, expected", [
+        ('https://custom.domain.com', ('https://custom.domain.com',)),
+        ('https://a.example,https://b.example', ('https://a.example', 'https://b.example')),
+        ('https://a.example, https://b.example,', ('https://a.example', 'https://b.example')),
+        ('["https://a.example", "https://b.example"]', ('https://a.example', 'https://b.example')),
+    ], ids=["single", "multiple", "whitespace-and-blank", "json-list"])
+    def test_cors_origins_from_comma_separated_env(self, make_settings, raw, expected):
+        """Test CORS_ORIGINS is read as a JSON list or split on commas, in order, with blanks dropped"""
+        test_settings = make_settings({'CORS_ORIGINS': raw})
+        
+        assert test_settings.cors_origins == expected
+        
+    def test_allowed_file_types(self, default_settings):
         """Test allowed file types configuration"""
-        test_settings = Settings()
+        test_settings = default_settings
         
-        assert isinstance(test_settings.allowed_file_types, list)
-        assert "image/jpeg" in test_settings.allowed_file_types
-        assert "image/png" in test_settings.allowed_file_types
-        assert "application/pdf" in test_settings.allowed_file_types
+        assert set(test_settings.allowed_file_types) == {
+            "image/jpeg", "image/png", "image/gif", "application/pdf"
+        }
+        assert "image/jpeg" in test_settings.allowed_file_types_set
+        assert "text/html" not in test_settings.allowed_file_types_set
         
-    def test_max_file_size(self):
+    def test_max_file_size(self, default_settings):
         """Test max file size is within reasonable bounds"""
-        test_settings = Settings()
+        test_settings = default_settings
         
         assert test_settings.max_file_size == 10 * 1024 * 1024  # 10MB
         assert test_settings.max_file_size > 0
         
-    def test_rate_limiting_config(self):
+    def test_rate_limiting_config(self, default_settings):
         """Test rate limiting configuration"""
-        test_settings = Settings()
+        test_settings = default_settings
         
         assert test_settings.rate_limit_requests == 100
         assert test_settings.rate_limit_period == 60
         assert test_settings.rate_limit_period > 0
         
-    @patch.dict(os.environ, {
-        'MONGO_URL': 'mongodb://testhost:27017',
-        'DB_NAME': 'test_db',
-        'DEBUG': 'true',
-        'JWT_SECRET': 'test-secret-key'
-    })
-    def test_environment_variable_override(self):
+    def test_environment_variable_override(self, make_settings):
         """Test that environment variables override default settings"""
-        test_settings = Settings()
+        test_settings = make_settings({
+            'MONGO_URL': 'mongodb://testhost:27017',
+            'DB_NAME': 'test_db',
+            'DEBUG': 'true',
+            'JWT_SECRET': 'test-secret-key'
+        })
         
         assert test_settings.mongo_url == 'mongodb://testhost:27017'
         assert test_settings.db_name == 'test_db'
         assert test_settings.debug is True
         assert test_settings.jwt_secret == 'test-secret-key'  # noqa: S105
         
-    @patch.dict(os.environ, {
-        'SENDGRID_API_KEY': 'sg-test-key',
-        'SENDGRID_FROM_EMAIL': 'test@example.com',
-        'ADMIN_EMAIL': 'admin@test.com'
-    })
-    def test_email_configuration(self):
+    def test_constructor_arguments_override_environment(self, make_settings):
+        """Test field values passed to Settings take precedence over env vars"""
+        test_settings = make_settings({'DB_NAME': 'env_db'}, db_name='explicit_db', debug=True)
+        
+        assert test_settings.db_name == 'explicit_db'
+        assert test_settings.debug is True
+        
+    def test_email_configuration(self, make_settings):
         """Test email configuration from environment"""
-        test_settings = Settings()
+        test_settings = make_settings({
+            'SENDGRID_API_KEY': 'sg-test-key',
+            'SENDGRID_FROM_EMAIL': 'test@example.com',
+            'ADMIN_EMAIL': 'admin@test.com'
+        })
         
         assert test_settings.sendgrid_api_key == 'sg-test-key'
         assert test_settings.sendgrid_from_email == 'test@example.com'
         assert test_settings.admin_email == 'admin@test.com'
         
-    @patch.dict(os.environ, {
-        'OPENAI_API_KEY': 'sk-test-openai',
-        'EMERGENT_LLM_KEY': 'sk-test-emergent',
-        'DEFAULT_AI_MODEL': 'gpt-4'
-    })
-    def test_ai_configuration(self):
+    def test_ai_configuration(self, make_settings):
         """Test AI service configuration"""
-        test_settings = Settings()
+        test_settings = make_settings({
+            'OPENAI_API_KEY': 'sk-test-openai',
+            'EMERGENT_LLM_KEY': 'sk-test-emergent',
+            'DEFAULT_AI_MODEL': 'gpt-4'
+        })
         
         assert test_settings.openai_api_key == 'sk-test-openai'
         assert test_settings.emergent_llm_key == 'sk-test-emergent'
         assert test_settings.default_ai_model == 'gpt-4'
         assert test_settings.ai_provider == 'openai'
         
-    @patch.dict(os.environ, {
-        'STRIPE_API_KEY': 'sk_test_stripe',
-        'TWILIO_ACCOUNT_SID': 'ACtest123',
-        'TWILIO_AUTH_TOKEN': 'test_token',
-        'TWILIO_VERIFY_SERVICE': 'VAtest123'
-    })
-    def test_integration_credentials(self):
+    def test_integration_credentials(self, make_settings):
         """Test third-party integration credentials"""
-        test_settings = Settings()
+        test_settings = make_settings({
+            'STRIPE_API_KEY': 'sk_test_stripe',
+            'TWILIO_ACCOUNT_SID': 'ACtest123',
+            'TWILIO_AUTH_TOKEN': 'test_token',
+            'TWILIO_VERIFY_SERVICE': 'VAtest123'
+        })
         
         assert test_settings.stripe_api_key == 'sk_test_stripe'
         assert test_settings.twilio_account_sid == 'ACtest123'
         assert test_settings.twilio_auth_token == 'test_token'  # noqa: S105
         assert test_settings.twilio_verify_service == 'VAtest123'
         
-    def test_api_prefix(self):
+    def test_api_prefix(self, default_settings):
         """Test API prefix configuration"""
-        test_settings = Settings()
+        test_settings = default_settings
         
         assert test_settings.api_prefix == "/api"
         assert test_settings.api_prefix.startswith("/")
         
-    def test_email_templates_directory(self):
+    def test_email_templates_directory(self, default_settings):
         """Test email templates directory configuration"""
-        test_settings = Settings()
+        test_settings = default_settings
         
         assert test_settings.email_templates_dir == "email_templates"
         assert isinstance(test_settings.email_templates_dir, str)
@@ -133,33 +149,39 @@ class TestSettings:
 class TestSettingsValidation:
     """Test configuration validation and edge cases"""
     
-    @patch.dict(os.environ, {'DEBUG': 'false'})
-    def test_debug_false_string(self):
-        """Test debug mode with 'false' string"""
-        test_settings = Settings()
+    @pytest.mark.parametrize("value", ['false', 'False', 'FALSE', 'no', '0', 'off'])
+    def test_debug_false_string(self, make_settings, value):
+        """Test debug mode with false-like strings"""
+        test_settings = make_settings({'DEBUG': value})
         assert test_settings.debug is False
         
-    @patch.dict(os.environ, {'DEBUG': 'True'})
-    def test_debug_true_capitalized(self):
-        """Test debug mode with capitalized 'True'"""
-        test_settings = Settings()
+    @pytest.mark.parametrize("value", ['True', 'TRUE', 'true', 'TrUe'])
+    def test_debug_true_capitalized(self, make_settings, value):
+        """Test debug mode with 'true' in any case"""
+        test_settings = make_settings({'DEBUG': value})
         assert test_settings.debug is True
         
-    @patch.dict(os.environ, {'DEBUG': '1'})
-    def test_debug_with_numeric_value(self):
+    def test_debug_with_numeric_value(self, make_settings):
         """Test debug mode with numeric value"""
-        test_settings = Settings()
+        test_settings = make_settings({'DEBUG': '1'})
         # Should be false since it's not "true"
         assert test_settings.debug is False
         
-    def test_jwt_expiration_is_positive(self):
+    def test_jwt_expiration_is_positive(self, default_settings):
         """Test JWT expiration is a positive number"""
-        test_settings = Settings()
+        test_settings = default_settings
         assert test_settings.jwt_expiration > 0
         
-    def test_rate_limits_are_reasonable(self):
+    def test_rate_limits_are_reasonable(self, default_settings):
         """Test rate limit values are within reasonable bounds"""
-        test_settings = Settings()
+        test_settings = default_settings
         
         assert 0 < test_settings.rate_limit_requests <= 10000
-        assert 0 < test_settings.rate_limit_period <= 3600
\ No newline at end of file
+        assert 0 < test_settings.rate_limit_period <= 3600
+
+class TestGlobalSettingsInstance:
+    """Test suite for the process-wide settings instance"""
+    
+    def test_get_settings_is_memoized(self):
+        """Test get_settings returns the module-level instance on every call"""
+        assert get_settings() is get_settings() is settings
@@ -3,8 +3,7 @@ Unit tests for backend/integrations/crm_integrations.py
 Tests CRM integration manager for multiple providers
 """
 import pytest
-from unittest.mock import Mock, AsyncMock, patch, MagicMock
-from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
 from backend.integrations.crm_integrations import (
     CRMIntegrationManager, 
     CRMProvider,
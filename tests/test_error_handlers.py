@@ -0,0 +1,115 @@
+"""
+Unit tests for backend/error_handlers.py
+Tests the standard error response shape produced by each handler
+"""
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from fastapi.exceptions import HTTPException, RequestValidationError
+from backend.error_handlers import (
+    APIError,
+    APIValidationError,
+    NotFoundError,
+    api_error_handler,
+    global_exception_handler,
+    validation_exception_handler,
+    http_exception_handler,
+    validation_failed,
+)
+
+
+@pytest.fixture
+def request_mock():
+    request = MagicMock()
+    request.url.path = "/api/test"
+    request.method = "GET"
+    return request
+
+
+def _body(response):
+    return json.loads(response.body)
+
+
+class TestErrorHandlers:
+    """Test suite for the exception handlers"""
+
+    @pytest.mark.asyncio
+    async def test_api_error_handler(self, request_mock):
+        """Test custom API errors keep their status code and message"""
+        response = await api_error_handler(request_mock, NotFoundError("Tenant", "t1"))
+
+        assert response.status_code == 404
+        assert _body(response) == {"success": False, "message": "Tenant not found: t1", "data": None}
+
+    @pytest.mark.asyncio
+    async def test_api_error_handler_with_details(self, request_mock):
+        """Test that error details are returned as data"""
+        exc = APIError("Bad input", status_code=400, details={"field": "name"})
+
+        response = await api_error_handler(request_mock, exc)
+
+        assert _body(response)["data"] == {"field": "name"}
+
+    @pytest.mark.asyncio
+    async def test_validation_exception_handler(self, request_mock):
+        """Test request validation errors are flattened per field"""
+        exc = RequestValidationError([
+            {"loc": ("body", "email"), "msg": "field required", "type": "missing"}
+        ])
+
+        response = await validation_exception_handler(request_mock, exc)
+
+        assert response.status_code == 422
+        assert _body(response) == {
+            "success": False,
+            "message": "Validation error",
+            "data": {"errors": [{"field": "body.email", "message": "field required", "type": "missing"}]}
+        }
+
+    @pytest.mark.asyncio
+    async def test_http_exception_handler(self, request_mock):
+        """Test HTTP exceptions use their detail as the message"""
+        response = await http_exception_handler(request_mock, HTTPException(status_code=403, detail="Forbidden"))
+
+        assert response.status_code == 403
+        assert _body(response) == {"success": False, "message": "Forbidden", "data": None}
+
+    @pytest.mark.asyncio
+    async def test_global_exception_handler_production(self, request_mock):
+        """Test unexpected errors only expose a correlation id in production"""
+        with patch('config_enhanced.settings') as mock_settings:
+            mock_settings.is_development = False
+            response = await global_exception_handler(request_mock, RuntimeError("secret"))
+
+        body = _body(response)
+        assert response.status_code == 500
+        assert body["message"] == "An unexpected error occurred"
+        assert list(body["data"]) == ["correlation_id"]
+
+    @pytest.mark.asyncio
+    async def test_global_exception_handler_development(self, request_mock):
+        """Test development responses include a formatted, truncated traceback"""
+        try:
+            raise ValueError("boom")
+        except ValueError as exc:
+            caught = exc
+
+        with patch('config_enhanced.settings') as mock_settings:
+            mock_settings.is_development = True
+            response = await global_exception_handler(request_mock, caught)
+
+        data = _body(response)["data"]
+        assert data["type"] == "ValueError"
+        assert "ValueError: boom" in data["traceback"]
+        assert len(data["traceback"]) <= 2000
+
+    @pytest.mark.asyncio
+    async def test_validation_failed_raises_api_validation_error(self, request_mock):
+        """Test validation_failed raises a 422 API error with the field errors"""
+        with pytest.raises(APIValidationError) as exc_info:
+            validation_failed("Bad payload", [{"field": "name"}])
+
+        response = await api_error_handler(request_mock, exc_info.value)
+
+        assert response.status_code == 422
+        assert _body(response)["data"] == {"errors": [{"field": "name"}]}
@@ -0,0 +1,133 @@
+"""
+Unit tests for backend/logging_config.py
+Tests the structured JSON log formatter
+"""
+import io
+import json
+import logging
+import pytest
+from unittest.mock import MagicMock
+from backend import logging_config
+from backend.logging_config import JSONFormatter, bind_log_context, log_context, reset_log_context, setup_logging
+
+
+def _record(created=1700000000.25, **extra):
+    record = logging.LogRecord("app", logging.INFO, __file__, 10, "hello %s", ("world",), None)
+    record.created = created
+    record.__dict__.update(extra)
+    return record
+
+
+@pytest.fixture
+def restore_root_logger():
+    """Put the root logger back the way pytest configured it"""
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield
+    logging_config._stop_queue_listener()
+    root.handlers = handlers
+    root.setLevel(level)
+
+
+class TestJSONFormatter:
+    """Test suite for the JSON log formatter"""
+
+    def test_timestamp_from_record_creation_time(self):
+        """Test the timestamp is the record's creation time in UTC"""
+        formatter = JSONFormatter()
+
+        first = json.loads(formatter.format(_record(1700000000.25)))
+        second = json.loads(formatter.format(_record(1700000000.5)))
+
+        assert first["timestamp"] == "2023-11-14T22:13:20.250000Z"
+        assert second["timestamp"] == "2023-11-14T22:13:20.500000Z"
+        assert first["message"] == "hello world"
+
+    def test_extra_fields(self):
+        """Test extra fields are copied and extra_data is written as extra"""
+        formatter = JSONFormatter()
+
+        data = json.loads(formatter.format(_record(request_id="req-1", extra_data={"a": 1})))
+
+        assert data["request_id"] == "req-1"
+        assert data["extra"] == {"a": 1}
+        assert "user_id" not in data
+
+
+    def test_log_context_fields(self):
+        """Test bound context fields are added and explicit extras take precedence"""
+        formatter = JSONFormatter()
+
+        with log_context(request_id="req-ctx", user_id="u1"):
+            data = json.loads(formatter.format(_record(request_id="req-extra")))
+
+        assert data["user_id"] == "u1"
+        assert data["request_id"] == "req-extra"
+        assert "user_id" not in json.loads(formatter.format(_record()))
+
+    def test_bind_and_reset_log_context(self):
+        """Test nested binds extend the context and reset restores the outer one"""
+        outer = bind_log_context(request_id="req-1")
+        inner = bind_log_context(user_id="u1")
+
+        assert logging_config.LOG_CONTEXT.get() == {"request_id": "req-1", "user_id": "u1"}
+
+        reset_log_context(inner)
+        assert logging_config.LOG_CONTEXT.get() == {"request_id": "req-1"}
+        reset_log_context(outer)
+        assert logging_config.LOG_CONTEXT.get() == {}
+
+    def test_output_cached_per_record(self):
+        """Test a record is serialized once and reused by other handlers' formatters"""
+        record = _record()
+
+        first = JSONFormatter().format(record)
+        record.msg = "changed"
+
+        assert JSONFormatter().format(record) is first
+        assert JSONFormatter().format(_record()) == first
+
+
+class TestSetupLogging:
+    """Test suite for the queued logging setup"""
+
+    def test_records_written_by_listener(self, tmp_path, restore_root_logger):
+        """Test the root logger only enqueues and the listener writes JSON files"""
+        log_file = tmp_path / "app.log"
+        setup_logging(log_file=str(log_file))
+
+        root = logging.getLogger()
+        assert [type(h) for h in root.handlers] == [logging_config._LocalQueueHandler]
+
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            with log_context(user_id="u1"):
+                logging.getLogger("app").exception("failed %s", "job", extra={"request_id": "req-1"})
+        logging_config._stop_queue_listener()
+
+        errors = [json.loads(line) for line in (tmp_path / "app.error.log").read_text().splitlines()]
+        assert len(errors) == 1
+        assert errors[0]["message"] == "failed job"
+        assert errors[0]["request_id"] == "req-1"
+        assert errors[0]["user_id"] == "u1"
+        assert "ValueError: boom" in errors[0]["exception"]
+
+    def test_queue_root_handlers_batches_flushes(self, restore_root_logger):
+        """Test existing root handlers move behind the queue and flush once drained"""
+        stream = io.StringIO()
+        stream.flush = MagicMock()
+        handler = logging.StreamHandler(stream)
+        root = logging.getLogger()
+        root.handlers = [handler]
+        root.setLevel(logging.INFO)
+
+        logging_config.queue_root_handlers()
+        assert [type(h) for h in root.handlers] == [logging_config._LocalQueueHandler]
+
+        for i in range(50):
+            logging.getLogger("app").info("line %d", i)
+        logging_config._stop_queue_listener()
+
+        assert stream.getvalue().splitlines() == [f"line {i}" for i in range(50)]
+        assert stream.flush.call_count < 50
@@ -0,0 +1,98 @@
+"""
+Unit tests for backend/metrics_collector.py
+Tests request recording and the streaming latency percentiles
+"""
+import random
+import pytest
+from unittest.mock import patch
+from backend.metrics_collector import (
+    MAX_TRACKED_ENDPOINTS,
+    OVERFLOW_ENDPOINT_KEY,
+    LatencyHistogram,
+    MetricsCollector,
+)
+
+
+class TestLatencyHistogram:
+    """Test suite for the streaming latency histogram"""
+
+    def test_empty_histogram(self):
+        """Test percentiles of an empty histogram are zero"""
+        histogram = LatencyHistogram()
+
+        assert histogram.percentile(0.99) == 0
+        assert histogram.mean == 0
+
+    def test_percentiles_within_precision(self):
+        """Test quantiles match exact order statistics within bucket precision"""
+        rng = random.Random(42)
+        values = [rng.lognormvariate(3, 1) for _ in range(20000)]
+        histogram = LatencyHistogram()
+        for value in values:
+            histogram.record(value)
+
+        exact = sorted(values)
+        for fraction in (0.5, 0.95, 0.99):
+            expected = exact[int(len(exact) * fraction)]
+            assert histogram.percentile(fraction) == pytest.approx(expected, rel=0.01)
+
+    def test_memory_bounded_by_value_range(self):
+        """Test repeated values share buckets instead of growing storage"""
+        histogram = LatencyHistogram()
+        for _ in range(5000):
+            histogram.record(12.5)
+
+        assert len(histogram.counts) == 1
+        assert histogram.count == 5000
+        assert histogram.percentile(0.5) == pytest.approx(12.5, rel=0.005)
+
+
+class TestMetricsCollector:
+    """Test suite for the metrics collector"""
+
+    def test_response_times_cover_all_requests(self):
+        """Test percentiles and extremes are reported over every request"""
+        collector = MetricsCollector()
+        for duration in range(1, 2001):
+            collector.record_request("/api/test", "GET", float(duration), 200)
+
+        times = collector.get_metrics()["response_times"]
+
+        assert times["min_ms"] == 1
+        assert times["max_ms"] == 2000
+        assert times["avg_ms"] == pytest.approx(1000.5)
+        assert times["p50_ms"] == pytest.approx(1001, rel=0.005)
+        assert times["p99_ms"] == pytest.approx(1981, rel=0.005)
+
+    def test_endpoint_stats_capped(self):
+        """Test endpoints beyond the cap share one overflow entry"""
+        collector = MetricsCollector()
+        for i in range(MAX_TRACKED_ENDPOINTS + 10):
+            collector.record_request(f"/raw/{i}", "GET", 1.0, 200)
+
+        assert len(collector.endpoint_stats) == MAX_TRACKED_ENDPOINTS + 1
+        assert collector.endpoint_stats[OVERFLOW_ENDPOINT_KEY]["count"] == 10
+        collector.record_request("/raw/0", "GET", 1.0, 200)
+        assert collector.endpoint_stats["GET /raw/0"]["count"] == 2
+
+    def test_uptime_uses_monotonic_clock(self):
+        """Test uptime and throughput come from the monotonic clock"""
+        with patch('backend.metrics_collector.time.monotonic', return_value=100.0):
+            collector = MetricsCollector()
+            collector.record_request("/api/test", "GET", 1.0, 200)
+        with patch('backend.metrics_collector.time.monotonic', return_value=104.0):
+            metrics = collector.get_metrics()
+
+        assert metrics["uptime_seconds"] == 4.0
+        assert metrics["requests_per_second"] == 0.25
+
+    def test_reset_clears_durations(self):
+        """Test reset starts a fresh histogram"""
+        collector = MetricsCollector()
+        collector.record_request("/api/test", "GET", 10.0, 500)
+
+        collector.reset_metrics()
+
+        metrics = collector.get_metrics()
+        assert metrics["total_requests"] == 0
+        assert metrics["response_times"]["p95_ms"] == 0
@@ -0,0 +1,113 @@
+"""
+Unit tests for backend/metrics_middleware.py
+Tests which endpoint label each request is recorded under
+"""
+import pytest
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.metrics_middleware import MetricsMiddleware, RequestContextMiddleware, UNMATCHED_ENDPOINT
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"item_id": item_id}
+
+    @app.get("/api/health")
+    async def health():
+        return {"status": "ok"}
+
+    app.add_middleware(MetricsMiddleware)
+    return TestClient(app)
+
+
+class TestMetricsMiddleware:
+    """Test suite for the metrics middleware"""
+
+    def test_records_route_template(self, client):
+        """Test requests are recorded under the route template, not the raw path"""
+        with patch('backend.metrics_middleware.record_request') as record:
+            response = client.get("/items/42")
+
+        assert response.status_code == 200
+        assert "X-Response-Time-Ms" in response.headers
+        assert record.call_args.kwargs["endpoint"] == "/items/{item_id}"
+        assert record.call_args.kwargs["status_code"] == 200
+
+    def test_unmatched_paths_share_one_label(self, client):
+        """Test unknown paths don't create a new endpoint each"""
+        with patch('backend.metrics_middleware.record_request') as record:
+            client.get("/random-a")
+            client.get("/random-b")
+
+        endpoints = {call.kwargs["endpoint"] for call in record.call_args_list}
+        assert endpoints == {UNMATCHED_ENDPOINT}
+
+    def test_exempt_paths_not_recorded(self, client):
+        """Test health checks bypass metrics and the timing header"""
+        with patch('backend.metrics_middleware.record_request') as record:
+            response = client.get("/api/health")
+
+        assert response.status_code == 200
+        assert "X-Response-Time-Ms" not in response.headers
+        record.assert_not_called()
+
+
+@pytest.fixture
+def context_client():
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"item_id": item_id}
+
+    @app.get("/api/health")
+    async def health():
+        return {"status": "ok"}
+
+    app.add_middleware(RequestContextMiddleware)
+    return TestClient(app)
+
+
+class TestRequestContextMiddleware:
+    """Test suite for the combined request ID and metrics middleware"""
+
+    def test_request_id_timing_and_metrics_in_one_layer(self, context_client):
+        """Test one middleware adds both headers and records the route template"""
+        with patch('backend.metrics_middleware.record_request') as record:
+            response = context_client.get("/items/42", headers={"X-Request-ID": "req-1"})
+
+        assert response.headers["X-Request-ID"] == "req-1"
+        assert float(response.headers["X-Response-Time-Ms"]) >= 0
+        assert record.call_args.kwargs["endpoint"] == "/items/{item_id}"
+        assert record.call_args.kwargs["method"] == "GET"
+        assert record.call_args.kwargs["status_code"] == 200
+
+    def test_exempt_paths_keep_request_id_only(self, context_client):
+        """Test exempt paths get a request ID but no timing or metrics"""
+        with patch('backend.metrics_middleware.record_request') as record:
+            response = context_client.get("/api/health")
+
+        assert "X-Request-ID" in response.headers
+        assert "X-Response-Time-Ms" not in response.headers
+        record.assert_not_called()
+
+    def test_metrics_kept_when_request_ids_disabled(self):
+        """Test disabling request IDs leaves timing and metrics in place"""
+        app = FastAPI()
+
+        @app.get("/items")
+        async def items():
+            return {}
+
+        app.add_middleware(RequestContextMiddleware, enabled=False)
+        with patch('backend.metrics_middleware.record_request') as record:
+            response = TestClient(app).get("/items")
+
+        assert "X-Request-ID" not in response.headers
+        assert "X-Response-Time-Ms" in response.headers
+        record.assert_called_once()
@@ -0,0 +1,687 @@
+"""
+Unit tests for backend/integrations/payment_integrations.py
+Tests the payment integration manager and its provider HTTP handling
+"""
+import asyncio
+import bson
+import hashlib
+import hmac
+import json
+from decimal import Decimal
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from backend.integrations.payment_integrations import (
+    PaymentIntegrationManager,
+    PaymentProvider,
+    ProviderRateLimiter,
+    WEBHOOK_HASH_OFFLOAD_BYTES,
+    _json_dumps,
+    _json_loads,
+)
+
+
+def _response(status=200, payload=None, headers=None):
+    response = MagicMock()
+    response.status = status
+    response.headers = headers or {}
+    response.json = AsyncMock(return_value=payload or {})
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=response)
+    context.__aexit__ = AsyncMock(return_value=False)
+    return context
+
+
+class TestPaymentHTTPSession:
+    """Test the shared provider HTTP session"""
+
+    @pytest.fixture
+    def manager(self):
+        """Create a payment integration manager instance for testing"""
+        return PaymentIntegrationManager()
+
+    @pytest.mark.asyncio
+    async def test_session_reused_until_closed(self, manager):
+        """Test one session serves every call and is recreated after close"""
+        session = await manager._get_session()
+
+        assert await manager._get_session() is session
+
+        await manager.close()
+
+        assert session.closed
+        new_session = await manager._get_session()
+        assert new_session is not session
+        await manager.close()
+
+    @pytest.mark.asyncio
+    async def test_stripe_connection_uses_shared_session(self, manager):
+        """Test the Stripe connection check goes through the shared session"""
+        session = MagicMock()
+        session.request.return_value = _response(200, {"id": "acct_1", "country": "AE"})
+        manager._get_session = AsyncMock(return_value=session)
+
+        result = await manager._test_payment_connection(PaymentProvider.STRIPE, {"secret_key": "sk_test"})
+
+        assert result["success"] is True
+        assert result["account_id"] == "acct_1"
+        session.request.assert_called_once()
+        assert dict(session.request.call_args.kwargs["headers"]) == {
+            "Authorization": "Bearer sk_test",
+            "Stripe-Version": "2023-10-16"
+        }
+
+    @pytest.mark.asyncio
+    async def test_stripe_connection_http_error(self, manager):
+        """Test a non-200 response is reported as a failed connection"""
+        session = MagicMock()
+        session.request.return_value = _response(401)
+        manager._get_session = AsyncMock(return_value=session)
+
+        result = await manager._test_payment_connection(PaymentProvider.STRIPE, {"secret_key": "bad"})
+
+        assert result == {"success": False, "error": "HTTP 401"}
+
+
+class TestProviderConcurrency:
+    """Test per-provider concurrency limits"""
+
+    @pytest.mark.asyncio
+    async def test_payments_bounded_per_provider(self):
+        """Test concurrent payments share the provider's semaphore without deadlocking"""
+        manager = PaymentIntegrationManager()
+        manager._provider_sem[PaymentProvider.STRIPE] = asyncio.Semaphore(2)
+        manager._rate_limiters[PaymentProvider.STRIPE] = ProviderRateLimiter(rate=1000.0, capacity=100)
+        manager.integrations.set("int_1", {
+            "provider": "stripe",
+            "credentials": {},
+            "settings": {"uae_compliance": False}
+        })
+        in_flight = 0
+        peak = 0
+
+        async def enter(*args):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0)
+            in_flight -= 1
+            return _response(200, {"id": "pi_1"}).__aenter__.return_value
+
+        def request(*args, **kwargs):
+            context = _response()
+            context.__aenter__ = AsyncMock(side_effect=enter)
+            return context
+
+        session = MagicMock()
+        session.request.side_effect = request
+        manager._get_session = AsyncMock(return_value=session)
+
+        async def fake_payment(credentials, payment_data):
+            status, payload = await manager._provider_request(
+                PaymentProvider.STRIPE, "POST", "https://api.stripe.com/v1/payment_intents"
+            )
+            return {"success": status == 200, "payment_id": payload["id"]}
+
+        manager._payment_dispatch[PaymentProvider.STRIPE] = fake_payment
+
+        results = await asyncio.wait_for(
+            asyncio.gather(*(manager.process_payment("int_1", {"amount": 10}) for _ in range(6))),
+            timeout=5
+        )
+
+        assert all(result["success"] for result in results)
+        assert peak == 2
+
+
+class TestProviderRateLimiter:
+    """Test the outbound token bucket"""
+
+    @pytest.mark.asyncio
+    async def test_acquire_consumes_tokens(self):
+        """Test tokens are consumed until the burst is spent"""
+        limiter = ProviderRateLimiter(rate=1000.0, capacity=2)
+
+        await limiter.acquire()
+        await limiter.acquire()
+
+        assert limiter.tokens < 1
+
+    @pytest.mark.asyncio
+    async def test_acquire_waits_when_empty(self):
+        """Test an empty bucket sleeps for the refill time of one token"""
+        limiter = ProviderRateLimiter(rate=10.0, capacity=1)
+        limiter.tokens = 0.0
+
+        async def refill(delay):
+            limiter.tokens = 1.0
+
+        with patch('backend.integrations.payment_integrations.asyncio.sleep', side_effect=refill) as mock_sleep:
+            await limiter.acquire()
+
+        assert mock_sleep.call_args.args[0] == pytest.approx(0.1, abs=0.01)
+
+    def test_headers_tighten_bucket(self):
+        """Test remaining and retry-after headers are applied"""
+        limiter = ProviderRateLimiter(rate=10.0, capacity=10)
+
+        limiter.update_from_headers({"X-RateLimit-Remaining": "3", "Retry-After": "2"})
+
+        assert limiter.tokens <= 3
+        assert limiter._blocked_until > 0
+
+    def test_malformed_headers_ignored(self):
+        """Test unparseable header values leave the bucket untouched"""
+        limiter = ProviderRateLimiter(rate=10.0, capacity=10)
+
+        limiter.update_from_headers({"X-RateLimit-Remaining": "n/a", "Retry-After": "soon"})
+
+        assert limiter._blocked_until == 0.0
+
+    @pytest.mark.asyncio
+    async def test_provider_request_retries_rate_limited(self):
+        """Test 429 responses are retried with backoff before succeeding"""
+        manager = PaymentIntegrationManager()
+        session = MagicMock()
+        session.request.side_effect = [_response(429), _response(503), _response(200, {"id": "acct_1"})]
+        manager._get_session = AsyncMock(return_value=session)
+
+        with patch('backend.integrations.payment_integrations.asyncio.sleep', new=AsyncMock()) as mock_sleep:
+            status, payload = await manager._provider_request(PaymentProvider.STRIPE, "GET", "https://api.stripe.com/v1/account")
+
+        assert (status, payload) == (200, {"id": "acct_1"})
+        assert [call.args[0] for call in mock_sleep.await_args_list] == [0.5, 1.0]
+
+    @pytest.mark.asyncio
+    async def test_provider_request_gives_up(self):
+        """Test the last retryable response is returned once retries run out"""
+        manager = PaymentIntegrationManager()
+        session = MagicMock()
+        session.request.side_effect = [_response(500) for _ in range(4)]
+        manager._get_session = AsyncMock(return_value=session)
+
+        with patch('backend.integrations.payment_integrations.asyncio.sleep', new=AsyncMock()):
+            status, payload = await manager._provider_request(PaymentProvider.STRIPE, "GET", "https://api.stripe.com/v1/account")
+
+        assert (status, payload) == (500, None)
+        assert session.request.call_count == 4
+
+
+    @pytest.mark.asyncio
+    async def test_provider_request_uses_fast_json(self):
+        """Test response bodies are decoded with the module's JSON loader"""
+        manager = PaymentIntegrationManager()
+        session = MagicMock()
+        response = _response(200, {"id": "acct_1"})
+        session.request.return_value = response
+        manager._get_session = AsyncMock(return_value=session)
+
+        await manager._provider_request(PaymentProvider.STRIPE, "GET", "https://api.stripe.com/v1/account")
+
+        inner = await response.__aenter__()
+        inner.json.assert_awaited_once_with(loads=_json_loads)
+
+    def test_json_helpers_round_trip(self):
+        """Test the JSON helpers produce str and parse it back"""
+        encoded = _json_dumps({"amount": 10, "currency": "AED"})
+
+        assert isinstance(encoded, str)
+        assert _json_loads(encoded) == {"amount": 10, "currency": "AED"}
+
+class TestWebhookSignature:
+    """Test webhook signature verification"""
+
+    @pytest.fixture
+    def manager(self):
+        """Create a manager with one Stripe integration"""
+        manager = PaymentIntegrationManager()
+        credentials = {"webhook_secret": "whsec_test"}
+        manager.integrations.set("int_1", {"provider": "stripe", "credentials": credentials, "tenant_id": None})
+        manager._webhook_macs.set("int_1", manager._build_webhook_mac(credentials))
+        return manager
+
+    @staticmethod
+    def _sign(secret, raw_body):
+        return hmac.new(secret.encode(), raw_body, hashlib.sha256).hexdigest()
+
+    @pytest.mark.asyncio
+    async def test_valid_signature_reuses_template(self, manager):
+        """Test valid signatures verify repeatedly without re-keying"""
+        raw_body = b'{"type": "payment_intent.succeeded"}'
+        template = manager._webhook_macs.get("int_1")
+
+        for _ in range(2):
+            assert await manager._verify_webhook_signature(
+                PaymentProvider.STRIPE, raw_body, self._sign("whsec_test", raw_body), "int_1"
+            ) is True
+
+        assert manager._webhook_macs.get("int_1") is template
+
+    @pytest.mark.asyncio
+    async def test_invalid_signature_rejected(self, manager):
+        """Test a signature from another secret is rejected"""
+        raw_body = b'{"type": "payment_intent.succeeded"}'
+
+        assert await manager._verify_webhook_signature(
+            PaymentProvider.STRIPE, raw_body, self._sign("other", raw_body), "int_1"
+        ) is False
+
+    @pytest.mark.asyncio
+    async def test_template_built_on_demand(self, manager):
+        """Test integrations without a cached template still verify"""
+        manager._webhook_macs.delete("int_1")
+        raw_body = b'{"type": "payment.completed"}'
+
+        assert await manager._verify_webhook_signature(
+            PaymentProvider.STRIPE, raw_body, self._sign("whsec_test", raw_body), "int_1"
+        ) is True
+        assert manager._webhook_macs.get("int_1") is not None
+
+    @pytest.mark.asyncio
+    async def test_stripe_signature_header(self, manager):
+        """Test t=/v1= headers sign the timestamped payload and accept any v1"""
+        raw_body = b'{"type": "payment_intent.succeeded"}'
+        good = self._sign("whsec_test", b"1700000000." + raw_body)
+        header = f"t=1700000000,v1={'0' * 64},v1={good}"
+
+        assert await manager._verify_webhook_signature(PaymentProvider.STRIPE, raw_body, header, "int_1") is True
+        assert await manager._verify_webhook_signature(
+            PaymentProvider.STRIPE, raw_body, f"t=1700000001,v1={good}", "int_1"
+        ) is False
+
+    @pytest.mark.asyncio
+    async def test_large_body_hashed_in_thread(self, manager):
+        """Test large bodies are verified off the event loop"""
+        raw_body = bytearray(b"x" * WEBHOOK_HASH_OFFLOAD_BYTES)
+        signature = self._sign("whsec_test", bytes(raw_body))
+
+        with patch('backend.integrations.payment_integrations.asyncio.to_thread',
+                   wraps=asyncio.to_thread) as to_thread:
+            assert await manager._verify_webhook_signature(
+                PaymentProvider.STRIPE, raw_body, signature, "int_1"
+            ) is True
+
+        to_thread.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_bytes_like_body_verified_in_place(self, manager):
+        """Test bytearray and memoryview bodies verify without conversion"""
+        raw_body = bytearray(b'{"type": "payment.completed"}')
+        signature = self._sign("whsec_test", bytes(raw_body))
+
+        assert await manager._verify_webhook_signature(PaymentProvider.STRIPE, raw_body, signature, "int_1") is True
+        assert await manager._verify_webhook_signature(
+            PaymentProvider.STRIPE, memoryview(raw_body), signature, "int_1"
+        ) is True
+
+    @pytest.mark.asyncio
+    async def test_non_hex_signature_rejected(self, manager):
+        """Test malformed signatures fail closed"""
+        assert await manager._verify_webhook_signature(PaymentProvider.STRIPE, b"{}", "not-hex!", "int_1") is False
+
+    @pytest.mark.asyncio
+    async def test_webhook_verified_over_raw_body(self, manager):
+        """Test the signature covers the exact bytes, not re-serialized JSON"""
+        raw_body = b'{"type":"payment_intent.succeeded",  "id":"evt_1"}'
+        webhook_data = json.loads(raw_body)
+
+        result = await manager.handle_payment_webhook(
+            "int_1", webhook_data, self._sign("whsec_test", raw_body), raw_body
+        )
+
+        assert result["event_type"] == "payment_intent.succeeded"
+        assert result["processing_result"]["action"] == "payment_confirmed"
+
+    @pytest.mark.asyncio
+    async def test_webhook_rejects_tampered_body(self, manager):
+        """Test a body changed after signing is rejected"""
+        raw_body = b'{"type":"payment_intent.succeeded"}'
+        signature = self._sign("whsec_test", raw_body)
+
+        result = await manager.handle_payment_webhook(
+            "int_1", {"type": "payment_intent.succeeded"}, signature, raw_body + b" "
+        )
+
+        assert result == {"error": "Invalid webhook signature"}
+
+
+    @pytest.mark.asyncio
+    async def test_duplicate_webhook_short_circuits(self, manager):
+        """Test a retried event is answered without verifying or handling it again"""
+        raw_body = b'{"id":"evt_1","type":"payment_intent.succeeded"}'
+        webhook_data = json.loads(raw_body)
+        signature = self._sign("whsec_test", raw_body)
+        await manager.handle_payment_webhook("int_1", webhook_data, signature, raw_body)
+        manager._handle_payment_succeeded = MagicMock()
+
+        result = await manager.handle_payment_webhook("int_1", webhook_data, "bogus", raw_body)
+
+        assert result["processing_result"] == {"status": "duplicate", "event_id": "evt_1"}
+        manager._handle_payment_succeeded.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_rejected_webhook_not_remembered(self, manager):
+        """Test events that fail verification are processed when resent correctly"""
+        raw_body = b'{"id":"evt_2","type":"payment_intent.succeeded"}'
+        webhook_data = json.loads(raw_body)
+
+        await manager.handle_payment_webhook("int_1", webhook_data, "bogus", raw_body)
+        result = await manager.handle_payment_webhook(
+            "int_1", webhook_data, self._sign("whsec_test", raw_body), raw_body
+        )
+
+        assert result["processing_result"]["action"] == "payment_confirmed"
+
+    @pytest.mark.asyncio
+    async def test_dedup_memory_bounded(self, manager):
+        """Test the oldest remembered events are dropped past the bound"""
+        with patch('backend.integrations.payment_integrations.WEBHOOK_DEDUP_SIZE', 2):
+            for event_id in ("evt_a", "evt_b", "evt_c"):
+                raw_body = json.dumps({"id": event_id, "type": "payment.failed"}).encode()
+                await manager.handle_payment_webhook(
+                    "int_1", json.loads(raw_body), self._sign("whsec_test", raw_body), raw_body
+                )
+
+        assert list(manager._processed_webhooks) == [("int_1", "evt_b"), ("int_1", "evt_c")]
+
+class TestProviderLookup:
+    """Test stored provider values resolve to enum members"""
+
+    def test_provider_by_value_covers_all_providers(self):
+        """Test every provider value maps back to its enum member"""
+        for provider in PaymentProvider:
+            assert PaymentIntegrationManager._provider_by_value[provider.value] is provider
+
+    @pytest.mark.asyncio
+    async def test_unknown_provider_reports_error(self):
+        """Test an integration with an unknown provider fails cleanly"""
+        manager = PaymentIntegrationManager()
+        manager.integrations.set("int_1", {"provider": "bogus", "credentials": {}, "settings": {"uae_compliance": False}})
+
+        result = await manager.process_payment("int_1", {"amount": 10})
+
+        assert "error" in result
+
+
+class TestProviderDispatch:
+    """Test provider dispatch tables"""
+
+    @pytest.fixture
+    def manager(self):
+        """Create a manager with one UAE bank integration"""
+        manager = PaymentIntegrationManager()
+        manager.integrations.set("int_1", {"provider": "uae_banks", "credentials": {}, "settings": {"uae_compliance": False}})
+        return manager
+
+    @pytest.mark.asyncio
+    async def test_payment_routed_to_provider_handler(self, manager):
+        """Test payments are routed through the dispatch table"""
+        result = await manager.process_payment("int_1", {"amount": 10})
+
+        assert result["success"] is True
+        assert result["payment_id"].startswith("UAE-")
+
+    @pytest.mark.asyncio
+    async def test_unsupported_subscription_and_refund(self, manager):
+        """Test providers missing from a table report an unsupported error"""
+        assert await manager.create_subscription("int_1", {}) == {"error": "Subscriptions not supported by uae_banks"}
+        assert await manager.process_refund("int_1", "pay_1") == {"error": "Refunds not supported by uae_banks"}
+
+    @pytest.mark.asyncio
+    async def test_connection_test_dispatch(self, manager):
+        """Test connection checks run the provider's own test"""
+        result = await manager._test_payment_connection(PaymentProvider.UAE_BANKS, {})
+        assert "ADCB" in result["supported_banks"]
+        assert await manager._test_payment_connection(PaymentProvider.APPLE_PAY, {}) == {"success": True}
+
+
+class TestIdGeneration:
+    """Test generated payment ids"""
+
+    def test_ids_unique_within_same_instant(self):
+        """Test ids stay unique even when the clock does not advance"""
+        manager = PaymentIntegrationManager()
+
+        with patch('backend.integrations.payment_integrations.time.time_ns', return_value=1234):
+            ids = {manager._new_id("pi_stripe") for _ in range(100)}
+
+        assert len(ids) == 100
+        assert all(payment_id.startswith("pi_stripe_4d2_") for payment_id in ids)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_payments_get_distinct_ids(self):
+        """Test concurrent payments never share a payment id"""
+        manager = PaymentIntegrationManager()
+        manager.integrations.set("int_1", {"provider": "stripe", "credentials": {}, "settings": {"uae_compliance": True}})
+
+        results = await asyncio.gather(*(manager.process_payment("int_1", {"amount": 10}) for _ in range(20)))
+
+        assert len({result["payment_id"] for result in results}) == 20
+
+
+class TestTimestampCache:
+    """Test the coarse record timestamp"""
+
+    def test_timestamp_reused_within_ttl(self):
+        """Test calls inside the TTL share one formatted timestamp"""
+        manager = PaymentIntegrationManager()
+
+        with patch('backend.integrations.payment_integrations.time.monotonic', return_value=100.0):
+            first = manager._now_iso()
+            assert manager._now_iso() is first
+
+    def test_timestamp_refreshed_after_ttl(self):
+        """Test the timestamp is reformatted once the TTL has passed"""
+        manager = PaymentIntegrationManager()
+
+        with patch('backend.integrations.payment_integrations.time.monotonic', side_effect=[100.0, 100.2]):
+            with patch('backend.integrations.payment_integrations.datetime') as mock_datetime:
+                mock_datetime.now.return_value.isoformat.side_effect = ["t1", "t2"]
+                assert manager._now_iso() == "t1"
+                assert manager._now_iso() == "t2"
+
+
+class TestIntegrationStore:
+    """Test the bounded integration cache in front of MongoDB"""
+
+    @pytest.fixture
+    def manager(self):
+        """Create a payment integration manager instance for testing"""
+        return PaymentIntegrationManager()
+
+    @pytest.mark.asyncio
+    @patch('backend.integrations.payment_integrations.get_database')
+    async def test_setup_persists_and_caches(self, mock_get_db, manager):
+        """Test new integrations are written to MongoDB and cached"""
+        mock_db = MagicMock()
+        mock_db.payment_integrations.insert_one = AsyncMock()
+        mock_get_db.return_value = mock_db
+
+        result = await manager.setup_payment_integration(PaymentProvider.PAYPAL, {"client_id": "c"}, "tenant_1")
+
+        stored = mock_db.payment_integrations.insert_one.await_args.args[0]
+        assert stored["integration_id"] == result["integration_id"]
+        assert manager.integrations.get(result["integration_id"])["tenant_id"] == "tenant_1"
+        assert result["supported_currencies"] == ("AED", "USD", "EUR", "GBP")
+
+    @pytest.mark.asyncio
+    @patch('backend.integrations.payment_integrations.get_database')
+    async def test_credentials_stored_encrypted(self, mock_get_db, manager):
+        """Test provider secrets are encrypted in MongoDB and decrypted on reload"""
+        credentials = {"secret_key": "sk_live_secret", "webhook_secret": "whsec_secret"}
+        mock_db = MagicMock()
+        mock_db.payment_integrations.insert_one = AsyncMock()
+        mock_get_db.return_value = mock_db
+        manager._connection_tests[PaymentProvider.STRIPE] = AsyncMock(return_value={"success": True})
+
+        result = await manager.setup_payment_integration(PaymentProvider.STRIPE, credentials, "tenant_1")
+
+        stored = mock_db.payment_integrations.insert_one.await_args.args[0]
+        assert "credentials" not in stored
+        assert "sk_live_secret" not in json.dumps(stored)
+        assert "whsec_secret" not in json.dumps(stored)
+        assert manager.integrations.get(result["integration_id"])["credentials"] == credentials
+
+        mock_db.payment_integrations.find_one = AsyncMock(return_value=dict(stored))
+        reloaded = await PaymentIntegrationManager()._get_integration(result["integration_id"])
+
+        assert reloaded["credentials"] == credentials
+        assert "encrypted_credentials" not in reloaded
+
+    @pytest.mark.asyncio
+    async def test_setup_many_runs_concurrently(self, manager):
+        """Test batched setups overlap and keep request order"""
+        in_flight = 0
+        peak = 0
+
+        async def fake_setup(provider, credentials, tenant_id):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0)
+            in_flight -= 1
+            if provider is PaymentProvider.CRYPTOCURRENCY:
+                raise RuntimeError("boom")
+            return {"provider": provider.value}
+
+        manager.setup_payment_integration = fake_setup
+
+        results = await manager.setup_many([
+            (PaymentProvider.STRIPE, {}, "tenant_1"),
+            (PaymentProvider.PAYPAL, {}, "tenant_1"),
+            (PaymentProvider.CRYPTOCURRENCY, {}, "tenant_1"),
+        ])
+
+        assert peak == 3
+        assert results[0] == {"provider": "stripe"}
+        assert results[1] == {"provider": "paypal"}
+        assert results[2] == {"error": "Failed to setup payment integration: boom"}
+
+    @pytest.mark.asyncio
+    @patch('backend.integrations.payment_integrations.get_database')
+    async def test_auth_headers_built_once_at_setup(self, mock_get_db, manager):
+        """Test setup caches read-only auth headers reused by later calls"""
+        mock_db = MagicMock()
+        mock_db.payment_integrations.insert_one = AsyncMock()
+        mock_get_db.return_value = mock_db
+        connection_test = AsyncMock(return_value={"success": True})
+        manager._connection_tests[PaymentProvider.STRIPE] = connection_test
+
+        result = await manager.setup_payment_integration(PaymentProvider.STRIPE, {"secret_key": "sk_test"}, "tenant_1")
+        integration = manager.integrations.get(result["integration_id"])
+        headers = manager._get_auth_headers(integration)
+
+        assert headers is connection_test.await_args.args[1]
+        assert manager._get_auth_headers(integration) is headers
+        assert headers["Authorization"] == "Bearer sk_test"
+        with pytest.raises(TypeError):
+            headers["Authorization"] = "x"
+        assert "_auth_headers" not in integration
+
+    @pytest.mark.asyncio
+    @patch('backend.integrations.payment_integrations.get_database')
+    async def test_cache_miss_loads_from_database(self, mock_get_db, manager):
+        """Test evicted integrations are reloaded from MongoDB once"""
+        doc = {"integration_id": "int_1", "provider": "uae_banks", "credentials": {}, "settings": {"uae_compliance": False}}
+        mock_db = MagicMock()
+        mock_db.payment_integrations.find_one = AsyncMock(return_value=doc)
+        mock_get_db.return_value = mock_db
+
+        first = await manager.process_payment("int_1", {"amount": 10})
+        second = await manager.process_payment("int_1", {"amount": 10})
+
+        assert first["success"] is True and second["success"] is True
+        mock_db.payment_integrations.find_one.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    @patch('backend.integrations.payment_integrations.get_database')
+    async def test_unknown_integration(self, mock_get_db, manager):
+        """Test integrations missing from cache and database are reported"""
+        mock_db = MagicMock()
+        mock_db.payment_integrations.find_one = AsyncMock(return_value=None)
+        mock_get_db.return_value = mock_db
+
+        assert await manager.process_payment("missing", {}) == {"error": "Payment integration not found"}
+
+    @pytest.mark.asyncio
+    @patch('backend.integrations.payment_integrations.get_database')
+    async def test_integration_for_tenant_cached(self, mock_get_db, manager):
+        """Test (tenant, provider) lookups hit MongoDB once, then the cache"""
+        doc = {"integration_id": "int_1", "tenant_id": "tenant_1", "provider": "stripe", "credentials": {}}
+        cursor = MagicMock()
+        cursor.sort.return_value = cursor
+        cursor.limit.return_value = cursor
+        cursor.to_list = AsyncMock(return_value=[doc])
+        mock_db = MagicMock()
+        mock_db.payment_integrations.find = MagicMock(return_value=cursor)
+        mock_get_db.return_value = mock_db
+
+        first = await manager.get_integration_for("tenant_1", PaymentProvider.STRIPE)
+        second = await manager.get_integration_for("tenant_1", PaymentProvider.STRIPE)
+
+        assert first is doc and second is doc
+        mock_db.payment_integrations.find.assert_called_once_with(
+            {"tenant_id": "tenant_1", "provider": "stripe"}, projection={"_id": 0}
+        )
+
+    @pytest.mark.asyncio
+    @patch('backend.integrations.payment_integrations.get_database')
+    async def test_integration_for_tenant_missing(self, mock_get_db, manager):
+        """Test tenants without an integration for the provider get None"""
+        cursor = MagicMock()
+        cursor.sort.return_value = cursor
+        cursor.limit.return_value = cursor
+        cursor.to_list = AsyncMock(return_value=[])
+        mock_db = MagicMock()
+        mock_db.payment_integrations.find = MagicMock(return_value=cursor)
+        mock_get_db.return_value = mock_db
+
+        assert await manager.get_integration_for("tenant_1", PaymentProvider.PAYPAL) is None
+
+
+class TestUAECompliance:
+    """Test UAE VAT calculation"""
+
+    def test_vat_uses_decimal(self):
+        """Test VAT and totals are exact decimal amounts"""
+        manager = PaymentIntegrationManager()
+
+        data = manager._add_uae_compliance_data({"amount": 0.1})
+
+        assert data["vat_amount"] == "0.01"
+        assert data["total_with_vat"] == "0.11"
+        assert Decimal(data["vat_rate"]) == Decimal("0.05")
+
+    def test_vat_rounded_half_up_to_fils(self):
+        """Test VAT is rounded half-up and the total adds up"""
+        manager = PaymentIntegrationManager()
+
+        data = manager._add_uae_compliance_data({"amount": "10.10"})
+
+        assert data["vat_amount"] == "0.51"
+        assert data["total_with_vat"] == "10.61"
+
+    def test_compliance_data_serializable(self):
+        """Test the enriched payment record encodes as JSON and BSON"""
+        manager = PaymentIntegrationManager()
+
+        data = manager._add_uae_compliance_data({"amount": "10.10"})
+
+        assert json.loads(json.dumps(data))["total_with_vat"] == "10.61"
+        assert bson.decode(bson.encode(data))["vat_amount"] == "0.51"
+
+
+class TestPaymentAnalytics:
+    """Test payment analytics retrieval"""
+
+    @pytest.mark.asyncio
+    async def test_analytics_shared_constant(self):
+        """Test analytics responses reuse the prebuilt data"""
+        manager = PaymentIntegrationManager()
+        manager.integrations.set("int_1", {"provider": "stripe", "credentials": {}})
+
+        first = await manager.get_payment_analytics("int_1", {"from": "2024-01-01"})
+        second = await manager.get_payment_analytics("int_1", {"from": "2024-02-01"})
+
+        assert first["analytics"] is second["analytics"]
+        assert first["analytics"]["currency_breakdown"]["AED"] == 78.5
+        assert second["date_range"] == {"from": "2024-02-01"}
@@ -3,16 +3,14 @@ Unit tests for backend/core/performance_optimizer.py
 Tests performance optimization, caching, and monitoring
 """
 import pytest
-from unittest.mock import Mock, AsyncMock, patch, MagicMock
+from unittest.mock import AsyncMock, patch
 from datetime import datetime, timezone, timedelta
-from collections import deque
 from backend.core.performance_optimizer import (
     PerformanceOptimizer,
     CacheManager,
     MetricType,
     AlertSeverity,
     PerformanceMetric,
-    PerformanceAlert,
     performance_optimizer
 )
 
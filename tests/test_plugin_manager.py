@@ -0,0 +1,120 @@
+"""
+Unit tests for backend/core/plugin_manager.py
+Tests the lazily created global plugin manager, its backend.core re-export
+and batch plugin validation
+"""
+import importlib
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+
+plugin_manager_module = importlib.import_module("backend.core.plugin_manager")
+
+
+@pytest.fixture
+def fresh_singleton():
+    """Reset the global instance and replace PluginManager with a mock class"""
+    manager_class = MagicMock()
+    with patch.object(plugin_manager_module, "_plugin_manager", None), \
+         patch.object(plugin_manager_module, "PluginManager", manager_class):
+        yield manager_class
+
+
+class TestGlobalPluginManager:
+    """Test suite for the lazy plugin_manager singleton"""
+
+    def test_created_on_first_access(self, fresh_singleton):
+        """Test the first access builds the manager and later ones reuse it"""
+        fresh_singleton.assert_not_called()
+
+        first = plugin_manager_module.plugin_manager
+        second = plugin_manager_module.plugin_manager
+
+        fresh_singleton.assert_called_once_with()
+        assert first is fresh_singleton.return_value
+        assert second is first
+
+    def test_unknown_attribute_raises(self):
+        """Test other missing attributes still raise AttributeError"""
+        with pytest.raises(AttributeError):
+            plugin_manager_module.missing_attribute
+
+
+class TestCorePackageReExport:
+    """Test suite for the lazy plugin_manager re-export from backend.core"""
+
+    def test_core_resolves_to_module_singleton(self, fresh_singleton):
+        """Test core.plugin_manager is the module's singleton, not the submodule"""
+        core = importlib.import_module("backend.core")
+
+        assert core.plugin_manager is plugin_manager_module.plugin_manager
+        assert core.plugin_manager is fresh_singleton.return_value
+        fresh_singleton.assert_called_once_with()
+
+    def test_core_eager_exports_unchanged(self):
+        """Test the classes are still imported eagerly from the package"""
+        core = importlib.import_module("backend.core")
+
+        assert core.PluginManager is plugin_manager_module.PluginManager
+        assert "plugin_manager" in core.__all__
+
+
+def _write_plugin(root, name, manifest=None, entry_point=True):
+    """Create a plugin directory with an optional manifest and entry point"""
+    plugin_dir = root / name
+    plugin_dir.mkdir()
+    if manifest is not None:
+        (plugin_dir / "manifest.json").write_text(manifest if isinstance(manifest, str) else json.dumps(manifest))
+    if entry_point:
+        (plugin_dir / "plugin.py").write_text("")
+
+
+class TestValidateAllPlugins:
+    """Test suite for validating the plugins directory as one batch"""
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        complete = {
+            "name": "x", "version": "1.0.0", "description": "d", "author": "a", "entry_point": "plugin.py"
+        }
+        _write_plugin(tmp_path, "good", complete)
+        _write_plugin(tmp_path, "no_entry", complete, entry_point=False)
+        _write_plugin(tmp_path, "incomplete", {"name": "x", "entry_point": "plugin.py"})
+        _write_plugin(tmp_path, "broken_json", "{not json")
+        _write_plugin(tmp_path, "no_manifest")
+        return plugin_manager_module.PluginManager(plugins_directory=str(tmp_path))
+
+    @pytest.mark.asyncio
+    async def test_results_per_discovered_plugin(self, manager):
+        """Test each plugin with a manifest gets its own validation result"""
+        results = await manager.validate_all_plugins()
+
+        assert set(results) == {"good", "no_entry", "incomplete", "broken_json"}
+        assert results["good"] == {"plugin_name": "good", "valid": True, "issues": [], "warnings": []}
+        assert results["no_entry"]["valid"] is False
+        assert results["no_entry"]["issues"] == ["Entry point file not found: plugin.py"]
+        assert results["incomplete"]["valid"] is False
+        assert results["incomplete"]["issues"] == [
+            "Missing required field in manifest: author",
+            "Missing required field in manifest: description",
+            "Missing required field in manifest: version",
+        ]
+        assert results["broken_json"]["issues"] == ["Invalid JSON in manifest.json"]
+
+    @pytest.mark.asyncio
+    async def test_batch_matches_single_validation(self, manager):
+        """Test batch results equal validate_plugin, which also reports plugins without a manifest"""
+        results = await manager.validate_all_plugins()
+
+        for name, result in results.items():
+            assert result == await manager.validate_plugin(name)
+        missing = await manager.validate_plugin("no_manifest")
+        assert missing["valid"] is False
+        assert missing["issues"] == ["manifest.json not found"]
+
+    @pytest.mark.asyncio
+    async def test_empty_directory(self, tmp_path):
+        """Test an empty plugins directory validates to an empty result"""
+        manager = plugin_manager_module.PluginManager(plugins_directory=str(tmp_path / "plugins"))
+
+        assert await manager.validate_all_plugins() == {}
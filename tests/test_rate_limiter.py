@@ -0,0 +1,234 @@
+"""
+Unit tests for backend/rate_limiter.py
+Tests the per-IP in-memory and Redis rate limit windows and temporary blocking
+"""
+from collections import deque
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.rate_limiter import (
+    REDIS_RETRY_AFTER,
+    RateLimiter,
+    RateLimitMiddleware,
+    RedisRateLimiter,
+    _redis_limiters,
+    close_rate_limiters,
+)
+
+
+@pytest.fixture
+def clock():
+    """Patch the limiter's monotonic clock with a controllable value"""
+    with patch('backend.rate_limiter.time.monotonic') as monotonic:
+        monotonic.return_value = 1000.0
+        yield monotonic
+
+
+class TestRateLimiter:
+    """Test suite for the in-memory rate limiter"""
+
+    def test_requests_recorded_as_monotonic_timestamps(self, clock):
+        """Test each allowed request appends its timestamp to both windows"""
+        limiter = RateLimiter(requests_per_minute=5)
+
+        allowed, _, info = limiter.is_allowed("1.1.1.1")
+
+        assert allowed is True
+        assert info["requests_this_minute"] == 1
+        assert limiter.minute_buckets["1.1.1.1"] == deque([1000.0])
+        assert limiter.hour_buckets["1.1.1.1"] == deque([1000.0])
+
+    def test_minute_window_slides(self, clock):
+        """Test requests older than a minute expire from the minute window only"""
+        limiter = RateLimiter(requests_per_minute=5)
+        limiter.is_allowed("1.1.1.1")
+        clock.return_value = 1030.0
+        limiter.is_allowed("1.1.1.1")
+
+        clock.return_value = 1061.0
+        allowed, _, info = limiter.is_allowed("1.1.1.1")
+
+        assert allowed is True
+        assert info["requests_this_minute"] == 2
+        assert info["requests_this_hour"] == 3
+        assert limiter.minute_buckets["1.1.1.1"] == deque([1030.0, 1061.0])
+
+    def test_idle_ip_windows_dropped(self, clock):
+        """Test fully expired windows are removed instead of kept empty"""
+        limiter = RateLimiter()
+        limiter.is_allowed("1.1.1.1")
+
+        limiter._clean_old_entries("1.1.1.1", now=1000.0 + 3601)
+
+        assert "1.1.1.1" not in limiter.minute_buckets
+        assert "1.1.1.1" not in limiter.hour_buckets
+
+    def test_idle_ips_swept_by_other_traffic(self, clock):
+        """Test IPs that never return are evicted a few keys per request"""
+        limiter = RateLimiter()
+        for i in range(20):
+            limiter.is_allowed(f"10.0.0.{i}")
+        limiter.blocked_ips["10.0.1.1"] = 1000.0 + 60
+        
+        clock.return_value = 1000.0 + 3601
+        for _ in range(4):
+            limiter.is_allowed("1.1.1.1")
+        
+        assert list(limiter.hour_buckets) == ["1.1.1.1"]
+        assert list(limiter.minute_buckets) == ["1.1.1.1"]
+        assert limiter.blocked_ips == {}
+    
+    def test_minute_limit_blocks_ip(self, clock):
+        """Test exceeding the minute limit blocks the IP until the block expires"""
+        limiter = RateLimiter(requests_per_minute=2)
+        limiter.is_allowed("1.1.1.1")
+        limiter.is_allowed("1.1.1.1")
+
+        allowed, _, info = limiter.is_allowed("1.1.1.1")
+
+        assert allowed is False
+        assert info["retry_after"] == 60
+        assert limiter.is_blocked("1.1.1.1") is True
+
+        clock.return_value = 1000.0 + limiter.block_duration
+        assert limiter.is_blocked("1.1.1.1") is False
+        assert "1.1.1.1" not in limiter.blocked_ips
+
+    def test_hour_limit(self, clock):
+        """Test the hour limit rejects without blocking"""
+        limiter = RateLimiter(requests_per_minute=100, requests_per_hour=2)
+        for offset in (0.0, 120.0):
+            clock.return_value = 1000.0 + offset
+            limiter.is_allowed("1.1.1.1")
+
+        allowed, _, info = limiter.is_allowed("1.1.1.1")
+
+        assert allowed is False
+        assert info["requests_this_hour"] == 2
+        assert "1.1.1.1" not in limiter.blocked_ips
+
+
+def _redis(*results):
+    """Mock redis client whose pipeline returns each result list in turn"""
+    redis = MagicMock()
+    redis.set = AsyncMock()
+    redis.pipeline.return_value.execute = AsyncMock(side_effect=list(results))
+    return redis
+
+
+class TestRedisRateLimiter:
+    """Test suite for the Redis fixed-window rate limiter"""
+
+    @pytest.mark.asyncio
+    async def test_counts_in_fixed_windows(self):
+        """Test requests increment expiring per-minute and per-hour keys"""
+        redis = _redis([0, 3, True, 10, True])
+        limiter = RedisRateLimiter(redis, requests_per_minute=5)
+
+        with patch('backend.rate_limiter.time.time', return_value=7200.0):
+            allowed, _, info = await limiter.check("1.1.1.1")
+
+        assert allowed is True
+        assert info["requests_this_minute"] == 3
+        assert info["requests_this_hour"] == 10
+        pipe = redis.pipeline.return_value
+        pipe.incr.assert_any_call("rl:m:1.1.1.1:120")
+        pipe.incr.assert_any_call("rl:h:1.1.1.1:2")
+        pipe.expire.assert_any_call("rl:m:1.1.1.1:120", 70)
+
+    @pytest.mark.asyncio
+    async def test_minute_limit_sets_block_key(self):
+        """Test exceeding the minute limit blocks the IP in Redis"""
+        redis = _redis([0, 6, True, 6, True], [1, 7, True, 7, True])
+        limiter = RedisRateLimiter(redis, requests_per_minute=5)
+
+        allowed, _, info = await limiter.check("1.1.1.1")
+
+        assert allowed is False
+        assert info["requests_this_minute"] == 5
+        redis.set.assert_awaited_once_with("rl:blocked:1.1.1.1", 1, ex=limiter.block_duration)
+
+        allowed, reason, _ = await limiter.check("1.1.1.1")
+        assert allowed is False
+        assert "blocked" in reason
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_memory_when_redis_fails(self):
+        """Test Redis errors fall back to the in-memory windows"""
+        redis = MagicMock()
+        redis.pipeline.return_value.execute = AsyncMock(side_effect=ConnectionError("down"))
+        limiter = RedisRateLimiter(redis)
+
+        allowed, _, info = await limiter.check("1.1.1.1")
+
+        assert allowed is True
+        assert info["requests_this_minute"] == 1
+        assert "1.1.1.1" in limiter.minute_buckets
+
+    @pytest.mark.asyncio
+    async def test_redis_skipped_during_back_off(self, clock):
+        """Test a Redis failure skips Redis and logs once until the back-off expires"""
+        redis = _redis(ConnectionError("down"), [0, 1, True, 1, True])
+        limiter = RedisRateLimiter(redis)
+
+        with patch('backend.rate_limiter.logger') as logger:
+            await limiter.check("1.1.1.1")
+            clock.return_value += REDIS_RETRY_AFTER - 1
+            await limiter.check("1.1.1.1")
+
+            assert redis.pipeline.return_value.execute.await_count == 1
+            assert logger.warning.call_count == 1
+
+            clock.return_value += 1
+            allowed, _, info = await limiter.check("1.1.1.1")
+
+        assert redis.pipeline.return_value.execute.await_count == 2
+        assert info["requests_this_minute"] == 1
+        logger.info.assert_called_once_with("Redis rate limiting restored")
+
+    @pytest.mark.asyncio
+    async def test_close_rate_limiters_closes_redis_clients(self):
+        """Test shutdown closes each Redis limiter's client"""
+        redis = MagicMock()
+        redis.aclose = AsyncMock()
+        limiter = RedisRateLimiter(redis)
+
+        await close_rate_limiters()
+
+        redis.aclose.assert_awaited_once_with()
+        assert limiter not in _redis_limiters
+
+
+class TestRateLimitMiddleware:
+    """Test suite for the rate limiting middleware"""
+
+    @pytest.fixture
+    def client(self):
+        app = FastAPI()
+
+        @app.get("/api/health")
+        async def health():
+            return {}
+
+        @app.get("/api/items")
+        async def items():
+            return {}
+
+        app.add_middleware(RateLimitMiddleware, requests_per_minute=10, requests_per_hour=100,
+                           exempt_paths=["/api/health", "/docs"])
+        return TestClient(app)
+
+    def test_exempt_prefix_skips_limits(self, client):
+        """Test exempt prefixes bypass the limiter and its headers"""
+        response = client.get("/api/health")
+
+        assert "X-RateLimit-Limit-Minute" not in response.headers
+
+    def test_limit_headers(self, client):
+        """Test limited routes report their limits and remaining requests"""
+        response = client.get("/api/items")
+
+        assert response.headers["X-RateLimit-Limit-Minute"] == "10"
+        assert response.headers["X-RateLimit-Remaining-Minute"] == "9"
+        assert response.headers["X-RateLimit-Limit-Hour"] == "100"
@@ -0,0 +1,252 @@
+"""
+Unit tests for backend/request_tracker.py
+Tests request ID propagation through the ASGI middleware
+"""
+import logging
+import uuid
+import pytest
+from unittest.mock import MagicMock, patch
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from backend import request_tracker
+# request_tracker binds the top-level module (backend/ is on sys.path)
+import logging_config
+from backend.request_tracker import (
+    RequestIDMiddleware,
+    RequestLogger,
+    fast_request_id,
+    get_request_logger,
+    get_request_id,
+    request_id_var,
+)
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/items")
+    async def items():
+        return {"context": get_request_id()}
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    @app.exception_handler(Exception)
+    async def on_error(request, exc):
+        return JSONResponse({"context": get_request_id()}, status_code=500)
+
+    app.add_middleware(RequestIDMiddleware)
+    return TestClient(app, raise_server_exceptions=False)
+
+
+class TestRequestIDMiddleware:
+    """Test suite for the request ID middleware"""
+
+    def test_incoming_request_id_propagated(self, client):
+        """Test a client-supplied request ID reaches the handler and the response"""
+        response = client.get("/items", headers={"X-Request-ID": "req-123"})
+
+        assert response.headers["X-Request-ID"] == "req-123"
+        assert response.json() == {"context": "req-123"}
+
+    def test_request_id_generated(self, client):
+        """Test a UUID is generated when the client sends none"""
+        response = client.get("/items")
+
+        request_id = response.headers["X-Request-ID"]
+        assert len(request_id) == 36
+        assert response.json()["context"] == request_id
+
+    def test_context_reset_after_request(self, client):
+        """Test the request ID does not leak past the request"""
+        client.get("/items", headers={"X-Request-ID": "req-123"})
+
+        assert request_id_var.get() == ""
+
+    def test_errors_reach_app_handler(self, client):
+        """Test errors propagate to the app's error handler rather than being swallowed"""
+        response = client.get("/boom", headers={"X-Request-ID": "req-err"})
+
+        assert response.status_code == 500
+
+    @pytest.mark.asyncio
+    async def test_context_reset_when_app_raises(self):
+        """Test the request ID and log context are reset even if the app raises"""
+        async def app(scope, receive, send):
+            assert get_request_id() == "req-err"
+            raise RuntimeError("boom")
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/boom",
+            "headers": [(request_tracker.REQUEST_ID_HEADER, b"req-err")],
+        }
+        with pytest.raises(RuntimeError):
+            await RequestIDMiddleware(app)(scope, None, None)
+
+        assert get_request_id() == ""
+        assert "request_id" not in logging_config.LOG_CONTEXT.get()
+
+    @pytest.mark.asyncio
+    async def test_request_id_read_from_raw_scope_headers(self):
+        """Test the header is matched on the raw lowercase scope bytes and echoed back"""
+        sent = []
+
+        async def app(scope, receive, send):
+            assert get_request_id() == "req-raw"
+            await send({"type": "http.response.start", "status": 204, "headers": [(b"x-app", b"1")]})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/raw",
+            "headers": [(b"accept", b"*/*"), (request_tracker.REQUEST_ID_HEADER, b"req-raw")],
+        }
+        await RequestIDMiddleware(app)(scope, None, send)
+
+        assert sent[0]["headers"] == [(b"x-app", b"1"), (b"x-request-id", b"req-raw")]
+        assert get_request_id() == ""
+
+    def test_client_ip_logged_from_scope(self, client):
+        """Test the start record carries the ASGI client host"""
+        with patch.object(request_tracker.logger, "isEnabledFor", return_value=True), \
+             patch.object(request_tracker.logger, "info") as info:
+            client.get("/items")
+
+        started = next(call for call in info.call_args_list if call.args[0] == "Request started")
+        assert started.kwargs["extra"]["client_ip"] == "testclient"
+
+    def test_duration_logged_in_milliseconds(self, client):
+        """Test the completed record reports elapsed perf_counter_ns as milliseconds"""
+        with patch.object(request_tracker.logger, "isEnabledFor", return_value=True), \
+             patch.object(request_tracker.logger, "info") as info, \
+             patch('backend.request_tracker.time.perf_counter_ns', side_effect=[1_000_000, 13_456_789]):
+            client.get("/items")
+
+        completed = next(call for call in info.call_args_list if call.args[0] == "Request completed")
+        assert completed.kwargs["extra"]["duration_ms"] == 12.45
+
+    @pytest.mark.asyncio
+    async def test_disabled_middleware_passes_through(self):
+        """Test a disabled middleware forwards requests without touching them"""
+        calls = []
+
+        async def app(scope, receive, send):
+            calls.append(get_request_id())
+
+        scope = {"type": "http", "method": "GET", "path": "/", "headers": []}
+        with patch('backend.request_tracker.fast_request_id') as generate:
+            await RequestIDMiddleware(app, enabled=False)(scope, None, None)
+
+        assert calls == [""]
+        generate.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_non_http_scopes_passed_through(self):
+        """Test lifespan and websocket scopes are forwarded untouched"""
+        calls = []
+
+        async def app(scope, receive, send):
+            calls.append(scope)
+
+        middleware = RequestIDMiddleware(app)
+        scope = {"type": "lifespan"}
+        await middleware(scope, None, None)
+
+        assert calls == [scope]
+
+    def test_request_logs_skipped_when_info_disabled(self, client):
+        """Test the start/completed records are not built when INFO is off"""
+        with patch.object(request_tracker.logger, "isEnabledFor", return_value=False), \
+             patch.object(request_tracker.logger, "info") as info:
+            response = client.get("/items")
+
+        assert response.status_code == 200
+        messages = [call.args[0] for call in info.call_args_list]
+        assert "Request started" not in messages
+        assert "Request completed" not in messages
+
+
+class TestRequestLogger:
+    """Test suite for request ID stamping on log records"""
+
+    @pytest.fixture
+    def records(self):
+        handler = logging.Handler()
+        handler.emit = MagicMock()
+        request_logger = RequestLogger("tests.request_tracker")
+        request_logger.logger.addHandler(handler)
+        request_logger.logger.setLevel(logging.INFO)
+        yield request_logger, handler.emit
+        request_logger.logger.removeHandler(handler)
+
+    def test_records_stamped_with_request_id(self, records):
+        """Test records carry the current request ID without an extra dict"""
+        request_logger, emit = records
+        token = request_id_var.set("req-1")
+        try:
+            request_logger.info("hello")
+        finally:
+            request_id_var.reset(token)
+
+        assert emit.call_args.args[0].request_id == "req-1"
+
+    def test_explicit_request_id_kept(self, records):
+        """Test a request_id passed via extra is not overwritten"""
+        request_logger, emit = records
+
+        request_logger.warning("hello", extra={"request_id": "req-explicit"})
+
+        assert emit.call_args.args[0].request_id == "req-explicit"
+
+    def test_filter_added_once(self):
+        """Test several wrappers around one logger share a single filter"""
+        RequestLogger("tests.request_tracker.shared")
+        request_logger = RequestLogger("tests.request_tracker.shared")
+
+        assert len(request_logger.logger.filters) == 1
+
+    def test_get_request_logger_cached(self):
+        """Test one RequestLogger is shared per logger name"""
+        first = get_request_logger("tests.request_tracker.cached")
+
+        assert get_request_logger("tests.request_tracker.cached") is first
+        assert get_request_logger("tests.request_tracker.other") is not first
+        assert first.logger is logging.getLogger("tests.request_tracker.cached")
+
+    def test_disabled_level_skipped(self, records):
+        """Test disabled levels never create a record"""
+        request_logger, emit = records
+
+        request_logger.debug("noisy")
+
+        emit.assert_not_called()
+
+
+class TestFastRequestId:
+    """Test suite for pooled request ID generation"""
+
+    def test_ids_are_unique_version_4_uuids(self):
+        """Test generated IDs parse as distinct version 4 UUIDs"""
+        ids = [fast_request_id() for _ in range(100)]
+
+        assert len(set(ids)) == 100
+        assert all(uuid.UUID(request_id).version == 4 for request_id in ids)
+
+    def test_entropy_fetched_once_per_batch(self):
+        """Test the OS is asked for random bytes once per batch of IDs"""
+        with patch.object(request_tracker, "_id_offset", request_tracker._id_offset), \
+             patch.object(request_tracker, "_id_entropy", b""), \
+             patch('backend.request_tracker.os.urandom', wraps=request_tracker.os.urandom) as urandom:
+            for _ in range(request_tracker.REQUEST_ID_BATCH + 1):
+                fast_request_id()
+
+        assert urandom.call_count == 2
@@ -5,15 +5,13 @@ Tests enterprise security features, RBAC, and compliance
 """
 
 import pytest
-from unittest.mock import Mock, AsyncMock, patch, MagicMock
+from unittest.mock import Mock, AsyncMock, patch
 from datetime import datetime, timezone
 from backend.core.security_manager import (
     SecurityManager,
     UserRole,
     Permission,
     ComplianceStandard,
-    AuditEvent,
-    SecurityPolicy,
     security_manager
 )
 
@@ -3,7 +3,7 @@ Unit tests for backend/integrations/sendgrid_integration.py
 Tests SendGrid email integration functionality
 """
 import pytest
-from unittest.mock import Mock, AsyncMock, patch, MagicMock
+from unittest.mock import Mock, patch
 import os
 from backend.integrations.sendgrid_integration import SendGridIntegration, sendgrid_integration
 
@@ -21,10 +21,10 @@ class TestSendGridIntegration:
             return SendGridIntegration()
     
     @pytest.fixture
-    def integration_no_key(self):
+    def integration_no_key(self, monkeypatch):
         """Create integration without API key"""
-        with patch.dict(os.environ, {}, clear=True):
-            return SendGridIntegration()
+        monkeypatch.delenv('SENDGRID_API_KEY', raising=False)
+        return SendGridIntegration()
     
     def test_initialization_with_api_key(self, integration):
         """Test initialization with valid API key"""
@@ -37,11 +37,12 @@ class TestSendGridIntegration:
         assert integration_no_key.api_key is None
         assert integration_no_key.client is None
         
-    def test_default_from_email(self):
+    def test_default_from_email(self, monkeypatch):
         """Test default from email when not specified"""
-        with patch.dict(os.environ, {'SENDGRID_API_KEY': 'test'}, clear=True):
-            integration = SendGridIntegration()
-            assert integration.from_email == "noreply@nowheredigital.ae"
+        monkeypatch.setenv('SENDGRID_API_KEY', 'test')
+        monkeypatch.delenv('SENDGRID_FROM_EMAIL', raising=False)
+        integration = SendGridIntegration()
+        assert integration.from_email == "noreply@nowheredigital.ae"
     
     @pytest.mark.asyncio
     async def test_send_email_without_client(self, integration_no_key):
@@ -3,11 +3,26 @@ Unit tests for backend/integrations/stripe_integration.py
 Tests Stripe payment integration functionality
 """
 import pytest
-from unittest.mock import Mock, AsyncMock, patch, MagicMock
+from unittest.mock import Mock, AsyncMock, patch
 import os
 from backend.integrations.stripe_integration import StripeIntegration, stripe_integration
 
 
+def _checkout_session():
+    session = Mock()
+    session.url = "https://checkout.stripe.com/session123"
+    session.id = "cs_test_123"
+    return session
+
+
+def _mock_sessions(integration):
+    """Replace the SDK's checkout session service with async mocks"""
+    sessions = integration.client.v1.checkout.sessions
+    sessions.create_async = AsyncMock()
+    sessions.retrieve_async = AsyncMock()
+    return sessions
+
+
 class TestStripeIntegration:
     """Test suite for Stripe payment integration"""
     
@@ -23,11 +38,11 @@ class TestStripeIntegration:
         assert integration.stripe_checkout is None
         assert integration.PACKAGES is not None
         
-    def test_default_api_key(self):
+    def test_default_api_key(self, monkeypatch):
         """Test default API key when not provided"""
-        with patch.dict(os.environ, {}, clear=True):
-            integration = StripeIntegration()
-            assert integration.api_key == 'sk_test_emergent'
+        monkeypatch.delenv('STRIPE_API_KEY', raising=False)
+        integration = StripeIntegration()
+        assert integration.api_key == 'sk_test_emergent'
     
     def test_payment_packages_configuration(self, integration):
         """Test payment packages are properly configured"""
@@ -50,17 +65,12 @@ class TestStripeIntegration:
             assert package["amount"] > 0
             
     def test_initialize_method(self, integration):
-        """Test initialize method sets up checkout"""
-        webhook_url = "https://example.com/webhook"
+        """Test initialize keeps the client built at construction"""
+        client = integration.client
         
-        with patch('backend.integrations.stripe_integration.StripeCheckout') as mock_checkout:
-            integration.initialize(webhook_url)
-            
-            mock_checkout.assert_called_once_with(
-                api_key=integration.api_key,
-                webhook_url=webhook_url
-            )
-            assert integration.stripe_checkout is not None
+        integration.initialize("https://example.com/webhook")
+        
+        assert integration.client is client
     
     @pytest.mark.asyncio
     async def test_create_session_invalid_package(self, integration):
@@ -74,20 +84,10 @@ class TestStripeIntegration:
         assert result["error"] == "Invalid package"
     
     @pytest.mark.asyncio
-    @patch('backend.integrations.stripe_integration.StripeCheckout')
-    async def test_create_session_success(self, mock_checkout_class):
+    async def test_create_session_success(self, integration):
         """Test successful checkout session creation"""
-        # Mock session response
-        mock_session = Mock()
-        mock_session.url = "https://checkout.stripe.com/session123"
-        mock_session.session_id = "cs_test_123"
-        
-        mock_checkout_instance = AsyncMock()
-        mock_checkout_instance.create_checkout_session = AsyncMock(return_value=mock_session)
-        mock_checkout_class.return_value = mock_checkout_instance
-        
-        integration = StripeIntegration()
-        integration.stripe_checkout = mock_checkout_instance
+        sessions = _mock_sessions(integration)
+        sessions.create_async.return_value = _checkout_session()
         
         result = await integration.create_session(
             package_id="starter",
@@ -95,43 +95,49 @@ class TestStripeIntegration:
             metadata={"user_id": "123"}
         )
         
-        assert "url" in result
         assert result["url"] == "https://checkout.stripe.com/session123"
         assert result["session_id"] == "cs_test_123"
         assert "package" in result
+        params = sessions.create_async.await_args.kwargs["params"]
+        assert params["line_items"][0]["price_data"]["unit_amount"] == 250000
+        assert params["metadata"] == {"user_id": "123"}
         
     @pytest.mark.asyncio
-    @patch('backend.integrations.stripe_integration.StripeCheckout')
-    async def test_create_session_initializes_checkout(self, mock_checkout_class):
-        """Test that create_session initializes checkout if not already done"""
-        mock_session = Mock()
-        mock_session.url = "https://checkout.stripe.com/session"
-        mock_session.session_id = "cs_test"
+    async def test_create_session_reuses_client(self, integration):
+        """Test every checkout goes through the client built in __init__"""
+        client = integration.client
+        sessions = _mock_sessions(integration)
+        sessions.create_async.return_value = _checkout_session()
         
-        mock_checkout_instance = AsyncMock()
-        mock_checkout_instance.create_checkout_session = AsyncMock(return_value=mock_session)
-        mock_checkout_class.return_value = mock_checkout_instance
+        for _ in range(2):
+            result = await integration.create_session(
+                package_id="growth",
+                host_url="https://example.com"
+            )
+            assert "url" in result
         
-        integration = StripeIntegration()
+        assert integration.client is client
+        assert sessions.create_async.await_count == 2
         
-        result = await integration.create_session(
-            package_id="growth",
-            host_url="https://example.com"
-        )
+    @pytest.mark.asyncio
+    async def test_create_session_reuses_prebuilt_request_parts(self, integration):
+        """Test line items and redirect URLs are built once and shared across calls"""
+        sessions = _mock_sessions(integration)
+        sessions.create_async.return_value = _checkout_session()
         
-        assert integration.stripe_checkout is not None
-        assert "url" in result
+        await integration.create_session(package_id="growth", host_url="https://example.com")
+        await integration.create_session(package_id="growth", host_url="https://example.com")
+        
+        first, second = (call.kwargs["params"] for call in sessions.create_async.await_args_list)
+        assert first["line_items"] is second["line_items"]
+        assert first["success_url"] == "https://example.com/payment-success?session_id={CHECKOUT_SESSION_ID}"
+        assert first["cancel_url"] == "https://example.com/payment-cancel"
         
     @pytest.mark.asyncio
     async def test_create_session_with_all_packages(self, integration):
         """Test creating sessions for all available packages"""
-        mock_session = Mock()
-        mock_session.url = "https://checkout.stripe.com/session"
-        mock_session.session_id = "cs_test"
-        
-        mock_checkout = AsyncMock()
-        mock_checkout.create_checkout_session = AsyncMock(return_value=mock_session)
-        integration.stripe_checkout = mock_checkout
+        sessions = _mock_sessions(integration)
+        sessions.create_async.return_value = _checkout_session()
         
         for package_id in ["starter", "growth", "enterprise"]:
             result = await integration.create_session(
@@ -145,19 +151,10 @@ class TestStripeIntegration:
             assert result["package"]["name"]
     
     @pytest.mark.asyncio
-    @patch('backend.integrations.stripe_integration.StripeCheckout')
-    async def test_create_session_with_metadata(self, mock_checkout_class):
+    async def test_create_session_with_metadata(self, integration):
         """Test creating session with custom metadata"""
-        mock_session = Mock()
-        mock_session.url = "https://checkout.stripe.com/session"
-        mock_session.session_id = "cs_test"
-        
-        mock_checkout_instance = AsyncMock()
-        mock_checkout_instance.create_checkout_session = AsyncMock(return_value=mock_session)
-        mock_checkout_class.return_value = mock_checkout_instance
-        
-        integration = StripeIntegration()
-        integration.stripe_checkout = mock_checkout_instance
+        sessions = _mock_sessions(integration)
+        sessions.create_async.return_value = _checkout_session()
         
         metadata = {
             "user_id": "user_123",
@@ -172,15 +169,13 @@ class TestStripeIntegration:
         )
         
         assert "url" in result
+        assert sessions.create_async.await_args.kwargs["params"]["metadata"] == metadata
         
     @pytest.mark.asyncio
     async def test_create_session_error_handling(self, integration):
         """Test error handling in session creation"""
-        mock_checkout = AsyncMock()
-        mock_checkout.create_checkout_session = AsyncMock(
-            side_effect=Exception("Stripe API Error")
-        )
-        integration.stripe_checkout = mock_checkout
+        sessions = _mock_sessions(integration)
+        sessions.create_async.side_effect = Exception("Stripe API Error")
         
         result = await integration.create_session(
             package_id="starter",
@@ -196,12 +191,11 @@ class TestStripeIntegration:
         mock_status = Mock()
         mock_status.status = "complete"
         mock_status.payment_status = "paid"
-        mock_status.amount_total = 250000  # in cents
+        mock_status.amount_total = 250000  # in fils
         mock_status.currency = "aed"
         
-        mock_checkout = AsyncMock()
-        mock_checkout.get_checkout_status = AsyncMock(return_value=mock_status)
-        integration.stripe_checkout = mock_checkout
+        sessions = _mock_sessions(integration)
+        sessions.retrieve_async.return_value = mock_status
         
         result = await integration.get_status("cs_test_123")
         
@@ -209,15 +203,13 @@ class TestStripeIntegration:
         assert result["payment_status"] == "paid"
         assert result["amount_total"] == 250000
         assert result["currency"] == "aed"
+        sessions.retrieve_async.assert_awaited_once_with("cs_test_123")
     
     @pytest.mark.asyncio
     async def test_get_status_error(self, integration):
         """Test error handling in get_status"""
-        mock_checkout = AsyncMock()
-        mock_checkout.get_checkout_status = AsyncMock(
-            side_effect=Exception("Session not found")
-        )
-        integration.stripe_checkout = mock_checkout
+        sessions = _mock_sessions(integration)
+        sessions.retrieve_async.side_effect = Exception("Session not found")
         
         result = await integration.get_status("invalid_session")
         
@@ -233,15 +225,24 @@ class TestStripeIntegration:
         mock_status.amount_total = 500000
         mock_status.currency = "aed"
         
-        mock_checkout = AsyncMock()
-        mock_checkout.get_checkout_status = AsyncMock(return_value=mock_status)
-        integration.stripe_checkout = mock_checkout
+        sessions = _mock_sessions(integration)
+        sessions.retrieve_async.return_value = mock_status
         
         result = await integration.get_status("cs_pending")
         
         assert result["status"] == "open"
         assert result["payment_status"] == "unpaid"
     
+    @pytest.mark.asyncio
+    async def test_close_releases_http_client(self, integration):
+        """Test close shuts down the pooled HTTP client"""
+        integration._http_client = Mock()
+        integration._http_client.close_async = AsyncMock()
+        
+        await integration.close()
+        
+        integration._http_client.close_async.assert_awaited_once()
+    
     def test_package_amounts_are_in_aed(self, integration):
         """Test that all package amounts are in AED currency"""
         for package in integration.PACKAGES.values():
@@ -2,10 +2,29 @@
 Unit tests for backend/integrations/twilio_integration.py
 Tests Twilio SMS and verification functionality
 """
+import asyncio
 import pytest
-from unittest.mock import Mock, AsyncMock, patch, MagicMock
+from unittest.mock import AsyncMock, patch, MagicMock
 import os
-from backend.integrations.twilio_integration import TwilioIntegration, twilio_integration
+from backend.integrations.twilio_integration import TwilioIntegration, _TokenBucket, twilio_integration
+
+
+def _response(status=200, payload=None):
+    response = MagicMock()
+    response.status = status
+    response.json = AsyncMock(return_value=payload or {})
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=response)
+    context.__aexit__ = AsyncMock(return_value=False)
+    return context
+
+
+def _mock_session(integration, *responses):
+    """Route the integration's HTTP calls to canned responses"""
+    session = MagicMock()
+    session.post = MagicMock(side_effect=list(responses))
+    integration._get_session = AsyncMock(return_value=session)
+    return session
 
 
 class TestTwilioIntegration:
@@ -20,26 +39,27 @@ class TestTwilioIntegration:
             'TWILIO_VERIFY_SERVICE': 'VAtest123',
             'TWILIO_PHONE_NUMBER': '+15551234567'
         }):
-            with patch('backend.integrations.twilio_integration.Client'):
-                return TwilioIntegration()
+            return TwilioIntegration()
     
     @pytest.fixture
-    def integration_no_creds(self):
+    def integration_no_creds(self, monkeypatch):
         """Create integration without credentials"""
-        with patch.dict(os.environ, {}, clear=True):
-            return TwilioIntegration()
+        for name in ('TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN', 'TWILIO_VERIFY_SERVICE'):
+            monkeypatch.delenv(name, raising=False)
+        return TwilioIntegration()
     
     def test_initialization_with_credentials(self, integration):
         """Test initialization with valid credentials"""
         assert integration.account_sid == 'ACtest123456'
         assert integration.auth_token == 'test_token'  # noqa: S105
         assert integration.verify_service_sid == 'VAtest123'
+        assert integration.auth is not None
         
     def test_initialization_without_credentials(self, integration_no_creds):
         """Test initialization without credentials"""
         assert integration_no_creds.account_sid is None
         assert integration_no_creds.auth_token is None
-        assert integration_no_creds.client is None
+        assert integration_no_creds.auth is None
         
     @pytest.mark.asyncio
     async def test_send_otp_without_client(self, integration_no_creds):
@@ -51,57 +71,27 @@ class TestTwilioIntegration:
         assert result.get("test_mode") is True
         
     @pytest.mark.asyncio
-    @patch('backend.integrations.twilio_integration.Client')
-    async def test_send_otp_success(self, mock_client_class):
+    async def test_send_otp_success(self, integration):
         """Test successful OTP sending"""
-        mock_verification = Mock()
-        mock_verification.status = "pending"
-        
-        mock_verify = Mock()
-        mock_verify.verifications = Mock()
-        mock_verify.verifications.create = Mock(return_value=mock_verification)
+        session = _mock_session(integration, _response(201, {"status": "pending"}))
         
-        mock_verify_service = Mock()
-        mock_verify_service.services = Mock(return_value=mock_verify)
+        result = await integration.send_otp("+971501234567")
         
-        mock_client = Mock()
-        mock_client.verify = mock_verify_service
-        mock_client_class.return_value = mock_client
-        
-        with patch.dict(os.environ, {
-            'TWILIO_ACCOUNT_SID': 'ACtest',
-            'TWILIO_AUTH_TOKEN': 'token',
-            'TWILIO_VERIFY_SERVICE': 'VAtest'
-        }):
-            integration = TwilioIntegration()
-            integration.client = mock_client
-            
-            result = await integration.send_otp("+971501234567")
-            
-            assert result["status"] == "pending"
-            assert result["to"] == "+971501234567"
+        assert result["status"] == "pending"
+        assert result["to"] == "+971501234567"
+        session.post.assert_called_once_with(
+            "https://verify.twilio.com/v2/Services/VAtest123/Verifications",
+            data={"To": "+971501234567", "Channel": "sms"}
+        )
     
     @pytest.mark.asyncio
-    @patch('backend.integrations.twilio_integration.Client')
-    async def test_send_otp_failure(self, mock_client_class):
+    async def test_send_otp_failure(self, integration):
         """Test OTP sending with error"""
-        mock_client = Mock()
-        mock_verify = Mock()
-        mock_verify.services = Mock(side_effect=Exception("Twilio API Error"))
-        mock_client.verify = mock_verify
-        mock_client_class.return_value = mock_client
+        _mock_session(integration, _response(400, {"message": "Invalid parameter `To`"}))
         
-        with patch.dict(os.environ, {
-            'TWILIO_ACCOUNT_SID': 'ACtest',
-            'TWILIO_AUTH_TOKEN': 'token',
-            'TWILIO_VERIFY_SERVICE': 'VAtest'
-        }):
-            integration = TwilioIntegration()
-            integration.client = mock_client
-            
-            result = await integration.send_otp("+971501234567")
-            
-            assert "error" in result
+        result = await integration.send_otp("+971501234567")
+        
+        assert result["error"] == "Invalid parameter `To`"
     
     @pytest.mark.asyncio
     async def test_verify_otp_without_client(self, integration_no_creds):
@@ -120,66 +110,68 @@ class TestTwilioIntegration:
         assert result.get("test_mode") is True
         
     @pytest.mark.asyncio
-    @patch('backend.integrations.twilio_integration.Client')
-    async def test_verify_otp_success(self, mock_client_class):
+    async def test_verify_otp_success(self, integration):
         """Test successful OTP verification"""
-        mock_check = Mock()
-        mock_check.status = "approved"
+        session = _mock_session(integration, _response(200, {"status": "approved"}))
         
-        mock_verify = Mock()
-        mock_verify.verification_checks = Mock()
-        mock_verify.verification_checks.create = Mock(return_value=mock_check)
+        result = await integration.verify_otp("+971501234567", "123456")
         
-        mock_verify_service = Mock()
-        mock_verify_service.services = Mock(return_value=mock_verify)
+        assert result["valid"] is True
+        assert result["status"] == "approved"
+        session.post.assert_called_once_with(
+            "https://verify.twilio.com/v2/Services/VAtest123/VerificationCheck",
+            data={"To": "+971501234567", "Code": "123456"}
+        )
+    
+    @pytest.mark.asyncio
+    async def test_verify_otp_invalid_code(self, integration):
+        """Test OTP verification with invalid code"""
+        _mock_session(integration, _response(200, {"status": "pending"}))
         
-        mock_client = Mock()
-        mock_client.verify = mock_verify_service
-        mock_client_class.return_value = mock_client
+        result = await integration.verify_otp("+971501234567", "000000")
         
-        with patch.dict(os.environ, {
-            'TWILIO_ACCOUNT_SID': 'ACtest',
-            'TWILIO_AUTH_TOKEN': 'token',
-            'TWILIO_VERIFY_SERVICE': 'VAtest'
-        }):
-            integration = TwilioIntegration()
-            integration.client = mock_client
-            
-            result = await integration.verify_otp("+971501234567", "123456")
-            
-            assert result["valid"] is True
-            assert result["status"] == "approved"
+        assert result["valid"] is False
+        assert result["status"] == "pending"
     
     @pytest.mark.asyncio
-    @patch('backend.integrations.twilio_integration.Client')
-    async def test_verify_otp_invalid_code(self, mock_client_class):
-        """Test OTP verification with invalid code"""
-        mock_check = Mock()
-        mock_check.status = "pending"
+    async def test_verify_otp_approved_result_cached(self, integration):
+        """Test a repeat submit of an approved code is answered from the cache"""
+        session = _mock_session(integration, _response(200, {"status": "approved"}))
         
-        mock_verify = Mock()
-        mock_verify.verification_checks = Mock()
-        mock_verify.verification_checks.create = Mock(return_value=mock_check)
+        first = await integration.verify_otp("+971501234567", "123456")
+        second = await integration.verify_otp("+971501234567", "123456")
         
-        mock_verify_service = Mock()
-        mock_verify_service.services = Mock(return_value=mock_verify)
+        assert first == second == {"valid": True, "status": "approved"}
+        session.post.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_verify_otp_rejected_result_not_cached(self, integration):
+        """Test rejected codes always go back to Twilio"""
+        session = _mock_session(
+            integration,
+            _response(200, {"status": "pending"}),
+            _response(200, {"status": "pending"}),
+        )
         
-        mock_client = Mock()
-        mock_client.verify = mock_verify_service
-        mock_client_class.return_value = mock_client
+        await integration.verify_otp("+971501234567", "000000")
+        await integration.verify_otp("+971501234567", "000000")
         
-        with patch.dict(os.environ, {
-            'TWILIO_ACCOUNT_SID': 'ACtest',
-            'TWILIO_AUTH_TOKEN': 'token',
-            'TWILIO_VERIFY_SERVICE': 'VAtest'
-        }):
-            integration = TwilioIntegration()
-            integration.client = mock_client
-            
-            result = await integration.verify_otp("+971501234567", "000000")
-            
-            assert result["valid"] is False
-            assert result["status"] == "pending"
+        assert session.post.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_verify_otp_cache_expires(self, integration):
+        """Test cached approvals stop being served after the TTL"""
+        session = _mock_session(
+            integration,
+            _response(200, {"status": "approved"}),
+            _response(200, {"status": "approved"}),
+        )
+        with patch('backend.integrations.twilio_integration.time.monotonic', return_value=100.0):
+            await integration.verify_otp("+971501234567", "123456")
+        with patch('backend.integrations.twilio_integration.time.monotonic', return_value=161.0):
+            await integration.verify_otp("+971501234567", "123456")
+        
+        assert session.post.call_count == 2
     
     @pytest.mark.asyncio
     async def test_send_sms_without_client(self, integration_no_creds):
@@ -193,141 +185,160 @@ class TestTwilioIntegration:
         assert result["test_mode"] is True
         
     @pytest.mark.asyncio
-    @patch('backend.integrations.twilio_integration.Client')
-    async def test_send_sms_success(self, mock_client_class):
+    async def test_send_sms_success(self, integration):
         """Test successful SMS sending"""
-        mock_message = Mock()
-        mock_message.sid = "SMtest123"
-        mock_message.status = "sent"
-        
-        mock_messages = Mock()
-        mock_messages.create = Mock(return_value=mock_message)
+        session = _mock_session(integration, _response(201, {"sid": "SMtest123", "status": "sent"}))
         
-        mock_client = Mock()
-        mock_client.messages = mock_messages
-        mock_client_class.return_value = mock_client
-        
-        with patch.dict(os.environ, {
-            'TWILIO_ACCOUNT_SID': 'ACtest',
-            'TWILIO_AUTH_TOKEN': 'token',
-            'TWILIO_PHONE_NUMBER': '+15551234567'
-        }):
-            integration = TwilioIntegration()
-            integration.client = mock_client
-            
+        with patch.dict(os.environ, {'TWILIO_PHONE_NUMBER': '+15551234567'}):
             result = await integration.send_sms(
                 to_number="+971501234567",
                 message="Hello from Twilio!"
             )
-            
-            assert result["sid"] == "SMtest123"
-            assert result["status"] == "sent"
+        
+        assert result["sid"] == "SMtest123"
+        assert result["status"] == "sent"
+        session.post.assert_called_once_with(
+            "https://api.twilio.com/2010-04-01/Accounts/ACtest123456/Messages.json",
+            data={"From": "+15551234567", "To": "+971501234567", "Body": "Hello from Twilio!"}
+        )
     
     @pytest.mark.asyncio
-    @patch('backend.integrations.twilio_integration.Client')
-    async def test_send_sms_with_custom_from_number(self, mock_client_class):
+    async def test_send_sms_with_custom_from_number(self, integration):
         """Test SMS sending with custom from number"""
-        mock_message = Mock()
-        mock_message.sid = "SMtest456"
-        mock_message.status = "queued"
-        
-        mock_messages = Mock()
-        mock_messages.create = Mock(return_value=mock_message)
+        session = _mock_session(integration, _response(201, {"sid": "SMtest456", "status": "queued"}))
         
-        mock_client = Mock()
-        mock_client.messages = mock_messages
-        mock_client_class.return_value = mock_client
+        result = await integration.send_sms(
+            to_number="+971501234567",
+            message="Test message",
+            from_number="+15559876543"
+        )
         
-        with patch.dict(os.environ, {
-            'TWILIO_ACCOUNT_SID': 'ACtest',
-            'TWILIO_AUTH_TOKEN': 'token'
-        }):
-            integration = TwilioIntegration()
-            integration.client = mock_client
-            
-            result = await integration.send_sms(
-                to_number="+971501234567",
-                message="Test message",
-                from_number="+15559876543"
-            )
-            
-            assert result["sid"] == "SMtest456"
-            assert result["status"] == "queued"
+        assert result["sid"] == "SMtest456"
+        assert result["status"] == "queued"
+        assert session.post.call_args.kwargs["data"]["From"] == "+15559876543"
     
     @pytest.mark.asyncio
-    @patch('backend.integrations.twilio_integration.Client')
-    async def test_send_sms_without_from_number_configured(self, mock_client_class):
+    async def test_send_sms_without_from_number_configured(self, monkeypatch):
         """Test SMS sending when no from number is configured"""
-        mock_client = Mock()
-        mock_client.messages = Mock()
-        mock_client_class.return_value = mock_client
+        monkeypatch.setenv('TWILIO_ACCOUNT_SID', 'ACtest')
+        monkeypatch.setenv('TWILIO_AUTH_TOKEN', 'token')
+        monkeypatch.delenv('TWILIO_PHONE_NUMBER', raising=False)
+        integration = TwilioIntegration()
+        session = _mock_session(integration)
         
-        with patch.dict(os.environ, {
-            'TWILIO_ACCOUNT_SID': 'ACtest',
-            'TWILIO_AUTH_TOKEN': 'token'
-        }, clear=True):
-            integration = TwilioIntegration()
-            integration.client = mock_client
-            
-            result = await integration.send_sms(
-                to_number="+971501234567",
-                message="Test"
-            )
-            
-            assert "error" in result
-            assert "No Twilio phone number configured" in result["error"]
+        result = await integration.send_sms(
+            to_number="+971501234567",
+            message="Test"
+        )
+        
+        assert "error" in result
+        assert "No Twilio phone number configured" in result["error"]
+        session.post.assert_not_called()
     
     @pytest.mark.asyncio
-    @patch('backend.integrations.twilio_integration.Client')
-    async def test_send_sms_failure(self, mock_client_class):
+    async def test_send_sms_failure(self, integration):
         """Test SMS sending with error"""
-        mock_messages = Mock()
-        mock_messages.create = Mock(side_effect=Exception("Network error"))
-        
-        mock_client = Mock()
-        mock_client.messages = mock_messages
-        mock_client_class.return_value = mock_client
+        session = _mock_session(integration)
+        session.post.side_effect = Exception("Network error")
         
-        with patch.dict(os.environ, {
-            'TWILIO_ACCOUNT_SID': 'ACtest',
-            'TWILIO_AUTH_TOKEN': 'token',
-            'TWILIO_PHONE_NUMBER': '+15551234567'
-        }):
-            integration = TwilioIntegration()
-            integration.client = mock_client
-            
+        with patch.dict(os.environ, {'TWILIO_PHONE_NUMBER': '+15551234567'}):
             result = await integration.send_sms(
                 to_number="+971501234567",
                 message="Test"
             )
-            
-            assert "error" in result
-            assert "Network error" in result["error"]
+        
+        assert "error" in result
+        assert "Network error" in result["error"]
     
     @pytest.mark.asyncio
     async def test_send_otp_international_number(self, integration):
         """Test OTP sending to various international numbers"""
-        mock_verification = Mock()
-        mock_verification.status = "pending"
-        
-        mock_verify = Mock()
-        mock_verify.verifications = Mock()
-        mock_verify.verifications.create = Mock(return_value=mock_verification)
-        
-        mock_verify_service = Mock()
-        mock_verify_service.services = Mock(return_value=mock_verify)
-        
-        integration.client = Mock()
-        integration.client.verify = mock_verify_service
-        
-        # Test various number formats
         numbers = ["+971501234567", "+1234567890", "+447123456789"]
+        _mock_session(integration, *[_response(201, {"status": "pending"}) for _ in numbers])
         
         for number in numbers:
             result = await integration.send_otp(number)
             assert result["status"] == "pending"
             assert result["to"] == number
     
+    @pytest.mark.asyncio
+    async def test_send_sms_bulk_without_client(self, integration_no_creds):
+        """Test bulk sends report test mode for every message when unconfigured"""
+        results = await integration_no_creds.send_sms_bulk([
+            {"to": "+971501234567", "message": "a"},
+            {"to": "+971501234568", "message": "b"},
+        ])
+        
+        assert results == [{"error": "Twilio not configured", "test_mode": True}] * 2
+    
+    @pytest.mark.asyncio
+    async def test_send_sms_bulk_keeps_order_and_isolates_failures(self, integration):
+        """Test bulk results follow input order and one failure does not abort the rest"""
+        _mock_session(
+            integration,
+            _response(201, {"sid": "SM1", "status": "queued"}),
+            _response(400, {"message": "Invalid 'To' Phone Number"}),
+            _response(201, {"sid": "SM3", "status": "queued"}),
+        )
+        messages = [{"to": f"+97150123456{i}", "message": "Hi", "from": "+15551234567"} for i in range(3)]
+        
+        results = await integration.send_sms_bulk(messages)
+        
+        assert results[0] == {"to": "+971501234560", "sid": "SM1", "status": "queued"}
+        assert results[1] == {"to": "+971501234561", "error": "Invalid 'To' Phone Number"}
+        assert results[2] == {"to": "+971501234562", "sid": "SM3", "status": "queued"}
+    
+    @pytest.mark.asyncio
+    async def test_send_sms_bulk_respects_concurrency(self, integration):
+        """Test no more than `concurrency` sends are in flight at once"""
+        in_flight = 0
+        peak = 0
+        
+        async def fake_send(from_number, to_number, body):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0)
+            in_flight -= 1
+            return {"sid": "SM", "status": "queued"}
+        
+        integration._send_message = fake_send
+        messages = [{"to": "+971501234567", "message": "Hi", "from": "+15551234567"}] * 10
+        
+        results = await integration.send_sms_bulk(messages, concurrency=3)
+        
+        assert len(results) == 10
+        assert peak == 3
+    
+    @pytest.mark.asyncio
+    async def test_token_bucket_waits_when_empty(self):
+        """Test the bucket sleeps for the refill time once its burst is spent"""
+        bucket = _TokenBucket(rate=2)
+        with patch('backend.integrations.twilio_integration.time.monotonic', return_value=10.0), \
+             patch('backend.integrations.twilio_integration.asyncio.sleep', new_callable=AsyncMock) as sleep:
+            bucket.updated = 10.0
+            await bucket.acquire()
+            await bucket.acquire()
+            sleep.assert_not_awaited()
+            
+            sleep.side_effect = lambda delay: setattr(bucket, "tokens", 1)
+            await bucket.acquire()
+        
+        sleep.assert_awaited_once_with(0.5)
+    
+    @pytest.mark.asyncio
+    async def test_session_reused_and_closed(self, integration):
+        """Test one pooled session serves every call until close()"""
+        session = await integration._get_session()
+        
+        assert await integration._get_session() is session
+        assert session.headers["Authorization"] == integration.auth.encode()
+        
+        await integration.close()
+        
+        assert session.closed
+        assert integration._session is None
+    
     def test_global_twilio_integration_instance(self):
         """Test global integration instance exists"""
         assert twilio_integration is not None
@@ -2,11 +2,21 @@
 Unit tests for backend/integrations/vision_ai_integration.py
 Tests Vision AI image analysis integration
 """
+import asyncio
+import base64
+import aiohttp
 import pytest
-from unittest.mock import Mock, AsyncMock, patch, MagicMock
+from unittest.mock import Mock, AsyncMock, patch
 import os
-from datetime import datetime, timezone
-from backend.integrations.vision_ai_integration import VisionAIIntegration, vision_ai_integration
+from datetime import datetime
+from backend.integrations.vision_ai_integration import (
+    MAX_IMAGE_BYTES,
+    VisionAIIntegration,
+    _PublicOnlyResolver,
+    _to_data_url,
+    vision_ai_integration,
+)
+from backend.integrations import _http
 
 
 class TestVisionAIIntegration:
@@ -22,11 +32,25 @@ class TestVisionAIIntegration:
         """Test initialization with API key"""
         assert integration.api_key == 'sk-test-key-12345'
         
-    def test_default_api_key(self):
+    def test_default_api_key(self, monkeypatch):
         """Test default API key when not provided"""
-        with patch.dict(os.environ, {}, clear=True):
-            integration = VisionAIIntegration()
-            assert integration.api_key == 'sk-test-default-api-key'
+        monkeypatch.delenv('EMERGENT_LLM_KEY', raising=False)
+        monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+        integration = VisionAIIntegration()
+        assert integration.api_key == 'sk-test-default-api-key'
+    
+    @pytest.mark.asyncio
+    async def test_openai_client_uses_shared_http_pool(self, integration):
+        """Test the OpenAI client is built on the process-wide httpx pool"""
+        client = integration._get_client()
+        
+        assert client._client is _http.get_openai_http_client()
+        other = VisionAIIntegration()
+        other.api_key = "sk-other"
+        assert other._get_client()._client is client._client
+        
+        await _http.close_openai_http_client()
+        assert _http._openai_http_client is None
     
     @pytest.mark.asyncio
     @patch('backend.integrations.vision_ai_integration.LlmChat')
@@ -133,20 +157,6 @@ class TestVisionAIIntegration:
         
         mock_chat_instance.with_model.assert_called_once_with("openai", "gpt-4o")
     
-    @pytest.mark.asyncio
-    async def test_analyze_image_url_not_implemented(self):
-        """Test that URL analysis returns not implemented message"""
-        integration = VisionAIIntegration()
-        
-        result = await integration.analyze_image_url(
-            image_url="https://example.com/image.jpg",
-            prompt="Analyze this"
-        )
-        
-        assert "error" in result
-        assert "not yet implemented" in result["error"]
-        assert "message" in result
-    
     @pytest.mark.asyncio
     async def test_analyze_image_url_error_handling(self):
         """Test error handling for URL analysis"""
@@ -264,4 +274,194 @@ class TestVisionAIIntegration:
     def test_global_vision_ai_integration_instance(self):
         """Test global integration instance exists"""
         assert vision_ai_integration is not None
-        assert isinstance(vision_ai_integration, VisionAIIntegration)
\ No newline at end of file
+        assert isinstance(vision_ai_integration, VisionAIIntegration)
+
+# Smallest header that identifies each format; the body is never decoded
+# without Pillow, which these tests don't require
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 16
+
+
+def _image_session(chunks=(PNG_BYTES,), content_type="image/png", status=200):
+    """Mock aiohttp session whose GET streams chunks with the given status and Content-Type"""
+    async def iter_chunked(size):
+        for chunk in chunks:
+            yield chunk
+
+    response = Mock()
+    response.status = status
+    response.headers = {"Content-Type": content_type}
+    response.content.iter_chunked = iter_chunked
+    context = Mock()
+    context.__aenter__ = AsyncMock(return_value=response)
+    context.__aexit__ = AsyncMock(return_value=False)
+    session = Mock()
+    session.get = Mock(return_value=context)
+    return session
+
+
+class TestVisionImagePreparation:
+    """Test image validation and URL fetching before Vision AI calls"""
+
+    @pytest.fixture
+    def integration(self):
+        integration = VisionAIIntegration()
+        integration._complete = AsyncMock(return_value={"analysis": "ok"})
+        return integration
+
+    @pytest.mark.asyncio
+    async def test_base64_image_sent_as_data_url(self, integration):
+        """Test base64 input is validated and sent with its sniffed mime type"""
+        with patch('backend.integrations.vision_ai_integration.Image', None):
+            result = await integration.analyze_image(base64.b64encode(PNG_BYTES).decode(), "Describe")
+
+        assert result == {"analysis": "ok"}
+        data_url, prompt = integration._complete.await_args.args
+        assert data_url == "data:image/png;base64," + base64.b64encode(PNG_BYTES).decode()
+        assert prompt == "Describe"
+
+    @pytest.mark.asyncio
+    async def test_raw_bytes_skip_base64_input(self, integration):
+        """Test uploads are analyzed straight from bytes and base64 input decodes once into that path"""
+        with patch('backend.integrations.vision_ai_integration.Image', None):
+            result = await integration.analyze_image_bytes(PNG_BYTES, "Describe")
+
+        assert result == {"analysis": "ok"}
+        assert integration._complete.await_args.args[0].startswith("data:image/png;base64,")
+
+        integration.analyze_image_bytes = AsyncMock(return_value={"analysis": "ok"})
+        await integration.analyze_image(base64.b64encode(PNG_BYTES).decode(), "Describe")
+        integration.analyze_image_bytes.assert_awaited_once_with(PNG_BYTES, "Describe")
+
+    @pytest.mark.asyncio
+    async def test_unsupported_format_rejected(self, integration):
+        """Test non-image payloads never reach the API"""
+        result = await integration.analyze_image(base64.b64encode(b"%PDF-1.7 ...").decode())
+
+        assert result == {"error": "Unsupported image format"}
+        integration._complete.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_oversized_image_rejected(self, integration):
+        """Test images over the size limit are refused"""
+        with pytest.raises(ValueError):
+            await _to_data_url(PNG_BYTES + b"\x00" * MAX_IMAGE_BYTES)
+
+    @pytest.mark.asyncio
+    async def test_url_scheme_restricted(self, integration):
+        """Test only http(s) URLs are fetched"""
+        result = await integration.analyze_image_url("file:///etc/passwd", "Analyze")
+
+        assert "error" in result
+        integration._complete.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_url_image_fetched_and_analyzed(self, integration):
+        """Test a URL's streamed body is analyzed as raw bytes"""
+        session = _image_session(chunks=(PNG_BYTES[:8], PNG_BYTES[8:]))
+        integration._get_session = AsyncMock(return_value=session)
+        integration.analyze_image_bytes = AsyncMock(return_value={"analysis": "ok"})
+
+        result = await integration.analyze_image_url("https://example.com/a.png", "Analyze")
+
+        assert result == {"analysis": "ok"}
+        session.get.assert_called_once_with("https://example.com/a.png", allow_redirects=False)
+        integration.analyze_image_bytes.assert_awaited_once_with(PNG_BYTES, "Analyze")
+
+    @pytest.mark.asyncio
+    async def test_url_non_image_content_type_rejected(self, integration):
+        """Test URLs that do not serve an image are refused before reading the body"""
+        integration._get_session = AsyncMock(return_value=_image_session(content_type="text/html"))
+
+        result = await integration.analyze_image_url("https://example.com/page", "Analyze")
+
+        assert "did not return an image" in result["error"]
+        integration._complete.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_url_oversized_body_rejected(self, integration):
+        """Test the download stops once the body passes the size limit"""
+        integration._get_session = AsyncMock(return_value=_image_session(chunks=(b"\x00" * 8,) * 3))
+
+        with patch('backend.integrations.vision_ai_integration.MAX_IMAGE_BYTES', 10):
+            result = await integration.analyze_image_url("https://example.com/big.png", "Analyze")
+
+        assert "exceeds" in result["error"]
+        integration._complete.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("status", [302, 404])
+    async def test_url_non_200_refused(self, integration, status):
+        """Test error statuses and redirects are refused rather than followed"""
+        integration._get_session = AsyncMock(return_value=_image_session(status=status))
+
+        result = await integration.analyze_image_url("https://example.com/a.png", "Analyze")
+
+        assert result == {"error": f"Image URL returned HTTP {status}"}
+        integration._complete.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("url", [
+        "http://127.0.0.1/a.png",
+        "http://10.0.0.5/a.png",
+        "http://169.254.169.254/latest/meta-data",
+        "http://[::1]:8080/a.png",
+    ])
+    async def test_url_non_public_ip_refused(self, integration, url):
+        """Test loopback, private, link-local and metadata IPs are refused before connecting"""
+        integration._get_session = AsyncMock()
+
+        result = await integration.analyze_image_url(url, "Analyze")
+
+        assert result == {"error": "Image URL host is not publicly routable"}
+        integration._get_session.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_resolver_drops_non_public_addresses(self):
+        """Test hostnames only connect to their global addresses, and fail with none"""
+        resolver = _PublicOnlyResolver()
+        resolver._resolver = Mock()
+        resolver._resolver.resolve = AsyncMock(side_effect=[
+            [{"host": "10.0.0.5"}, {"host": "93.184.215.14"}],
+            [{"host": "127.0.0.1"}, {"host": "fe80::1%eth0"}],
+        ])
+
+        assert await resolver.resolve("mixed.example.com", 443) == [{"host": "93.184.215.14"}]
+        with pytest.raises(OSError):
+            await resolver.resolve("internal.example.com", 443)
+
+    @pytest.mark.asyncio
+    async def test_url_connection_error_is_generic(self, integration):
+        """Test connection failures do not reveal host or port details to the caller"""
+        session = Mock()
+        session.get = Mock(side_effect=aiohttp.ClientConnectionError("Cannot connect to host 10.0.0.5:6379"))
+        integration._get_session = AsyncMock(return_value=session)
+
+        with patch('backend.integrations.vision_ai_integration.logger'):
+            result = await integration.analyze_image_url("https://internal.example.com/a.png", "Analyze")
+
+        assert result == {"error": "Failed to fetch image"}
+
+    @pytest.mark.asyncio
+    async def test_urls_fetched_concurrently(self, integration):
+        """Test several URLs are downloaded in parallel and keep their order"""
+        in_flight = 0
+        peak = 0
+
+        async def fake_fetch(url):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return PNG_BYTES
+
+        integration._fetch_image = fake_fetch
+        integration._complete = AsyncMock(side_effect=[{"analysis": str(i)} for i in range(3)])
+
+        with patch('backend.integrations.vision_ai_integration.Image', None):
+            results = await integration.analyze_image_urls(
+                [f"https://example.com/{i}.png" for i in range(3)], "Analyze"
+            )
+
+        assert peak == 3
+        assert [r["analysis"] for r in results] == ["0", "1", "2"]
@@ -3,7 +3,7 @@ Unit tests for backend/integrations/voice_ai_integration.py
 Tests Voice AI speech integration
 """
 import pytest
-from unittest.mock import Mock, AsyncMock, patch, MagicMock
+from unittest.mock import Mock, patch
 import os
 from backend.integrations.voice_ai_integration import VoiceAIIntegration, voice_ai_integration
 
@@ -22,11 +22,12 @@ class TestVoiceAIIntegration:
         assert integration.api_key == 'sk-test-voice-key'
         assert integration.realtime_chat is None
         
-    def test_default_api_key(self):
+    def test_default_api_key(self, monkeypatch):
         """Test default API key when not provided"""
-        with patch.dict(os.environ, {}, clear=True):
-            integration = VoiceAIIntegration()
-            assert integration.api_key == 'sk-test-default-key'
+        monkeypatch.delenv('EMERGENT_LLM_KEY', raising=False)
+        monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+        integration = VoiceAIIntegration()
+        assert integration.api_key == 'sk-test-default-key'
     
     @patch('backend.integrations.voice_ai_integration.OpenAIChatRealtime')
     def test_get_realtime_client_creates_instance(self, mock_realtime_class):
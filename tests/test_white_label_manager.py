@@ -0,0 +1,618 @@
+"""
+Unit tests for backend/core/white_label_manager.py
+
+Tests tenant configuration, caching, and multi-tenancy lookups
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from backend.core.white_label_manager import (
+    WhiteLabelManager,
+    TenantConfig,
+    ACCESS_CACHE_TTL,
+    _iso_to_epoch_us,
+)
+
+
+def _tenant_doc(tenant_id="tenant_123", domain="acme.example.com", **overrides):
+    config = {
+        "tenant_id": tenant_id,
+        "name": "Acme",
+        "domain": domain,
+        "subscription_tier": "professional",
+        "status": "active",
+    }
+    config.update(overrides)
+    return {"tenant_id": tenant_id, "config": config}
+
+
+def _mock_db():
+    mock_db = MagicMock()
+    mock_db.tenants = MagicMock()
+    mock_db.tenants.find_one = AsyncMock(return_value=None)
+    mock_db.tenants.insert_one = AsyncMock(return_value=MagicMock(inserted_id="oid"))
+    mock_db.tenants.update_one = AsyncMock(return_value=MagicMock(matched_count=1))
+    mock_db.tenants.find_one_and_update = AsyncMock(return_value=None)
+    mock_db.tenants.insert_many = AsyncMock()
+    mock_db.tenants.count_documents = AsyncMock(return_value=0)
+    return mock_db
+
+
+class TestTenantConfig:
+    """Test TenantConfig defaults and serialization"""
+
+    def test_defaults(self):
+        """Test that missing fields fall back to defaults"""
+        config = TenantConfig({"name": "Acme"})
+
+        assert config.tenant_id
+        assert config.subscription_tier == "starter"
+        assert config.status == "active"
+        assert config.primary_color == "#00FF41"
+
+    def test_default_timestamps_match(self):
+        """Test that created_at and updated_at share one clock read"""
+        config = TenantConfig({"name": "Acme"})
+
+        assert config.created_at == config.updated_at
+        assert config.updated_at_us == _iso_to_epoch_us(config.updated_at)
+
+    def test_legacy_updated_at_us_derived_from_iso(self):
+        """Test documents without updated_at_us get it from the ISO timestamp"""
+        config = TenantConfig({"updated_at": "1970-01-01T00:00:01+00:00"})
+
+        assert config.updated_at_us == 1_000_000
+        assert TenantConfig({"updated_at": None}).updated_at_us == 0
+
+    @patch('backend.core.white_label_manager._utcnow')
+    def test_timestamps_given_skip_clock(self, mock_now):
+        """Test that the clock is not read when both timestamps are provided"""
+        TenantConfig({"created_at": "2024-01-01T00:00:00+00:00", "updated_at": "2024-01-02T00:00:00+00:00"})
+
+        mock_now.assert_not_called()
+
+    def test_to_dict_round_trip(self):
+        """Test that to_dict output rebuilds an equivalent config"""
+        config = TenantConfig(_tenant_doc()["config"])
+
+        rebuilt = TenantConfig(config.to_dict())
+
+        assert rebuilt.to_dict() == config.to_dict()
+
+    def test_to_dict_is_memoized(self):
+        """Test that to_dict reuses its serialized form until marked dirty"""
+        config = TenantConfig(_tenant_doc()["config"])
+
+        first = config.to_dict()
+        assert config.to_dict() is first
+
+        config.name = "Renamed"
+        config._dirty()
+        assert config.to_dict()["name"] == "Renamed"
+
+
+class TestWhiteLabelManagerCache:
+    """Test the TTL-bounded tenant and domain caches"""
+
+    @pytest.fixture
+    def manager(self):
+        return WhiteLabelManager()
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_get_tenant_config_populates_cache(self, mock_get_db, manager):
+        """Test that a cache miss loads from the database once"""
+        mock_db = _mock_db()
+        mock_db.tenants.find_one = AsyncMock(return_value=_tenant_doc())
+        mock_get_db.return_value = mock_db
+
+        first = await manager.get_tenant_config("tenant_123")
+        second = await manager.get_tenant_config("tenant_123")
+
+        assert first is second
+        assert mock_db.tenants.find_one.await_count == 1
+        assert manager._mapped_tenant_id("acme.example.com") == "tenant_123"
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_get_tenant_config_by_domain(self, mock_get_db, manager):
+        """Test domain lookups hit the database on a miss and the cache after"""
+        mock_db = _mock_db()
+        mock_db.tenants.find_one = AsyncMock(return_value=_tenant_doc())
+        mock_get_db.return_value = mock_db
+
+        config = await manager.get_tenant_config(domain="acme.example.com")
+        cached = await manager.get_tenant_config(domain="acme.example.com")
+
+        assert config.tenant_id == "tenant_123"
+        assert cached is config
+        assert mock_db.tenants.find_one.await_count == 1
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_caller_domain_not_mapped(self, mock_get_db, manager):
+        """Test a lookup by tenant_id maps only the tenant's own domain, not the caller's"""
+        mock_db = _mock_db()
+        mock_db.tenants.find_one = AsyncMock(return_value=_tenant_doc())
+        mock_get_db.return_value = mock_db
+
+        config = await manager.get_tenant_config("tenant_123", domain="attacker.example.com")
+
+        assert config.tenant_id == "tenant_123"
+        assert manager._mapped_tenant_id("attacker.example.com") is None
+        assert manager._mapped_tenant_id("acme.example.com") == "tenant_123"
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_get_tenant_config_not_found(self, mock_get_db, manager):
+        """Test that unknown tenants return None and are not cached"""
+        mock_get_db.return_value = _mock_db()
+
+        assert await manager.get_tenant_config("missing") is None
+        assert manager.tenants.get("missing") is None
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_create_tenant_writes_through(self, mock_get_db, manager):
+        """Test that a created tenant is cached after the insert succeeds"""
+        mock_get_db.return_value = _mock_db()
+
+        result = await manager.create_tenant({"name": "Acme", "domain": "acme.example.com"})
+
+        assert "error" not in result
+        assert manager.tenants.get(result["tenant_id"]) is not None
+        assert manager._mapped_tenant_id("acme.example.com") == result["tenant_id"]
+
+    @pytest.mark.asyncio
+    async def test_deployment_package_rendered_off_loop(self, manager):
+        """Test that the deployment package is rendered on the manager's executor"""
+        import threading
+        rendered_on = []
+        original = manager._render_deployment_package
+
+        def render(tenant):
+            rendered_on.append(threading.current_thread().name)
+            return original(tenant)
+
+        manager._render_deployment_package = render
+        package = await manager._generate_deployment_package(TenantConfig({"tenant_id": "t1"}))
+
+        assert package["environment_variables"]["TENANT_ID"] == "t1"
+        assert rendered_on[0].startswith("white-label")
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_create_tenant_insert_failure_not_cached(self, mock_get_db, manager):
+        """Test that a failed insert leaves the cache untouched"""
+        mock_db = _mock_db()
+        mock_db.tenants.insert_one = AsyncMock(side_effect=Exception("boom"))
+        mock_get_db.return_value = mock_db
+
+        result = await manager.create_tenant({"name": "Acme", "domain": "acme.example.com"})
+
+        assert "error" in result
+        assert manager._mapped_tenant_id("acme.example.com") is None
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_create_tenant_duplicate_domain(self, mock_get_db, manager):
+        """Test that the unique domain index rejects an existing domain"""
+        mock_db = _mock_db()
+        mock_db.tenants.insert_one = AsyncMock(side_effect=DuplicateKeyError(
+            "dup", details={"keyPattern": {"config.domain": 1}}
+        ))
+        mock_get_db.return_value = mock_db
+
+        result = await manager.create_tenant({"name": "Acme", "domain": "acme.example.com"})
+
+        assert result == {"error": "Domain already exists"}
+        mock_db.tenants.find_one.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_create_tenant_duplicate_tenant_id(self, mock_get_db, manager):
+        """Test that a tenant_id collision is reported as an existing tenant"""
+        mock_db = _mock_db()
+        mock_db.tenants.insert_one = AsyncMock(side_effect=DuplicateKeyError(
+            "dup", details={"keyPattern": {"tenant_id": 1}}
+        ))
+        mock_get_db.return_value = mock_db
+
+        result = await manager.create_tenant({"tenant_id": "t1", "name": "Acme", "domain": "acme.example.com"})
+
+        assert result == {"error": "Tenant already exists"}
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_create_tenant_stores_resolved_subdomain(self, mock_get_db, manager):
+        """Test that subdomain-only tenants persist their resolved domain"""
+        mock_db = _mock_db()
+        mock_get_db.return_value = mock_db
+
+        result = await manager.create_tenant({"name": "Acme", "subdomain": "acme"})
+
+        stored = mock_db.tenants.insert_one.await_args.args[0]
+        assert result["domain"] == "acme.nowhere.digital"
+        assert stored["config"]["domain"] == "acme.nowhere.digital"
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_update_tenant_moves_domain_mapping(self, mock_get_db, manager):
+        """Test that changing a tenant's domain evicts the old mapping"""
+        mock_db = _mock_db()
+        mock_db.tenants.find_one = AsyncMock(return_value=_tenant_doc())
+        mock_db.tenants.find_one_and_update = AsyncMock(return_value=_tenant_doc(domain="new.example.com"))
+        mock_get_db.return_value = mock_db
+        await manager.get_tenant_config("tenant_123")
+
+        result = await manager.update_tenant("tenant_123", {"domain": "new.example.com"})
+
+        assert result["success"] is True
+        assert manager._mapped_tenant_id("acme.example.com") is None
+        assert manager._mapped_tenant_id("new.example.com") == "tenant_123"
+        assert manager.tenants.get("tenant_123").domain == "new.example.com"
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_update_tenant_single_atomic_write(self, mock_get_db, manager):
+        """Test that updates are applied with one find_one_and_update"""
+        mock_db = _mock_db()
+        mock_db.tenants.find_one_and_update = AsyncMock(return_value=_tenant_doc(name="Renamed"))
+        mock_get_db.return_value = mock_db
+
+        result = await manager.update_tenant("tenant_123", {"name": "Renamed"})
+
+        update = mock_db.tenants.find_one_and_update.await_args.args[1]["$set"]
+        assert result["success"] is True
+        assert update["config.name"] == "Renamed"
+        assert update["config.updated_at"] == update["updated_at"]
+        assert update["config.updated_at_us"] == _iso_to_epoch_us(update["updated_at"])
+        mock_db.tenants.find_one.assert_not_awaited()
+        mock_db.tenants.update_one.assert_not_awaited()
+        assert manager.tenants.get("tenant_123").name == "Renamed"
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_update_tenant_not_found(self, mock_get_db, manager):
+        """Test that updating an unknown tenant reports an error"""
+        mock_db = _mock_db()
+        mock_db.tenants.find_one_and_update = AsyncMock(return_value=None)
+        mock_get_db.return_value = mock_db
+
+        assert await manager.update_tenant("missing", {"name": "x"}) == {"error": "Tenant not found"}
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_tenants_collection_resolved_once(self, mock_get_db, manager):
+        """Test that the database handle is looked up once and reused"""
+        mock_get_db.return_value = _mock_db()
+
+        await manager.get_tenant_config("t1")
+        await manager.get_tenant_config("t2")
+        await manager.create_tenant({"name": "Acme", "domain": "acme.example.com"})
+
+        assert mock_get_db.call_count == 1
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_domain_mappings_snapshot_swapped_on_write(self, mock_get_db, manager):
+        """Test that batch writes publish a new read-only snapshot"""
+        mock_get_db.return_value = _mock_db()
+        before = manager.domain_mappings
+
+        result = await manager.create_tenants_bulk([{"name": "Acme", "domain": "acme.example.com"}])
+
+        assert "acme.example.com" not in before
+        assert manager.domain_mappings is not before
+        assert manager.domain_mappings["acme.example.com"] == result["created"][0]["tenant_id"]
+        with pytest.raises(TypeError):
+            manager.domain_mappings["other.example.com"] = "x"
+
+    @patch('backend.core.white_label_manager.DOMAIN_SNAPSHOT_BATCH', 3)
+    def test_single_tenant_domains_buffered_until_batch(self, manager):
+        """Test single-tenant writes are buffered and folded into the snapshot a batch at a time"""
+        before = manager.domain_mappings
+
+        manager._cache_tenant(TenantConfig(_tenant_doc("t1", "a.example.com")["config"]))
+        manager._cache_tenant(TenantConfig(_tenant_doc("t2", "b.example.com")["config"]))
+
+        assert manager.domain_mappings is before
+        assert manager._mapped_tenant_id("b.example.com") == "t2"
+
+        manager._cache_tenant(TenantConfig(_tenant_doc("t3", "c.example.com")["config"]))
+
+        assert dict(manager.domain_mappings) == {"a.example.com": "t1", "b.example.com": "t2", "c.example.com": "t3"}
+        assert manager._new_domain_mappings == {}
+
+    def test_snapshot_bounded_by_tenant_cache(self, manager):
+        """Test domains of evicted or expired tenants drop out when the snapshot is rebuilt"""
+        manager.tenants.max_size = 2
+        manager._cache_tenants([
+            TenantConfig(_tenant_doc(f"t{i}", f"{i}.example.com")["config"]) for i in range(3)
+        ])
+
+        assert len(manager.domain_mappings) == 2
+
+        manager.tenants.set("t2", manager.tenants.get("t2"), ttl=-1)
+        manager._cache_tenants([])
+
+        assert "2.example.com" not in manager.domain_mappings
+
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_warmup_prefetches_active_tenants(self, mock_get_db, manager):
+        """Test warmup loads recent tenants in one query and serves them from cache"""
+        docs = [_tenant_doc("t1", "a.example.com"), _tenant_doc("t2", "b.example.com")]
+        cursor = MagicMock()
+        cursor.sort.return_value = cursor
+        cursor.limit.return_value = cursor
+        cursor.to_list = AsyncMock(return_value=docs)
+        mock_db = _mock_db()
+        mock_db.tenants.find = MagicMock(return_value=cursor)
+        mock_get_db.return_value = mock_db
+
+        assert await manager.warmup(limit=50) == 2
+
+        cursor.sort.assert_called_once_with("config.updated_at_us", -1)
+        cursor.limit.assert_called_once_with(50)
+        assert (await manager.get_tenant_config(domain="b.example.com")).tenant_id == "t2"
+        mock_db.tenants.find_one.assert_not_awaited()
+
+class TestTenantAccess:
+    """Test feature access checks"""
+
+    @pytest.fixture
+    def manager(self):
+        return WhiteLabelManager()
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_tier_and_enabled_features(self, mock_get_db, manager):
+        """Test access through the subscription tier or explicitly enabled features"""
+        mock_db = _mock_db()
+        mock_db.tenants.find_one = AsyncMock(return_value=_tenant_doc(enabled_features=["reseller_dashboard"]))
+        mock_get_db.return_value = mock_db
+
+        assert await manager.validate_tenant_access("tenant_123", "white_label") is True
+        assert await manager.validate_tenant_access("tenant_123", "reseller_dashboard") is True
+        assert await manager.validate_tenant_access("tenant_123", "custom_development") is False
+
+    @pytest.mark.asyncio
+    async def test_access_decisions_cached(self, manager):
+        """Test repeated checks skip the tenant lookup"""
+        manager.get_tenant_config = AsyncMock(return_value=TenantConfig(_tenant_doc()["config"]))
+
+        await manager.validate_tenant_access("tenant_123", "plugins")
+        await manager.validate_tenant_access("tenant_123", "plugins")
+
+        assert manager.get_tenant_config.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_missing_tenant_denial_not_cached(self, manager):
+        """Test a None lookup (missing tenant or DB error) is denied but re-checked next time"""
+        manager.get_tenant_config = AsyncMock(return_value=None)
+        assert await manager.validate_tenant_access("tenant_123", "plugins") is False
+
+        manager.get_tenant_config = AsyncMock(return_value=TenantConfig(_tenant_doc()["config"]))
+
+        assert await manager.validate_tenant_access("tenant_123", "plugins") is True
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_update_invalidates_only_that_tenant(self, mock_get_db, manager):
+        """Test a tenant write drops its own decisions and keeps other tenants'"""
+        mock_db = _mock_db()
+        mock_db.tenants.find_one_and_update = AsyncMock(return_value=_tenant_doc(subscription_tier="starter"))
+        mock_get_db.return_value = mock_db
+        manager.get_tenant_config = AsyncMock(side_effect=lambda tenant_id: TenantConfig(_tenant_doc(tenant_id)["config"]))
+        await manager.validate_tenant_access("tenant_123", "plugins")
+        await manager.validate_tenant_access("tenant_456", "plugins")
+
+        await manager.update_tenant("tenant_123", {"subscription_tier": "starter"})
+
+        assert "tenant_123" not in manager._access_cache
+        assert "plugins" in manager._access_cache["tenant_456"]
+
+    @pytest.mark.asyncio
+    async def test_access_decisions_expire(self, manager):
+        """Test cached decisions are re-checked after the TTL"""
+        manager.get_tenant_config = AsyncMock(return_value=TenantConfig(_tenant_doc()["config"]))
+
+        with patch('backend.core.white_label_manager.time.monotonic', side_effect=[100.0, 100.0 + ACCESS_CACHE_TTL]):
+            await manager.validate_tenant_access("tenant_123", "plugins")
+            await manager.validate_tenant_access("tenant_123", "plugins")
+
+        assert manager.get_tenant_config.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_access_cache_bounded(self, manager):
+        """Test the least recently checked tenant is evicted past the bound"""
+        manager.get_tenant_config = AsyncMock(side_effect=lambda tenant_id: TenantConfig(_tenant_doc(tenant_id)["config"]))
+
+        with patch('backend.core.white_label_manager.ACCESS_CACHE_TENANTS', 2):
+            await manager.validate_tenant_access("t1", "plugins")
+            await manager.validate_tenant_access("t2", "plugins")
+            await manager.validate_tenant_access("t1", "plugins")
+            await manager.validate_tenant_access("t3", "plugins")
+
+        assert list(manager._access_cache) == ["t1", "t3"]
+
+
+    def test_subscription_tiers_shared_and_frozen(self, manager):
+        """Test tiers are a shared read-only constant"""
+        assert manager.subscription_tiers is WhiteLabelManager().subscription_tiers
+        assert isinstance(manager.subscription_tiers["starter"]["features"], frozenset)
+        with pytest.raises(TypeError):
+            manager.subscription_tiers["custom"] = {}
+
+    @pytest.mark.asyncio
+    async def test_tenant_features_serializable(self, manager):
+        """Test tier features are returned as a sorted list"""
+        manager.get_tenant_config = AsyncMock(return_value=TenantConfig(_tenant_doc()["config"]))
+
+        features = await manager.get_tenant_features("tenant_123")
+
+        assert features["tier_features"] == sorted(features["tier_features"])
+        assert "white_label" in features["tier_features"]
+
+    @pytest.mark.asyncio
+    async def test_default_branding_copies_do_not_leak(self, manager):
+        """Test callers mutating the default branding cannot change it for others"""
+        manager.get_tenant_config = AsyncMock(return_value=None)
+
+        branding = await manager.get_tenant_branding("missing")
+        branding["platform_name"] = "Hijacked"
+        branding["colors"]["primary"] = "#FF0000"
+
+        fresh = await manager.get_tenant_branding("missing")
+        assert fresh["platform_name"] == "NOWHERE.AI"
+        assert fresh["colors"]["primary"] == "#00FF41"
+        assert type(fresh["colors"]) is dict
+
+class TestBulkTenantCreation:
+    """Test batched tenant provisioning"""
+
+    @pytest.fixture
+    def manager(self):
+        return WhiteLabelManager()
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_create_tenants_bulk_single_round_trip(self, mock_get_db, manager):
+        """Test that all tenants are inserted with one insert_many call"""
+        mock_db = _mock_db()
+        mock_get_db.return_value = mock_db
+
+        result = await manager.create_tenants_bulk([
+            {"name": "A", "domain": "a.example.com"},
+            {"name": "B", "domain": "b.example.com"},
+            {"name": "Dup", "domain": "a.example.com"},
+        ])
+
+        assert mock_db.tenants.insert_many.await_count == 1
+        assert len(mock_db.tenants.insert_many.await_args.args[0]) == 2
+        assert [t["domain"] for t in result["created"]] == ["a.example.com", "b.example.com"]
+        assert result["failed"] == [{"index": 2, "domain": "a.example.com", "error": "Domain already exists"}]
+        mock_db.tenants.insert_one.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_create_tenants_bulk_reports_write_errors(self, mock_get_db, manager):
+        """Test that per-document write errors are reported and not cached"""
+        mock_db = _mock_db()
+        mock_db.tenants.insert_many = AsyncMock(side_effect=BulkWriteError({
+            "writeErrors": [{
+                "index": 1, "code": 11000, "errmsg": "E11000 duplicate key", "keyPattern": {"config.domain": 1}
+            }]
+        }))
+        mock_get_db.return_value = mock_db
+
+        result = await manager.create_tenants_bulk([
+            {"name": "A", "domain": "a.example.com"},
+            {"name": "B", "domain": "b.example.com"},
+        ])
+
+        assert [t["domain"] for t in result["created"]] == ["a.example.com"]
+        assert result["failed"] == [{"index": 1, "domain": "b.example.com", "error": "Domain already exists"}]
+        assert manager._mapped_tenant_id("b.example.com") is None
+        assert manager._mapped_tenant_id("a.example.com") is not None
+
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_create_tenants_bulk_reports_colliding_field(self, mock_get_db, manager):
+        """Test a duplicate tenant_id is reported as such, not as a domain clash"""
+        mock_db = _mock_db()
+        mock_db.tenants.insert_many = AsyncMock(side_effect=BulkWriteError({
+            "writeErrors": [{
+                "index": 0, "code": 11000, "errmsg": "E11000 duplicate key", "keyPattern": {"tenant_id": 1}
+            }]
+        }))
+        mock_get_db.return_value = mock_db
+
+        result = await manager.create_tenants_bulk([{"tenant_id": "t1", "name": "A", "domain": "a.example.com"}])
+
+        assert result["created"] == []
+        assert result["failed"] == [{"index": 0, "domain": "a.example.com", "error": "Tenant already exists"}]
+
+
+class TestTenantListing:
+    """Test tenant listing queries"""
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_get_all_tenants_projects_listed_fields(self, mock_get_db):
+        """Test that only the listed fields are requested from MongoDB"""
+        docs = [_tenant_doc("t1", "a.example.com"), _tenant_doc("t2", "b.example.com")]
+        cursor = MagicMock()
+        cursor.batch_size.return_value = cursor
+        cursor.__aiter__.return_value = iter(docs)
+        mock_db = _mock_db()
+        mock_db.tenants.find = MagicMock(return_value=cursor)
+        mock_get_db.return_value = mock_db
+
+        tenants = await WhiteLabelManager().get_all_tenants("active")
+
+        query = mock_db.tenants.find.call_args.args[0]
+        projection = mock_db.tenants.find.call_args.kwargs["projection"]
+        assert query == {"config.status": "active"}
+        assert "config.branding" not in projection
+        assert projection["config.domain"] == 1
+        assert [t["tenant_id"] for t in tenants] == ["t1", "t2"]
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_get_tenants_page(self, mock_get_db):
+        """Test that a page is fetched with skip/limit and to_list"""
+        cursor = MagicMock()
+        cursor.sort.return_value = cursor
+        cursor.skip.return_value = cursor
+        cursor.limit.return_value = cursor
+        cursor.to_list = AsyncMock(return_value=[_tenant_doc("t3", "c.example.com")])
+        mock_db = _mock_db()
+        mock_db.tenants.find = MagicMock(return_value=cursor)
+        mock_get_db.return_value = mock_db
+
+        page = await WhiteLabelManager().get_tenants_page(skip=20, limit=10)
+
+        cursor.skip.assert_called_once_with(20)
+        cursor.limit.assert_called_once_with(10)
+        cursor.to_list.assert_awaited_once_with(length=10)
+        assert page == [{
+            "tenant_id": "t3",
+            "name": "Acme",
+            "domain": "c.example.com",
+            "subscription_tier": "professional",
+            "status": "active",
+            "created_at": None
+        }]
+
+
+class TestResellerPackage:
+    """Test reseller package provisioning"""
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_reseller_domain_slug(self, mock_get_db):
+        """Test that the company name is slugged into the reseller domain"""
+        mock_get_db.return_value = _mock_db()
+
+        result = await WhiteLabelManager().create_reseller_package({"company_name": "Acme  Digital_Group (UAE)!"})
+
+        assert result["success"] is True
+        assert result["reseller_package"]["reseller_dashboard_url"] == "https://acme-digital-group-uae.nowheredigital.ae/reseller"
+
+    @pytest.mark.asyncio
+    @patch('backend.core.white_label_manager.get_database')
+    async def test_reseller_secret_key_format(self, mock_get_db):
+        """Test the reseller secret key carries 16 hex characters"""
+        mock_get_db.return_value = _mock_db()
+
+        result = await WhiteLabelManager().create_reseller_package({"company_name": "Acme"})
+
+        secret_key = result["reseller_package"]["api_credentials"]["secret_key"]
+        assert secret_key.startswith("sk_reseller_")
+        assert len(secret_key) == len("sk_reseller_") + 16
+        int(secret_key[len("sk_reseller_"):], 16)